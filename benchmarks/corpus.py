@@ -0,0 +1,74 @@
+# benchmarks/corpus.py
+"""
+Generador de un corpus sintético de audios con el mismo formato de nombre de las grabaciones reales:
+
+    documento_fecha hora_min_seg_numeroCliente_TMO.wav
+    ej: 53134176_2025-11-01 10_48_49_3164660199_54.wav
+"""
+import argparse
+import random
+import struct
+import wave
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+
+def _write_wav(path: Path, seconds: float, sample_rate: int = 8000, stereo: bool = False):
+    """
+    WAV PCM de 16 bits con ruido bajo (contenido distinto por archivo, para que
+    la caché por contenido no los confunda).
+    """
+    channels = 2 if stereo else 1
+    frames = int(seconds * sample_rate)
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        chunk = []
+        for _ in range(frames * channels):
+            chunk.append(random.randint(-300, 300))
+            if len(chunk) >= 8192:
+                w.writeframes(struct.pack(f"<{len(chunk)}h", *chunk))
+                chunk = []
+        if chunk:
+            w.writeframes(struct.pack(f"<{len(chunk)}h", *chunk))
+
+
+def generate_corpus(
+    target_dir: Path,
+    n_calls: int,
+    min_seconds: float = 1.0,
+    max_seconds: float = 4.0,
+    seed: int = 42,
+) -> List[Path]:
+    """
+    Crea `n_calls` audios sintéticos en `target_dir` y devuelve sus rutas.
+    Las duraciones son cortas a propósito: el stub de Deepgram no decodifica el audio.
+    """
+    random.seed(seed)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    agents = [str(random.randint(10_000_000, 1_099_999_999)) for _ in range(max(1, n_calls // 25))]
+    start = datetime(2025, 11, 1, 8, 0, 0)
+
+    files = []
+    for i in range(n_calls):
+        ts = start + timedelta(minutes=7 * i, seconds=random.randint(0, 59))
+        seconds = random.uniform(min_seconds, max_seconds)
+        name = (
+            f"{random.choice(agents)}_{ts:%Y-%m-%d %H}_{ts:%M}_{ts:%S}_"
+            f"3{random.randint(100_000_000, 199_999_999)}_{int(seconds * 30)}.wav"
+        )
+        path = target_dir / name
+        _write_wav(path, seconds, stereo=(i % 3 == 0))
+        files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un corpus sintético de llamadas")
+    parser.add_argument("carpeta", type=Path)
+    parser.add_argument("--llamadas", type=int, default=100)
+    args = parser.parse_args()
+    generated = generate_corpus(args.carpeta, args.llamadas)
+    print(f"Se generaron {len(generated)} audios en {args.carpeta}")
@@ -0,0 +1,132 @@
+# benchmarks/import_time.py
+"""
+Benchmark del costo de arranque del pipeline de Voz del Cliente.
+
+Mide, en procesos nuevos (sin módulos ya cargados):
+- el tiempo de `import src.pipeline` y qué dependencias pesadas quedaron cargadas
+- el tiempo total de una ejecución sin llamadas nuevas (`python main.py` con la carpeta vacía)
+
+Las dependencias pesadas (pandas, openai, requests) deben cargarse recién al usarse:
+si alguna aparece al importar el pipeline o en una ejecución sin llamadas nuevas, o el import
+supera --max-ms, termina con código 1.
+
+Uso:
+    python -m benchmarks.import_time --repeticiones 5 --max-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que NO deben cargarse solo por importar el pipeline
+HEAVY_MODULES = ("pandas", "numpy", "openai", "httpx", "requests", "urllib3", "openpyxl")
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import src.pipeline
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"import_s": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+_NOOP_PROBE = f"""
+import json, runpy, sys
+sys.argv = ["main.py"]
+runpy.run_path({str(REPO_DIR / "main.py")!r}, run_name="__main__")
+print(json.dumps({{"heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque de Voz del Cliente")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos nuevos por medición")
+    parser.add_argument("--max-ms", type=float, default=None, help="Falla si el import (mediana) supera este tiempo")
+    parser.add_argument("--json", type=Path, help="Guarda el resultado en este archivo JSON")
+    return parser.parse_args()
+
+
+def _env(workdir: Path) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "AUDIO_INPUT_DIR": str(workdir / "input_calls"),
+        "OUTPUT_DIR": str(workdir / "output"),
+        "CACHE_DIR": str(workdir / "cache"),
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "stub",
+        "DEEPGRAM_API_KEY": env.get("DEEPGRAM_API_KEY") or "stub",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def bench_import(repeats: int, workdir: Path) -> dict:
+    times, heavy = [], set()
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE],
+            cwd=REPO_DIR, env=_env(workdir), capture_output=True, text=True, check=True,
+        )
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(data["import_s"])
+        heavy.update(data["heavy"])
+    return {"median_ms": statistics.median(times) * 1000, "max_ms": max(times) * 1000, "heavy": sorted(heavy)}
+
+
+def bench_noop_run(repeats: int, workdir: Path) -> dict:
+    """
+    `python main.py` sin audios nuevos: debe terminar sin cargar pandas/openai/requests.
+    """
+    (workdir / "input_calls").mkdir(parents=True, exist_ok=True)
+    times, heavy = [], set()
+    env = _env(workdir)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_DIR), env.get("PYTHONPATH")]))
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", _NOOP_PROBE],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True,
+        )
+        times.append(time.perf_counter() - t0)
+        heavy.update(json.loads(result.stdout.strip().splitlines()[-1])["heavy"])
+    return {"median_ms": statistics.median(times) * 1000, "max_ms": max(times) * 1000, "heavy": sorted(heavy)}
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="voc_import_") as tmp:
+        workdir = Path(tmp)
+        report = {
+            "import": bench_import(args.repeticiones, workdir),
+            "noop_run": bench_noop_run(args.repeticiones, workdir),
+        }
+
+    imp, run = report["import"], report["noop_run"]
+    print("\n============ ARRANQUE VOZ DEL CLIENTE ============")
+    print(f"import src.pipeline:     p50={imp['median_ms']:,.0f} ms  máx={imp['max_ms']:,.0f} ms")
+    print(f"Ejecución sin llamadas:  p50={run['median_ms']:,.0f} ms  máx={run['max_ms']:,.0f} ms")
+    print(f"Dependencias pesadas al importar: {', '.join(imp['heavy']) or 'ninguna'}")
+    print(f"Dependencias pesadas sin llamadas: {', '.join(run['heavy']) or 'ninguna'}")
+    print("==================================================")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Resultado guardado en: {args.json}")
+
+    failed = False
+    for label, heavy in (("al importar el pipeline", imp["heavy"]), ("sin llamadas nuevas", run["heavy"])):
+        if heavy:
+            print(f"⚠ Se cargaron dependencias pesadas {label}: {', '.join(heavy)}")
+            failed = True
+    if args.max_ms is not None and imp["median_ms"] > args.max_ms:
+        print(f"⚠ El import tardó {imp['median_ms']:,.0f} ms (máximo permitido: {args.max_ms:,.0f} ms)")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# benchmarks/run_benchmark.py
+"""
+Benchmark offline del pipeline de Voz del Cliente.
+
+Levanta stubs locales de Deepgram y OpenAI, genera un corpus sintético, corre
+`process_calls` contra ellos y mide:
+- llamadas/segundo del batch completo
+- latencia p50/p95 por etapa (Deepgram y OpenAI)
+- pico de memoria (RSS) del proceso
+- tiempo de exportación a Excel con 1k/10k/100k filas acumuladas
+
+Uso:
+    python -m benchmarks.run_benchmark --llamadas 200 --latencia-deepgram 400 --latencia-openai 600
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.stub_servers import DeepgramStubHandler, OpenAIStubHandler, StubBehavior, StubServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline de Voz del Cliente")
+    parser.add_argument("--llamadas", type=int, default=100, help="Audios sintéticos a procesar")
+    parser.add_argument("--latencia-deepgram", type=float, default=300.0, help="ms por request")
+    parser.add_argument("--latencia-openai", type=float, default=500.0, help="ms por request")
+    parser.add_argument("--jitter", type=float, default=100.0, help="ms de variación por request")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument(
+        "--filas-export",
+        default="1000,10000,100000",
+        help="Filas acumuladas para medir la exportación (separadas por coma; vacío = omitir)",
+    )
+    parser.add_argument("--json", type=Path, help="Guarda el resultado en este archivo JSON")
+    return parser.parse_args()
+
+
+def _peak_rss_mb():
+    """
+    Pico de memoria residente del proceso en MB (None si la plataforma no lo permite).
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+
+
+def _stage_summary(stage):
+    if not stage:
+        return {"n": 0, "p50_ms": None, "p95_ms": None}
+    return {"n": stage["count"], "p50_ms": stage["p50_ms"], "p95_ms": stage["p95_ms"]}
+
+
+def bench_pipeline(args, workdir: Path) -> dict:
+    """
+    Corre `process_calls` sobre el corpus sintético contra los stubs ya configurados.
+    """
+    import src.pipeline as pipeline
+    from src.metrics import metrics
+
+    input_dir = workdir / "input_calls"
+    output_dir = workdir / "output"
+    generate_corpus(input_dir, args.llamadas)
+
+    error = None
+    t0 = time.perf_counter()
+    try:
+        pipeline.process_calls(input_dir, output_dir)
+    except Exception as e:  # el benchmark reporta la falla en vez de abortar
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - t0
+
+    # Latencias por etapa tomadas de la instrumentación del pipeline
+    stages = metrics.summary()["stages"]
+    return {
+        "calls": args.llamadas,
+        "elapsed_s": elapsed,
+        "calls_per_s": args.llamadas / elapsed if elapsed and not error else None,
+        "deepgram": _stage_summary(stages.get("deepgram")),
+        "openai": _stage_summary(stages.get("openai")),
+        "error": error,
+    }
+
+
+def _synthetic_rows(n: int, offset: int = 0) -> list:
+    rows = []
+    for i in range(offset, offset + n):
+        rows.append({
+            "Número de llamada": i + 1,
+            "Documento": str(10_000_000 + i % 400),
+            "Fecha de llamada": f"{1 + i % 28:02d}-{1 + (i // 28) % 12:02d}-2025",
+            "Número cliente": str(3_100_000_000 + i),
+            "TMO": str(30 + i % 500),
+            "Servicio adicional": "Netflix",
+            "Voz de cliente": "Sí, lo uso",
+            "Voz cliente Zoom": "Lo uso todos los días",
+            "Conoce (Si/No)": "Si",
+            "Sentimiento": "positivo",
+        })
+    return rows
+
+
+def bench_export(row_counts: list, workdir: Path, new_rows: int = 150) -> dict:
+    """
+    Para cada tamaño de histórico, mide el tiempo de exportar un batch de `new_rows` filas nuevas
+    (con el Excel del histórico ya generado, como en una ejecución normal; ver VOC_EXCEL_PARTITION).
+    """
+    from src.exporter import build_excel, export_to_excel
+    from src.result_store import open_result_store
+
+    results = {}
+    for n in row_counts:
+        out = workdir / f"export_{n}"
+        store = open_result_store(out)
+        store.append(_synthetic_rows(n), [f"hist-{i}" for i in range(n)])
+        build_excel(out, store=store)
+
+        t0 = time.perf_counter()
+        export_to_excel(_synthetic_rows(new_rows, offset=n), out, call_ids=[f"new-{i}" for i in range(new_rows)])
+        results[str(n)] = {"export_s": time.perf_counter() - t0}
+    return results
+
+
+def main():
+    args = parse_args()
+    deepgram = StubBehavior(args.latencia_deepgram, args.jitter, args.tasa_error, args.tasa_429)
+    openai = StubBehavior(args.latencia_openai, args.jitter, args.tasa_error, args.tasa_429)
+
+    with tempfile.TemporaryDirectory(prefix="voc_bench_") as tmp, \
+            StubServer(DeepgramStubHandler, deepgram) as dg_server, \
+            StubServer(OpenAIStubHandler, openai) as oa_server:
+        workdir = Path(tmp)
+
+        # La configuración se lee al importar `src`, así que se fija ANTES de importarlo.
+        os.environ.update({
+            "DEEPGRAM_URL": f"{dg_server.url}/v1/listen",
+            "DEEPGRAM_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{oa_server.url}/v1",
+            "OPENAI_API_KEY": "stub",
+            "OUTPUT_DIR": str(workdir / "output"),
+            "CACHE_DIR": str(workdir / "cache"),
+            "VOC_MAX_CALLS_PER_BATCH": str(args.llamadas),
+        })
+
+        report = {"pipeline": bench_pipeline(args, workdir)}
+        report["stubs"] = {
+            "deepgram": {"requests": deepgram.requests, "errors": deepgram.errors,
+                         "throttled": deepgram.throttled, "bytes": deepgram.bytes_received},
+            "openai": {"requests": openai.requests, "errors": openai.errors,
+                       "throttled": openai.throttled, "bytes": openai.bytes_received},
+        }
+
+        row_counts = [int(x) for x in args.filas_export.split(",") if x.strip()]
+        report["export"] = bench_export(row_counts, workdir) if row_counts else {}
+        report["peak_rss_mb"] = _peak_rss_mb()
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Resultado guardado en: {args.json}")
+
+
+def _fmt(value, unit="") -> str:
+    return "-" if value is None else f"{value:,.1f}{unit}"
+
+
+def _print_report(report: dict):
+    p = report["pipeline"]
+    print("\n================ BENCHMARK VOZ DEL CLIENTE ================")
+    print(f"Llamadas:           {p['calls']}")
+    print(f"Tiempo total:       {_fmt(p['elapsed_s'], ' s')}")
+    print(f"Llamadas/segundo:   {_fmt(p['calls_per_s'])}")
+    for stage in ("deepgram", "openai"):
+        s = p[stage]
+        print(f"{stage:<10} n={s['n']:<5} p50={_fmt(s['p50_ms'], ' ms')}  p95={_fmt(s['p95_ms'], ' ms')}")
+    for name, s in report["stubs"].items():
+        print(f"Stub {name:<9} requests={s['requests']} errores={s['errors']} 429={s['throttled']} bytes={s['bytes']:,}")
+    for rows, e in report["export"].items():
+        print(f"Export Excel con {int(rows):>7,} filas acumuladas: {_fmt(e['export_s'], ' s')}")
+    print(f"Pico RSS:           {_fmt(report['peak_rss_mb'], ' MB')}")
+    if p["error"]:
+        print(f"⚠ El batch falló: {p['error']}")
+    print("==========================================================")
+
+
+if __name__ == "__main__":
+    main()
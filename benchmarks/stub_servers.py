@@ -0,0 +1,241 @@
+# benchmarks/stub_servers.py
+"""
+Servidores HTTP locales que imitan Deepgram (/v1/listen) y OpenAI (/v1/chat/completions)
+para medir el pipeline sin llaves reales ni costo.
+
+Cada servidor tiene latencia configurable, una tasa de errores 5xx y una tasa de 429
+(con encabezado Retry-After).
+"""
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Frases con las que se arman transcripciones sintéticas
+_OPENINGS = [
+    "Buenos días, le habla Laura de Colsubsidio, ¿hablo con el titular de la cuenta?",
+    "Buenas tardes, mi nombre es Carlos, lo llamo de Colsubsidio por su plan.",
+]
+_SERVICES = ["Netflix", "HBO Max", "Amazon Prime", "Disney plus", "Star plus", "Paramount plus", "Claro video"]
+_CUSTOMER = [
+    "Sí señor, ya lo tengo y lo uso todos los días.",
+    "No sabía que tenía ese servicio incluido.",
+    "Intenté entrar pero me sale error cada vez.",
+    "Fui a la oficina y no pude activarlo.",
+    "El técnico lo activó cuando vino a la casa.",
+    "Todavía no lo he activado, no he tenido tiempo.",
+    "Ya está activo, gracias, todo bien.",
+    "Nunca lo hice, la verdad no me interesa.",
+]
+_CLOSINGS = ["Perfecto, muchas gracias por su tiempo.", "Listo, que tenga buen día."]
+
+_BUCKETS = [
+    "No, fui a la oficina y no pude",
+    "No, me sale error",
+    "No, no lo he activado",
+    "No, no sabía",
+    "No, nunca lo hice",
+    "Sí, el técnico lo activó",
+    "Sí, lo uso",
+    "Sí, ya está activo.",
+    "Sí, ya hice la activación",
+    "Sí, ya lo tengo",
+]
+
+
+@dataclass
+class StubBehavior:
+    latency_ms: float = 300.0     # latencia media por request
+    jitter_ms: float = 100.0      # variación uniforme +/- alrededor de la media
+    error_rate: float = 0.0       # fracción de requests que responden 500
+    rate_429: float = 0.0         # fracción de requests que responden 429
+    retry_after_s: float = 1.0    # valor del encabezado Retry-After en los 429
+    requests: int = 0
+    errors: int = 0
+    throttled: int = 0
+    bytes_received: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def decide(self) -> int:
+        """
+        Duerme la latencia simulada y decide el código HTTP de la respuesta.
+        """
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        time.sleep(delay / 1000.0)
+        r = random.random()
+        if r < self.rate_429:
+            self.count("throttled")
+            return 429
+        if r < self.rate_429 + self.error_rate:
+            self.count("errors")
+            return 500
+        return 200
+
+
+def synthetic_transcript(words_target: int = 120) -> str:
+    parts = [random.choice(_OPENINGS)]
+    while len(" ".join(parts).split()) < words_target:
+        parts.append(f"Le comento que su plan incluye {random.choice(_SERVICES)}.")
+        parts.append(random.choice(_CUSTOMER))
+    parts.append(random.choice(_CLOSINGS))
+    return " ".join(parts)
+
+
+class _BaseHandler(BaseHTTPRequestHandler):
+    behavior: StubBehavior = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # sin logs por request
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self) -> bool:
+        status = self.behavior.decide()
+        if status == 429:
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(self.behavior.retry_after_s)})
+            return True
+        if status != 200:
+            self._send_json(status, {"error": "stub error"})
+            return True
+        return False
+
+
+class DeepgramStubHandler(_BaseHandler):
+    def do_POST(self):
+        body = self._read_body()
+        self.behavior.count("requests")
+        self.behavior.count("bytes_received", len(body))
+        if not self.path.startswith("/v1/listen"):
+            self._send_json(404, {"error": "not found"})
+            return
+        if self._maybe_fail():
+            return
+
+        transcript = synthetic_transcript(random.randint(60, 260))
+        words = transcript.split()
+        utterances = []
+        for i in range(0, len(words), 12):
+            utterances.append({
+                "speaker": (i // 12) % 2,
+                "start": i * 0.4,
+                "end": (i + 12) * 0.4,
+                "transcript": " ".join(words[i:i + 12]),
+            })
+        self._send_json(200, {
+            "metadata": {
+                "request_id": f"stub-{random.getrandbits(32):08x}",
+                "duration": len(words) * 0.4,
+                "channels": 1,
+            },
+            "results": {
+                "channels": [{"alternatives": [{"transcript": transcript, "confidence": 0.95}]}],
+                "utterances": utterances,
+            },
+        })
+
+
+class OpenAIStubHandler(_BaseHandler):
+    def do_POST(self):
+        body = self._read_body()
+        self.behavior.count("requests")
+        self.behavior.count("bytes_received", len(body))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+        if self._maybe_fail():
+            return
+
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        user = messages[-1]["content"] if messages else ""
+        system = messages[0]["content"] if len(messages) > 1 else ""
+
+        def one_result() -> dict:
+            return {
+                "additional_service": random.choice(["Netflix", "HBO Max", "Amazon Prime", "No identificado"]),
+                "knows_additional_service": random.choice(["Si", "No"]),
+                "customer_voice": random.choice(_CUSTOMER),
+                "voice_bucket": random.choice(_BUCKETS),
+            }
+
+        call_ids = re.findall(r"### call_id: (.+)", user)
+        if call_ids:
+            content = {"resultados": [{"call_id": c.strip(), **one_result()} for c in call_ids]}
+        else:
+            content = one_result()
+
+        prompt_tokens = (len(system) + len(user)) // 4
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 60 * max(1, len(call_ids)),
+                "total_tokens": prompt_tokens + 60 * max(1, len(call_ids)),
+                # El prefijo estático (sistema) se considera servido desde caché
+                "prompt_tokens_details": {"cached_tokens": (len(system) // 4) // 128 * 128},
+            },
+        })
+
+
+class StubServer:
+    """
+    Servidor stub en un hilo de fondo, en un puerto libre de 127.0.0.1.
+    """
+
+    def __init__(self, handler_cls, behavior: StubBehavior):
+        handler = type(handler_cls.__name__, (handler_cls,), {"behavior": behavior})
+        self.behavior = behavior
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,14 +1,105 @@
+import argparse
 from pathlib import Path
-from src.pipeline import process_calls
 from src.config import AUDIO_INPUT_DIR, VOC_MAX_CALLS_PER_BATCH
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Voz del Cliente - Fidelización")
+    parser.add_argument(
+        "--exportar-excel",
+        action="store_true",
+        help="Solo regenera el Excel desde el almacén de resultados (no procesa audios).",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Modo continuo: vigila la carpeta de entrada y procesa los audios nuevos a medida que llegan.",
+    )
+    parser.add_argument(
+        "--worker",
+        nargs="?",
+        const="",
+        metavar="ID",
+        help="Modo worker: reserva audios de la carpeta compartida y deja sus filas en output/shards/<ID> "
+             "(por defecto <equipo>-<pid>). Se pueden correr varios a la vez.",
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Combina los resultados de los workers (output/shards) y regenera el Excel.",
+    )
+    parser.add_argument(
+        "--reanalizar",
+        action="store_true",
+        help="Vuelve a clasificar las transcripciones guardadas con el prompt actual (sin llamar a Deepgram).",
+    )
+    parser.add_argument(
+        "--reintentar-fallidos",
+        action="store_true",
+        help="Reintenta las llamadas de la cola de fallidas que ya cumplieron su espera "
+             "(backoff desde VOC_DLQ_BASE_S; ver --sin-espera).",
+    )
+    parser.add_argument(
+        "--incluir-agotadas",
+        action="store_true",
+        help="Con --reintentar-fallidos, reintenta también las que agotaron VOC_DLQ_MAX_ATTEMPTS.",
+    )
+    parser.add_argument(
+        "--sin-espera",
+        action="store_true",
+        help="Con --reintentar-fallidos, reintenta ya, sin esperar el backoff (p.ej. tras una caída del proveedor).",
+    )
+    parser.add_argument(
+        "--recalcular-resumen",
+        action="store_true",
+        help="Recalcula los contadores del resumen desde todo el almacén de resultados y regenera el resumen.",
+    )
+    parser.add_argument("--desde", help="Fecha inicial (YYYY-mm-dd) para --exportar-excel o --reanalizar.")
+    parser.add_argument("--hasta", help="Fecha final (YYYY-mm-dd) para --exportar-excel o --reanalizar.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     # Definir las rutas
     input_dir = Path(AUDIO_INPUT_DIR)  # Carpeta donde están las llamadas
     output_dir = Path('./output')  # Carpeta de salida para los resultados
 
-    # Servicio adicional para esta campaña de fidelización
-    additional_service = "Netflix"  # Aquí puedes ajustar según el servicio adicional de cada llamada
+    if args.exportar_excel:
+        from src.exporter import build_excel
+        build_excel(output_dir, date_from=args.desde, date_to=args.hasta)
+    elif args.recalcular_resumen:
+        from src.exporter import build_summary
+        from src.result_store import open_result_store
+        store = open_result_store(output_dir)
+        # Si el almacén recién calculó los contadores al abrirse, no se recalculan otra vez
+        if not store.aggregates_rebuilt:
+            store.rebuild_aggregates()
+        build_summary(output_dir, store)
+    elif args.reanalizar:
+        from src.reanalysis import reanalyze
+        reanalyze(output_dir, date_from=args.desde, date_to=args.hasta)
+    elif args.reintentar_fallidos:
+        from src.pipeline import retry_dead_letters
+        retry_dead_letters(
+            input_dir, output_dir, "Netflix",
+            include_exhausted=args.incluir_agotadas, ignore_backoff=args.sin_espera,
+        )
+    elif args.merge:
+        from src.workers import merge_shards
+        merge_shards(output_dir)
+    elif args.worker is not None:
+        from src.workers import run_worker
+        run_worker(input_dir, output_dir, args.worker or None, "Netflix")
+    elif args.daemon:
+        from src.watcher import run_daemon
+        run_daemon(input_dir, output_dir, "Netflix")
+    else:
+        from src.pipeline import process_calls
+
+        # Servicio adicional para esta campaña de fidelización
+        additional_service = "Netflix"  # Aquí puedes ajustar según el servicio adicional de cada llamada
 
-    # Procesar las llamadas y exportar el resultado a Excel
-    process_calls(input_dir, output_dir, additional_service)
+        # Procesar las llamadas y exportar el resultado a Excel
+        process_calls(input_dir, output_dir, additional_service)
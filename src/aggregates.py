@@ -0,0 +1,120 @@
+# src/aggregates.py
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+# Dimensiones del resumen: (columna en el resumen, campo de la fila de resultado)
+DIMENSIONS = [
+    ("Fecha", "Fecha de llamada"),
+    ("Documento", "Documento"),
+    ("Servicio adicional", "Servicio adicional"),
+    ("Voz de cliente", "Voz de cliente"),
+    ("Sentimiento", "Sentimiento"),
+]
+SUMMARY_COLUMNS = [name for name, _ in DIMENSIONS] + ["Llamadas"]
+
+Key = Tuple[str, str, str, str, str]
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """
+    Tablas de contadores (dentro de la base del almacén de resultados):
+    - voc_counts: llamadas por día × asesor × servicio × bucket × sentimiento
+    - voc_counted: con qué clave se contó cada llamada (si se reanaliza, se mueve de grupo)
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS voc_counts (
+            day        TEXT NOT NULL,
+            agent      TEXT NOT NULL,
+            service    TEXT NOT NULL,
+            bucket     TEXT NOT NULL,
+            sentiment  TEXT NOT NULL,
+            calls      INTEGER NOT NULL,
+            PRIMARY KEY (day, agent, service, bucket, sentiment)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS voc_counted (
+            call_id    TEXT PRIMARY KEY,
+            day        TEXT NOT NULL,
+            agent      TEXT NOT NULL,
+            service    TEXT NOT NULL,
+            bucket     TEXT NOT NULL,
+            sentiment  TEXT NOT NULL
+        )
+        """
+    )
+
+
+def row_key(row: dict, day: str) -> Key:
+    """
+    Clave de agregación de una fila de resultado; `day` es la fecha de llamada en formato ISO
+    (la que ya calcula el almacén de resultados, "" si no se reconoce).
+    """
+    return (day, *(str(row.get(field) or "").strip() for _, field in DIMENSIONS[1:]))
+
+
+def _bump(conn: sqlite3.Connection, key: Key, delta: int):
+    conn.execute(
+        """
+        INSERT INTO voc_counts (day, agent, service, bucket, sentiment, calls) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, agent, service, bucket, sentiment) DO UPDATE SET calls = calls + excluded.calls
+        """,
+        (*key, delta),
+    )
+
+
+def apply_rows(conn: sqlite3.Connection, records: Iterable[Tuple[str, str, dict]]):
+    """
+    Suma las filas nuevas [(call_id, día ISO, fila)] a los contadores (el llamador maneja la
+    transacción y el lock). Una llamada ya contada con otra clave (p.ej. reanalizada) se resta
+    de su grupo anterior.
+    """
+    for call_id, day, row in records:
+        key = row_key(row, day)
+        previous = conn.execute(
+            "SELECT day, agent, service, bucket, sentiment FROM voc_counted WHERE call_id = ?", (call_id,)
+        ).fetchone()
+        if previous is not None:
+            if tuple(previous) == key:
+                continue
+            _bump(conn, tuple(previous), -1)
+            conn.execute(
+                "DELETE FROM voc_counts WHERE day = ? AND agent = ? AND service = ? AND bucket = ? "
+                "AND sentiment = ? AND calls <= 0",
+                tuple(previous),
+            )
+        _bump(conn, key, 1)
+        conn.execute(
+            "INSERT OR REPLACE INTO voc_counted (call_id, day, agent, service, bucket, sentiment) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (call_id, *key),
+        )
+
+
+def clear(conn: sqlite3.Connection):
+    conn.execute("DELETE FROM voc_counts")
+    conn.execute("DELETE FROM voc_counted")
+
+
+def read_counts(
+    conn: sqlite3.Connection,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[tuple]:
+    """
+    Contadores ordenados por día, asesor, servicio, bucket y sentimiento (una fila por grupo).
+    """
+    where, params = [], []
+    if date_from:
+        where.append("day >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("day <= ?")
+        params.append(date_to)
+    query = "SELECT day, agent, service, bucket, sentiment, calls FROM voc_counts"
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    return conn.execute(query + " ORDER BY day, agent, service, bucket, sentiment", params).fetchall()
@@ -1,10 +1,41 @@
 # src/analyzer.py
-from openai import OpenAI
-from .config import OPENAI_API_KEY
+from .config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+    LLM_CACHE_ENABLED,
+    VOC_MAX_CHARS,
+    VOC_BATCH_MAX_ITEMS,
+    OPENAI_MAX_COMPLETION_TOKENS,
+    OPENAI_STRUCTURED_OUTPUT,
+)
+from .llm_cache import analysis_cache_key, get_llm_cache
+from .matcher import KeywordMatcher
+from .metrics import metrics
+from .ratelimit import ProviderHTTPError, openai_scheduler, parse_retry_after
+from typing import Dict, List, Optional
+import hashlib
 import json
+import threading
 
 # ===================== Cliente OpenAI =====================
-client = OpenAI(api_key=OPENAI_API_KEY)
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """
+    Cliente OpenAI compartido, creado en el primer request (importar `openai` toma
+    tiempo y no hace falta en las ejecuciones sin llamadas nuevas).
+    Sin reintentos propios del SDK: los maneja el planificador compartido (src/ratelimit.py).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+    return _client
 
 # ===================== Diccionario de servicios =====================
 SERVICE_SYNONYMS = {
@@ -26,14 +57,14 @@ def detect_additional_service(transcript: str) -> str:
     """
     Detecta el servicio adicional mencionado en la transcripción
     usando coincidencias de palabras clave y las unifica a un nombre canónico.
+    Si se mencionan varios, se toma el primero que aparece en la llamada.
     """
     if not transcript:
         return "No identificado"
 
-    t = transcript.lower()
-    for pattern, canonical in SERVICE_SYNONYMS.items():
-        if pattern in t:
-            return canonical
+    for hit in VOC_MATCHER.find_all(transcript):
+        if hit.group == "servicio":
+            return hit.label
 
     return "No identificado"
 
@@ -52,6 +83,16 @@ NEGATIVE_KEYWORDS = [
     "no quiero", "no entiendo", "cobro", "cobros"
 ]
 
+# ===================== Buscador de palabras clave =====================
+# Servicios y sentimiento en un solo buscador compilado (una pasada, sin tildes,
+# respetando límites de palabra).
+VOC_MATCHER = KeywordMatcher({
+    **{k: ("servicio", canonical) for k, canonical in SERVICE_SYNONYMS.items()},
+    **{k: ("sentimiento", "positivo") for k in POSITIVE_KEYWORDS},
+    **{k: ("sentimiento", "negativo") for k in NEGATIVE_KEYWORDS},
+})
+
+
 def classify_sentiment(text: str) -> str:
     """
     Clasifica el sentimiento en positivo / negativo / neutral
@@ -61,9 +102,9 @@ def classify_sentiment(text: str) -> str:
     if not text:
         return "neutral"
 
-    lower = text.lower()
-    has_pos = any(k in lower for k in POSITIVE_KEYWORDS)
-    has_neg = any(k in lower for k in NEGATIVE_KEYWORDS)
+    counts = VOC_MATCHER.counts(text)
+    has_pos = counts[("sentimiento", "positivo")] > 0
+    has_neg = counts[("sentimiento", "negativo")] > 0
 
     if has_pos and not has_neg:
         return "positivo"
@@ -89,60 +130,49 @@ VALID_BUCKETS = {
 }
 
 
-# ===================== Función principal de análisis =====================
+# ===================== Prompt =====================
+#
+# El prompt se arma para aprovechar la caché de prefijos del proveedor:
+# TODO lo estático (rol + instrucciones + lista de buckets) va primero y es idéntico
+# en todas las llamadas; lo variable (detección preliminar + transcripción) va al final,
+# en el mensaje de usuario.
 
-def analyze_voc(customer_transcript: str) -> dict:
-    """
-    Analiza la transcripción de UNA llamada (campaña Fidelización) y devuelve:
+SYSTEM_PROMPT = "Eres un analista de calidad para call center y SIEMPRE devuelves JSON válido con las claves indicadas."
 
-    - additional_service: servicio adicional detectado (Netflix, HBO Max, Amazon Prime, etc.)
-    - knows_additional_service: "Si" | "No"
-    - customer_voice: resumen corto en palabras del cliente (texto libre)
-    - voice_bucket: una de las frases generales predefinidas
-    - sentiment: "positivo" | "negativo" | "neutral" (por diccionario)
-    """
+# Lista de buckets para las instrucciones (misma fuente que VALID_BUCKETS)
+_BUCKETS_TEXT = "\n".join(f'- "{b}"' for b in sorted(VALID_BUCKETS))
 
-    # 1) Detectamos servicio adicional por heurística (palabras clave)
-    service_guess = detect_additional_service(customer_transcript)
+# Valores permitidos de servicio adicional (para el esquema de salida)
+SERVICE_OPTIONS = sorted(set(SERVICE_SYNONYMS.values())) + ["Otro", "No identificado"]
 
-    # 2) Construimos el prompt para OpenAI (VOZ, CONOCE y BUCKET)
-    prompt = f"""
+# Instrucciones estáticas para analizar UNA llamada.
+INSTRUCTIONS = """
 Eres analista de Voz del Cliente para una campaña de fidelización de servicios adicionales.
 
-A partir de la siguiente transcripción de una llamada (en español), debes:
+A partir de la transcripción de una llamada (en español) que llega en el mensaje del usuario, debes:
 
 1. Confirmar cuál es el servicio adicional del que realmente habla el cliente
    (por ejemplo: Netflix, HBO Max, Amazon Prime, Disney+, Star+, Paramount+, Claro Video).
+   El mensaje trae una detección automática preliminar del servicio; valídala y corrígela si no es correcta.
 2. Indicar si el cliente conocía (o sabía que tenía) ese servicio adicional.
 3. Resumir en una frase corta la voz del cliente frente a ese servicio.
 4. Clasificar la voz del cliente en UNA de las siguientes frases EXACTAS (elige la que mejor represente lo que dice el cliente):
 
-- "No, fui a la oficina y no pude"
-- "No, me sale error"
-- "No, no lo he activado"
-- "No, no sabía"
-- "No, nunca lo hice"
-- "Sí, el técnico lo activó"
-- "Sí, lo uso"
-- "Sí, ya está activo."
-- "Sí, ya hice la activación"
-- "Sí, ya lo tengo"
-
-YA tenemos una detección automática preliminar del servicio: "{service_guess}".
-Tú debes validar si es correcto según el contenido de la llamada; si no lo es, corrígelo.
+""" + _BUCKETS_TEXT + """
 
 Devuelve EXCLUSIVAMENTE un JSON VÁLIDO con esta estructura:
 
-{{
+{
   "additional_service": "Netflix" | "HBO Max" | "Amazon Prime" | "Disney+" | "Star+" | "Paramount+" | "Claro Video" | "Otro" | "No identificado",
   "knows_additional_service": "Si" o "No",
   "customer_voice": "frase corta que resuma en palabras del cliente su percepción del servicio adicional",
   "voice_bucket": "UNA de las frases de la lista anterior, copiada EXACTAMENTE"
-}}
+}
 
 Reglas:
 - "knows_additional_service" debe ser EXACTAMENTE "Si" o "No" (sin tilde).
 - "voice_bucket" debe ser EXACTAMENTE una de las frases de la lista, sin inventar otras.
+- "customer_voice" debe ser UNA frase corta (máximo 25 palabras).
 - Si no se identifica claramente ningún servicio adicional, usa:
   - "additional_service": "No identificado"
   - "knows_additional_service": "No"
@@ -150,38 +180,246 @@ Reglas:
   - Para "voice_bucket" en ese caso, usa: "No, no sabía".
 - No incluyas texto antes ni después del JSON.
 - No inventes servicios ni frases que no tengan relación con la transcripción.
+"""
+
+# Parte variable (mensaje de usuario). Se completa con `service_guess` y `customer_transcript`.
+USER_TEMPLATE = """Detección automática preliminar del servicio: "{service_guess}"
 
 Transcripción de la llamada:
 
 \"\"\"{customer_transcript}\"\"\"
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",  # o el modelo de chat que estés utilizando
-        messages=[
-            {
-                "role": "system",
-                "content": "Eres un analista de calidad para call center y SIEMPRE devuelves JSON válido con las claves indicadas."
+# Instrucciones estáticas para analizar VARIAS llamadas en un solo request (ver `analyze_voc_batch`).
+BATCH_INSTRUCTIONS = """
+Eres analista de Voz del Cliente para una campaña de fidelización de servicios adicionales.
+
+En el mensaje del usuario hay VARIAS transcripciones de llamadas (en español), cada una identificada con su "call_id".
+Analiza CADA llamada por separado y, para cada una, debes:
+
+1. Confirmar cuál es el servicio adicional del que realmente habla el cliente
+   (por ejemplo: Netflix, HBO Max, Amazon Prime, Disney+, Star+, Paramount+, Claro Video).
+   Cada llamada trae una detección automática preliminar del servicio; valídala y corrígela si no es correcta.
+2. Indicar si el cliente conocía (o sabía que tenía) ese servicio adicional.
+3. Resumir en una frase corta la voz del cliente frente a ese servicio.
+4. Clasificar la voz del cliente en UNA de las siguientes frases EXACTAS:
+
+""" + _BUCKETS_TEXT + """
+
+Devuelve EXCLUSIVAMENTE un JSON VÁLIDO con esta estructura (un elemento por llamada):
+
+{
+  "resultados": [
+    {
+      "call_id": "el call_id de la llamada, copiado EXACTAMENTE",
+      "additional_service": "Netflix" | "HBO Max" | "Amazon Prime" | "Disney+" | "Star+" | "Paramount+" | "Claro Video" | "Otro" | "No identificado",
+      "knows_additional_service": "Si" o "No",
+      "customer_voice": "frase corta que resuma en palabras del cliente su percepción del servicio adicional",
+      "voice_bucket": "UNA de las frases de la lista anterior, copiada EXACTAMENTE"
+    }
+  ]
+}
+
+Reglas:
+- Incluye un elemento por CADA call_id recibido, sin mezclar información entre llamadas.
+- "knows_additional_service" debe ser EXACTAMENTE "Si" o "No" (sin tilde).
+- "voice_bucket" debe ser EXACTAMENTE una de las frases de la lista, sin inventar otras.
+- "customer_voice" debe ser UNA frase corta (máximo 25 palabras).
+- Si en una llamada no se identifica claramente ningún servicio adicional, usa:
+  - "additional_service": "No identificado"
+  - "knows_additional_service": "No"
+  - "customer_voice": explica que no se evidencia conocimiento del servicio.
+  - Para "voice_bucket" en ese caso, usa: "No, no sabía".
+- No incluyas texto antes ni después del JSON.
+- No inventes servicios ni frases que no tengan relación con la transcripción.
+"""
+
+# Bloque de cada llamada dentro del mensaje de usuario del request agrupado
+BATCH_ITEM_TEMPLATE = """
+### call_id: {call_id}
+Detección preliminar del servicio: "{service_guess}"
+Transcripción:
+\"\"\"{customer_transcript}\"\"\"
+"""
+
+# ----- Esquemas de salida estructurada (buckets y servicios restringidos por enum) -----
+
+_VOC_PROPERTIES = {
+    "additional_service": {"type": "string", "enum": SERVICE_OPTIONS},
+    "knows_additional_service": {"type": "string", "enum": ["Si", "No"]},
+    "customer_voice": {"type": "string"},
+    "voice_bucket": {"type": "string", "enum": sorted(VALID_BUCKETS)},
+}
+
+VOC_SCHEMA = {
+    "name": "voz_cliente",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": _VOC_PROPERTIES,
+        "required": list(_VOC_PROPERTIES),
+        "additionalProperties": False,
+    },
+}
+
+VOC_BATCH_SCHEMA = {
+    "name": "voz_cliente_lote",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "resultados": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"call_id": {"type": "string"}, **_VOC_PROPERTIES},
+                    "required": ["call_id", *_VOC_PROPERTIES],
+                    "additionalProperties": False,
+                },
             },
-            {"role": "user", "content": prompt},
+        },
+        "required": ["resultados"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _compute_prompt_version() -> str:
+    """
+    Versión del prompt: hash corto de todo lo que define la respuesta del modelo
+    (mensaje de sistema, instrucciones, plantillas, esquemas, buckets válidos y diccionario de servicios).
+    Si alguien edita cualquiera de estos, la versión cambia y la caché de análisis
+    deja de reutilizar las respuestas viejas.
+    """
+    h = hashlib.sha256()
+    for part in (SYSTEM_PROMPT, INSTRUCTIONS, USER_TEMPLATE, BATCH_INSTRUCTIONS, BATCH_ITEM_TEMPLATE):
+        h.update(part.encode("utf-8"))
+    h.update(json.dumps([VOC_SCHEMA, VOC_BATCH_SCHEMA], ensure_ascii=False).encode("utf-8"))
+    h.update(json.dumps(sorted(VALID_BUCKETS), ensure_ascii=False).encode("utf-8"))
+    h.update(json.dumps(SERVICE_SYNONYMS, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+PROMPT_VERSION = _compute_prompt_version()
+
+
+# ===================== Request a OpenAI y consumo de tokens =====================
+
+_usage_lock = threading.Lock()
+_usage_totals = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "completion_tokens": 0,
+}
+
+
+def _record_usage(response, label: str) -> dict:
+    """
+    Registra e imprime los tokens de un request: prompt, prompt en caché del proveedor y completion.
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    current = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+    with _usage_lock:
+        _usage_totals["requests"] += 1
+        for k, v in current.items():
+            _usage_totals[k] += v
+
+    print(
+        f"[OpenAI] {label}: prompt={current['prompt_tokens']} "
+        f"(en caché={current['cached_tokens']}) completion={current['completion_tokens']}"
+    )
+    return current
+
+
+def get_usage_summary() -> dict:
+    """
+    Totales de tokens de OpenAI en este proceso, con el % del prompt servido desde la caché del proveedor.
+    """
+    with _usage_lock:
+        summary = dict(_usage_totals)
+    summary["cached_ratio"] = (
+        summary["cached_tokens"] / summary["prompt_tokens"] if summary["prompt_tokens"] else 0.0
+    )
+    return summary
+
+
+def _chat_request(instructions: str, user_content: str, schema: dict, max_tokens: int) -> dict:
+    """
+    Arma el request de chat con prefijo estático (sistema + instrucciones) y contenido variable al final.
+    Con OPENAI_STRUCTURED_OUTPUT activo, la respuesta se restringe al esquema JSON dado.
+    Es exactamente lo que se envía a OpenAI (y lo que se usa como llave de caché).
+    """
+    request = {
+        "model": OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": f"{SYSTEM_PROMPT}\n{instructions}"},
+            {"role": "user", "content": user_content},
         ],
-        temperature=0.1,
-        max_tokens=500,
+        "temperature": OPENAI_TEMPERATURE,
+        "max_tokens": max_tokens,
+    }
+    if OPENAI_STRUCTURED_OUTPUT:
+        request["response_format"] = {"type": "json_schema", "json_schema": schema}
+    return request
+
+
+def _chat_json(request: dict, label: str) -> str:
+    """
+    Envía un request armado con `_chat_request` y devuelve el texto crudo de la respuesta.
+    """
+    import openai
+    client = _get_client()
+
+    def _create():
+        with metrics.span("openai", label=label) as span:
+            try:
+                response = client.chat.completions.create(**request)
+            except openai.APIStatusError as e:
+                raise ProviderHTTPError(
+                    "OpenAI", e.status_code, str(e), retry_after=parse_retry_after(e.response.headers)
+                ) from e
+            except openai.APIConnectionError as e:  # incluye timeouts
+                raise ProviderHTTPError("OpenAI", None, str(e)) from e
+            span.update(_record_usage(response, label))
+        return response
+
+    # Costo estimado para el límite de tokens/minuto (~4 caracteres por token + respuesta máxima);
+    # se corrige con el uso real que informa la respuesta
+    estimated_tokens = sum(len(m["content"]) for m in request["messages"]) // 4 + request["max_tokens"]
+    response = openai_scheduler.call(
+        _create,
+        tokens=estimated_tokens,
+        actual_tokens=lambda r: getattr(getattr(r, "usage", None), "total_tokens", None) or estimated_tokens,
     )
+    return response.choices[0].message.content.strip()
 
-    raw = response.choices[0].message.content.strip()
 
-    # ---- Parseo robusto del JSON devuelto ----
+# ===================== Función principal de análisis =====================
+
+def _parse_model_json(raw: str) -> dict:
+    """
+    Parseo robusto del JSON devuelto por el modelo.
+    """
     try:
-        data = json.loads(raw)
+        return json.loads(raw)
     except Exception:
         first = raw.find("{")
         last = raw.rfind("}")
         if first != -1 and last != -1 and last > first:
-            data = json.loads(raw[first:last + 1])
-        else:
-            raise ValueError(f"No se pudo parsear JSON desde la respuesta del modelo:\n{raw}")
+            return json.loads(raw[first:last + 1])
+        raise ValueError(f"No se pudo parsear JSON desde la respuesta del modelo:\n{raw}")
+
 
+def _normalize_voc(data: dict, customer_transcript: str, service_guess: str) -> dict:
+    """
+    Normaliza la respuesta cruda del modelo al formato final de `analyze_voc`.
+    """
     add_service = (data.get("additional_service") or "").strip()
     knows = (data.get("knows_additional_service") or data.get("knows") or "").strip()
     voice = (data.get("customer_voice") or data.get("voz_cliente") or "").strip()
@@ -212,3 +450,205 @@ Transcripción de la llamada:
         "voice_bucket": voice_bucket,
         "sentiment": sentiment,
     }
+
+
+def _analysis_request(customer_transcript: str, service_guess: str) -> dict:
+    """
+    Request de análisis de UNA llamada (también define su llave en la caché de análisis).
+    """
+    user_content = USER_TEMPLATE.format(
+        service_guess=service_guess,
+        customer_transcript=customer_transcript,
+    )
+    return _chat_request(INSTRUCTIONS, user_content, VOC_SCHEMA, OPENAI_MAX_COMPLETION_TOKENS)
+
+
+def analyze_voc(customer_transcript: str) -> dict:
+    """
+    Analiza la transcripción de UNA llamada (campaña Fidelización) y devuelve:
+
+    - additional_service: servicio adicional detectado (Netflix, HBO Max, Amazon Prime, etc.)
+    - knows_additional_service: "Si" | "No"
+    - customer_voice: resumen corto en palabras del cliente (texto libre)
+    - voice_bucket: una de las frases generales predefinidas
+    - sentiment: "positivo" | "negativo" | "neutral" (por diccionario)
+
+    Si la caché de análisis está activa y ya se envió este mismo request (mensajes,
+    modelo, temperatura, formato de respuesta y límite de tokens) con la misma versión
+    de prompt, no se llama a OpenAI.
+    """
+
+    # 1) Detectamos servicio adicional por heurística (palabras clave)
+    service_guess = detect_additional_service(customer_transcript)
+
+    # 2) Request a OpenAI: instrucciones estáticas + (detección preliminar y transcripción) al final
+    request = _analysis_request(customer_transcript, service_guess)
+
+    # 3) Buscamos en caché la respuesta del modelo para este request
+    cache_key = None
+    data = None
+    if LLM_CACHE_ENABLED:
+        with metrics.span("cache_analisis") as span:
+            cache_key = analysis_cache_key(request, PROMPT_VERSION)
+            data = get_llm_cache().get(cache_key)
+            span["hit"] = data is not None
+
+    if data is None:
+        raw = _chat_json(request, "análisis")
+        with metrics.span("parseo"):
+            data = _parse_model_json(raw)
+
+        if cache_key is not None:
+            get_llm_cache().put(cache_key, data, PROMPT_VERSION, OPENAI_MODEL, OPENAI_TEMPERATURE)
+
+    # 4) Normalizamos servicio, Si/No, bucket y sentimiento
+    with metrics.span("normalizacion"):
+        return _normalize_voc(data, customer_transcript, service_guess)
+
+
+# ===================== Análisis agrupado (varias llamadas por request) =====================
+
+def _is_valid_batch_item(item: dict) -> bool:
+    """
+    Un elemento de la respuesta agrupada es válido si trae bucket de la lista y Si/No.
+    (Si no lo es, esa llamada se reintenta sola con `analyze_voc`.)
+    """
+    knows = str(item.get("knows_additional_service") or "").strip().lower()
+    return (
+        str(item.get("voice_bucket") or "").strip() in VALID_BUCKETS
+        and knows in ("si", "sí", "no")
+    )
+
+
+def pack_batches(transcripts: Dict[str, str], max_chars: int = VOC_MAX_CHARS,
+                 max_items: int = VOC_BATCH_MAX_ITEMS) -> List[List[str]]:
+    """
+    Agrupa los call_id en lotes cuya suma de caracteres no supere `max_chars`
+    ni `max_items` llamadas. Respeta el orden recibido.
+    Una transcripción que por sí sola supera el presupuesto queda en un lote propio.
+    """
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_chars = 0
+    for call_id, transcript in transcripts.items():
+        size = len(transcript) + len(call_id)
+        if current and (current_chars + size > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(call_id)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _analyze_batch_request(items: Dict[str, str], guesses: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Envía UN request con varias transcripciones y devuelve {call_id: JSON crudo} solo
+    para los elementos válidos. Los que falten o vengan mal quedan fuera.
+    """
+    calls_block = "".join(
+        BATCH_ITEM_TEMPLATE.format(
+            call_id=call_id,
+            service_guess=guesses[call_id],
+            customer_transcript=transcript,
+        )
+        for call_id, transcript in items.items()
+    )
+    request = _chat_request(
+        BATCH_INSTRUCTIONS,
+        calls_block,
+        VOC_BATCH_SCHEMA,
+        OPENAI_MAX_COMPLETION_TOKENS * len(items),
+    )
+    raw = _chat_json(request, f"análisis agrupado ({len(items)} llamadas)")
+
+    try:
+        parsed = json.loads(raw)
+    except Exception:
+        # Puede venir como arreglo suelto o con texto alrededor
+        first = raw.find("[")
+        last = raw.rfind("]")
+        if first != -1 and last > first:
+            parsed = json.loads(raw[first:last + 1])
+        else:
+            parsed = _parse_model_json(raw)
+
+    elements = parsed.get("resultados", []) if isinstance(parsed, dict) else parsed
+
+    valid = {}
+    for element in elements or []:
+        if not isinstance(element, dict):
+            continue
+        call_id = str(element.get("call_id") or "").strip()
+        if call_id in items and call_id not in valid and _is_valid_batch_item(element):
+            valid[call_id] = element
+    return valid
+
+
+def analyze_voc_batch(
+    transcripts: Dict[str, str],
+    errors: Optional[Dict[str, Exception]] = None,
+) -> Dict[str, dict]:
+    """
+    Analiza VARIAS llamadas agrupando transcripciones cortas en un mismo request
+    (hasta VOC_MAX_CHARS caracteres y VOC_BATCH_MAX_ITEMS llamadas por request),
+    para no repetir las instrucciones en cada llamada.
+
+    Recibe {call_id: transcripción} y devuelve {call_id: resultado}, con el mismo
+    formato y normalización de `analyze_voc`. Las llamadas que ya están en caché no
+    se envían; las que el modelo omite o devuelve mal se reintentan solas con `analyze_voc`.
+    Si se entrega `errors`, una llamada que falla sola se anota ahí ({call_id: excepción})
+    y queda fuera del resultado, en vez de hacer fallar a todo el grupo.
+    """
+    guesses = {call_id: detect_additional_service(t) for call_id, t in transcripts.items()}
+    raw_results: Dict[str, dict] = {}
+
+    # 1) Lo que ya está en caché no se envía. La llave es la del request individual
+    #    (`analyze_voc`), así ambos caminos comparten las mismas entradas.
+    cache_keys: Dict[str, str] = {}
+    pending: Dict[str, str] = {}
+    for call_id, transcript in transcripts.items():
+        data = None
+        if LLM_CACHE_ENABLED:
+            key = analysis_cache_key(_analysis_request(transcript, guesses[call_id]), PROMPT_VERSION)
+            cache_keys[call_id] = key
+            data = get_llm_cache().get(key)
+        if data is not None:
+            raw_results[call_id] = data
+        else:
+            pending[call_id] = transcript
+
+    # 2) El resto se agrupa en requests hasta el presupuesto de caracteres
+    for batch_ids in pack_batches(pending):
+        items = {call_id: pending[call_id] for call_id in batch_ids}
+        if len(items) == 1:
+            continue  # una sola llamada: va directo por analyze_voc (paso 3)
+        try:
+            valid = _analyze_batch_request(items, guesses)
+        except Exception as e:
+            print(f"[OpenAI] Falló el request agrupado de {len(items)} llamadas ({e}). Se analizarán una a una.")
+            continue
+
+        for call_id, data in valid.items():
+            raw_results[call_id] = data
+            if LLM_CACHE_ENABLED:
+                get_llm_cache().put(cache_keys[call_id], data, PROMPT_VERSION, OPENAI_MODEL, OPENAI_TEMPERATURE)
+
+        missing = len(items) - len(valid)
+        if missing:
+            print(f"[OpenAI] {missing} de {len(items)} llamadas del request agrupado no fueron válidas; se reintentan solas.")
+
+    # 3) Normalizar lo obtenido y completar lo faltante llamada por llamada
+    results: Dict[str, dict] = {}
+    for call_id, transcript in transcripts.items():
+        if call_id in raw_results:
+            results[call_id] = _normalize_voc(raw_results[call_id], transcript, guesses[call_id])
+        elif errors is None:
+            results[call_id] = analyze_voc(transcript)
+        else:
+            try:
+                results[call_id] = analyze_voc(transcript)
+            except Exception as e:
+                errors[call_id] = e
+    return results
@@ -0,0 +1,162 @@
+# src/audio.py
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from .config import (
+    CACHE_DIR,
+    FFMPEG_BIN,
+    VOC_AUDIO_FORMAT,
+    VOC_AUDIO_SAMPLE_RATE,
+    VOC_AUDIO_OPUS_BITRATE,
+    VOC_AUDIO_TRIM_SILENCE,
+    VOC_AUDIO_SILENCE_DB,
+    VOC_AUDIO_WORKERS,
+    VOC_AUDIO_CACHE_MAX_MB,
+)
+from .metrics import metrics
+from .transcript_cache import file_digest
+
+# Carpeta de los audios ya procesados (junto a la caché de transcripciones)
+AUDIO_CACHE_DIR = CACHE_DIR / "audio"
+
+# Códec y extensión de salida por formato
+OUTPUT_FORMATS = {
+    "flac": (["-c:a", "flac"], ".flac"),
+    "opus": (["-c:a", "libopus", "-b:a", VOC_AUDIO_OPUS_BITRATE, "-application", "voip"], ".ogg"),
+    "wav": (["-c:a", "pcm_s16le"], ".wav"),
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_warned = False
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def _settings_tag() -> str:
+    """
+    Parámetros que cambian el resultado: si cambian, el audio se vuelve a procesar.
+    """
+    trim = f"trim{VOC_AUDIO_SILENCE_DB:g}" if VOC_AUDIO_TRIM_SILENCE else "notrim"
+    bitrate = VOC_AUDIO_OPUS_BITRATE if VOC_AUDIO_FORMAT == "opus" else ""
+    return f"{VOC_AUDIO_FORMAT}|{VOC_AUDIO_SAMPLE_RATE}|mono|{trim}|{bitrate}"
+
+
+def _ffmpeg_command(source: Path, target: Path) -> list:
+    codec, _ = OUTPUT_FORMATS[VOC_AUDIO_FORMAT]
+    cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y", "-i", str(source), "-vn"]
+    if VOC_AUDIO_TRIM_SILENCE:
+        # Silencio al inicio; luego se invierte el audio para recortar también el del final
+        trim = (
+            f"silenceremove=start_periods=1:start_duration=0.3:start_threshold={VOC_AUDIO_SILENCE_DB:g}dB"
+        )
+        cmd += ["-af", f"{trim},areverse,{trim},areverse"]
+    cmd += ["-ac", "1", "-ar", str(VOC_AUDIO_SAMPLE_RATE), *codec, str(target)]
+    return cmd
+
+
+def preprocess_audio(source: Path) -> dict:
+    """
+    Convierte un audio a mono / VOC_AUDIO_SAMPLE_RATE Hz / VOC_AUDIO_FORMAT, recortando
+    silencios al inicio y al final. Se ejecuta en un proceso aparte (ver `prepare_upload`).
+
+    El resultado queda en AUDIO_CACHE_DIR con el hash del audio ORIGINAL + parámetros,
+    así que cada audio se procesa una sola vez. Devuelve la ruta y los tamaños antes/después.
+    """
+    _, ext = OUTPUT_FORMATS[VOC_AUDIO_FORMAT]
+    key = file_digest(source, _settings_tag())
+    target = AUDIO_CACHE_DIR / f"{key}{ext}"
+    original_bytes = source.stat().st_size
+
+    cached = target.exists()
+    if not cached:
+        AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{key}.{os.getpid()}.tmp{ext}")
+        result = subprocess.run(_ffmpeg_command(source, tmp), capture_output=True, text=True)
+        if result.returncode != 0 or not tmp.exists():
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(f"ffmpeg falló con {source.name}: {result.stderr.strip()[:500]}")
+        tmp.replace(target)
+    else:
+        target.touch()  # marca de último uso para el desalojo
+
+    return {
+        "path": str(target),
+        "original_bytes": original_bytes,
+        "processed_bytes": target.stat().st_size,
+        "cached": cached,
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=VOC_AUDIO_WORKERS)
+    return _pool
+
+
+def prepare_upload(path: Path) -> Path:
+    """
+    Devuelve el archivo que conviene subir a Deepgram: el pre-procesado si ffmpeg está
+    disponible y el resultado es más liviano, o el original en cualquier otro caso
+    (sin ffmpeg, si falla la conversión o si el resultado pesa más, p.ej. un MP3 de baja tasa a FLAC).
+    """
+    global _warned
+    if not ffmpeg_available():
+        with _pool_lock:
+            if not _warned:
+                print(f"[Audio] ⚠ No se encontró '{FFMPEG_BIN}': se suben los audios originales.")
+                _warned = True
+        return path
+
+    with metrics.span("preproceso_audio", call_id=path.stem) as span:
+        try:
+            info = _get_pool().submit(preprocess_audio, path).result()
+        except Exception as e:
+            span["fallback"] = True
+            print(f"[Audio] ⚠ {path.name}: no se pudo pre-procesar ({e}); se sube el original.")
+            return path
+        span.update(info)
+
+    before, after = info["original_bytes"], info["processed_bytes"]
+    if after >= before:
+        print(
+            f"[Audio] {path.name}: el pre-procesado no reduce el tamaño "
+            f"({after:,} >= {before:,} bytes); se sube el original."
+        )
+        return path
+    origin = "caché" if info["cached"] else "ffmpeg"
+    print(f"[Audio] {path.name}: {before:,} -> {after:,} bytes ({1 - after / before:.0%} menos, {origin})")
+    return Path(info["path"])
+
+
+def evict_audio_cache(max_mb: int = VOC_AUDIO_CACHE_MAX_MB):
+    """
+    Mantiene AUDIO_CACHE_DIR bajo `max_mb` borrando primero los archivos usados hace más tiempo.
+    """
+    if max_mb <= 0 or not AUDIO_CACHE_DIR.exists():
+        return
+    files = [(p, p.stat()) for p in AUDIO_CACHE_DIR.iterdir() if p.is_file()]
+    total = sum(st.st_size for _, st in files)
+    limit = max_mb * 1024 * 1024
+    for p, st in sorted(files, key=lambda item: item[1].st_mtime):
+        if total <= limit:
+            break
+        p.unlink(missing_ok=True)
+        total -= st.st_size
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
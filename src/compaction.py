@@ -0,0 +1,234 @@
+# src/compaction.py
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from .analyzer import SERVICE_SYNONYMS
+from .config import (
+    OPENAI_MODEL,
+    TRANSCRIPTS_DIR,
+    VOC_COMPACT,
+    VOC_COMPACT_CONTEXT,
+    VOC_COMPACT_WINDOW_CHARS,
+    VOC_MAX_CHARS,
+    VOC_MAX_TRANSCRIPT_TOKENS,
+)
+from .matcher import KeywordMatcher
+from .metrics import metrics
+
+# Palabras de pago / cobranza que también marcan un turno del asesor como relevante
+PAYMENT_KEYWORDS = [
+    "pago", "pagos", "pagar", "pague", "deuda", "debe", "saldo", "cuota", "cuotas",
+    "factura", "mora", "acuerdo de pago", "abono", "cobro", "cobranza", "plan",
+]
+
+# Frases típicas del asesor al presentarse (sirven para saber qué hablante es el asesor)
+AGENT_PHRASES = [
+    "le habla", "mi nombre es", "lo llamo de", "la llamo de", "le llamo de", "de colsubsidio",
+    "hablo con el titular", "hablo con la titular", "gracias por su tiempo", "que tenga buen dia",
+]
+
+COMPACTION_MATCHER = KeywordMatcher({
+    **{k: ("servicio", canonical) for k, canonical in SERVICE_SYNONYMS.items()},
+    **{k: ("pago", k) for k in PAYMENT_KEYWORDS},
+})
+AGENT_MATCHER = KeywordMatcher({k: ("asesor", k) for k in AGENT_PHRASES})
+
+GAP = "[...]"
+
+
+# ===================== Turnos (diarización de Deepgram) =====================
+
+def utterances_path(call_id: str) -> Path:
+    return TRANSCRIPTS_DIR / f"{call_id}.utterances.json"
+
+
+def save_utterances(call_id: str, utterances: List[dict]):
+    """
+    Guarda los turnos de la llamada junto a la transcripción (TRANSCRIPTS_DIR/<id>.utterances.json).
+    """
+    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    utterances_path(call_id).write_text(json.dumps(utterances, ensure_ascii=False), encoding="utf-8")
+
+
+def slim_utterances(utterances: List[dict]) -> List[dict]:
+    """
+    Solo lo necesario de cada turno de Deepgram: hablante, inicio, fin y texto.
+    """
+    return [
+        {
+            "speaker": u.get("speaker"),
+            "start": u.get("start"),
+            "end": u.get("end"),
+            "transcript": u.get("transcript", ""),
+        }
+        for u in utterances or []
+    ]
+
+
+def load_utterances(call_id: Optional[str]) -> Optional[List[dict]]:
+    if not call_id:
+        return None
+    path = utterances_path(call_id)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (ValueError, OSError):
+        return None
+
+
+def _agent_speaker(utterances: List[dict]):
+    """
+    El asesor es el hablante con más frases de presentación/cierre; si no hay, el que más habla
+    (en las llamadas salientes de la campaña el asesor lleva la conversación).
+    """
+    scores = {}
+    for u in utterances:
+        words = len(u["transcript"].split())
+        phrases = len(AGENT_MATCHER.find_all(u["transcript"]))
+        score = scores.setdefault(u["speaker"], [0, 0])
+        score[0] += phrases
+        score[1] += words
+    return max(scores, key=lambda s: tuple(scores[s]))
+
+
+def compact_utterances(utterances: List[dict]) -> Optional[str]:
+    """
+    Todos los turnos del cliente y, del asesor, solo los que mencionan servicios o pagos
+    (con VOC_COMPACT_CONTEXT turnos de contexto). Devuelve None si no hay dos hablantes.
+    """
+    if len({u["speaker"] for u in utterances}) < 2:
+        return None
+    agent = _agent_speaker(utterances)
+
+    keep = set()
+    for i, u in enumerate(utterances):
+        if u["speaker"] != agent:
+            keep.add(i)
+        elif COMPACTION_MATCHER.find_all(u["transcript"]):
+            keep.update(range(max(0, i - VOC_COMPACT_CONTEXT), min(len(utterances), i + VOC_COMPACT_CONTEXT + 1)))
+
+    lines, last = [], -1
+    for i in sorted(keep):
+        if i > last + 1:
+            lines.append(GAP)
+        u = utterances[i]
+        lines.append(f"{'Asesor' if u['speaker'] == agent else 'Cliente'}: {u['transcript'].strip()}")
+        last = i
+    if last < len(utterances) - 1:
+        lines.append(GAP)
+    return "\n".join(lines)
+
+
+# ===================== Sin diarización: ventanas alrededor de palabras clave =====================
+
+def keyword_windows(text: str, window: int = VOC_COMPACT_WINDOW_CHARS) -> str:
+    """
+    Conserva `window` caracteres antes y después de cada mención de servicio o pago
+    (uniendo las ventanas que se tocan). Sin menciones, devuelve el texto completo.
+    """
+    hits = COMPACTION_MATCHER.find_all(text)
+    if not hits:
+        return text
+    spans = []
+    for h in hits:
+        start, end = max(0, h.start - window), min(len(text), h.end + window)
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+
+    # Ajuste a límites de palabra
+    parts = []
+    for start, end in spans:
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        while end < len(text) and not text[end].isspace():
+            end += 1
+        parts.append(text[start:end].strip())
+    prefix = f"{GAP} " if spans[0][0] > 0 else ""
+    suffix = f" {GAP}" if spans[-1][1] < len(text) else ""
+    return prefix + f" {GAP} ".join(parts) + suffix
+
+
+# ===================== Presupuesto de tokens =====================
+
+_encoding = None
+
+
+def _get_encoding():
+    """
+    Tokenizador del modelo (tiktoken) si está instalado; None si no.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    return len(enc.encode(text)) if enc else (len(text) + 3) // 4
+
+
+def enforce_budget(text: str, max_chars: int = VOC_MAX_CHARS, max_tokens: int = VOC_MAX_TRANSCRIPT_TOKENS) -> str:
+    """
+    Recorta el texto para que no supere `max_chars` caracteres ni `max_tokens` tokens.
+
+    Se conserva el inicio (30%: saludo, identificación, oferta) y el final (70%: donde el cliente
+    suele dar su respuesta), con "[...]" en el medio. Con tiktoken el corte es exacto en tokens;
+    sin él, se estima con ~4 caracteres por token y se corta en un límite de palabra.
+    """
+    enc = _get_encoding()
+    if enc:
+        tokens = enc.encode(text)
+        if len(tokens) > max_tokens:
+            head = int(max_tokens * 0.3)
+            tail = max_tokens - head - 4  # margen para el separador
+            text = f"{enc.decode(tokens[:head]).rstrip()} {GAP} {enc.decode(tokens[-tail:]).lstrip()}"
+    limit = max_chars if enc else min(max_chars, max_tokens * 4)
+    if len(text) > limit:
+        head = int(limit * 0.3)
+        tail = limit - head - len(GAP) - 2
+        head_text = text[:head].rsplit(" ", 1)[0]
+        tail_text = text[-tail:].split(" ", 1)[-1]
+        text = f"{head_text} {GAP} {tail_text}"
+    return text
+
+
+def prepare_for_analysis(transcript: str, call_id: Optional[str] = None) -> str:
+    """
+    Transcripción que se envía al análisis:
+    - Con VOC_COMPACT: turnos del cliente + turnos del asesor con servicios/pagos (si hay diarización),
+      o ventanas alrededor de esas palabras clave (si no la hay).
+    - Siempre: dentro de VOC_MAX_CHARS caracteres y VOC_MAX_TRANSCRIPT_TOKENS tokens.
+    Imprime y registra en las métricas cuánto se redujo.
+    """
+    if not transcript:
+        return transcript
+    with metrics.span("compactacion", call_id=call_id) as span:
+        text = transcript
+        if VOC_COMPACT:
+            utterances = load_utterances(call_id)
+            compacted = compact_utterances(utterances) if utterances else None
+            span["mode"] = "turnos" if compacted is not None else "ventanas"
+            text = compacted if compacted is not None else keyword_windows(transcript)
+        text = enforce_budget(text)
+        span["chars_before"] = len(transcript)
+        span["chars_after"] = len(text)
+        span["tokens_after"] = count_tokens(text)
+
+    if len(text) < len(transcript):
+        print(
+            f"[Compactación] {call_id or ''}: {len(transcript):,} -> {len(text):,} caracteres "
+            f"({1 - len(text) / len(transcript):.0%} menos)"
+        )
+    return text
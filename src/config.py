@@ -22,15 +22,158 @@ OPENAI_API_KEY   = os.getenv("OPENAI_API_KEY")
 
 # ===== Configuración de Deepgram =====
 # Se leen del .env, pero tienen valores por defecto
+DEEPGRAM_URL   = os.getenv("DEEPGRAM_URL", "https://api.deepgram.com/v1/listen")
 DEEPGRAM_MODEL = os.getenv("DEEPGRAM_MODEL", "nova-3")
 DEEPGRAM_LANG  = os.getenv("DEEPGRAM_LANG",  "es-419")
+# Timeouts de la subida (segundos): conexión y espera de la respuesta (la transcripción tarda más que el audio)
+DEEPGRAM_CONNECT_TIMEOUT_S = float(os.getenv("DEEPGRAM_CONNECT_TIMEOUT_S", 10))
+DEEPGRAM_READ_TIMEOUT_S    = float(os.getenv("DEEPGRAM_READ_TIMEOUT_S", 300))
 
 # ===== Configuración de análisis de Voz del Cliente =====
-# Máximo de caracteres por análisis (por si luego agrupamos transcripciones)
+# Máximo de caracteres por análisis (también es el presupuesto de cada request agrupado).
+# Las transcripciones más largas se recortan antes de enviarlas (ver src/compaction.py).
 VOC_MAX_CHARS = int(os.getenv("VOC_MAX_CHARS", 20000))
+# Máximo de tokens de la transcripción por análisis (0 = VOC_MAX_CHARS / 4).
+# Se cuenta con el tokenizador del modelo si `tiktoken` está instalado; si no, se estima.
+VOC_MAX_TRANSCRIPT_TOKENS = int(os.getenv("VOC_MAX_TRANSCRIPT_TOKENS", 0)) or VOC_MAX_CHARS // 4
+
+# Compactación: con la diarización de Deepgram se envían a OpenAI solo los turnos del cliente
+# y los del asesor alrededor de menciones de servicios o pagos (VOC_COMPACT_CONTEXT turnos antes/después).
+VOC_COMPACT = os.getenv("VOC_COMPACT", "0") == "1"
+VOC_COMPACT_CONTEXT = int(os.getenv("VOC_COMPACT_CONTEXT", 1))
+# Sin diarización: caracteres que se conservan antes/después de cada palabra clave
+VOC_COMPACT_WINDOW_CHARS = int(os.getenv("VOC_COMPACT_WINDOW_CHARS", 400))
+
+# Análisis agrupado: varias transcripciones cortas en un solo request a OpenAI
+# (hasta VOC_MAX_CHARS caracteres y VOC_BATCH_MAX_ITEMS llamadas por request)
+VOC_BATCH_ANALYSIS = os.getenv("VOC_BATCH_ANALYSIS", "0") == "1"
+VOC_BATCH_MAX_ITEMS = max(1, int(os.getenv("VOC_BATCH_MAX_ITEMS", 10)))
 
 # ⚠️ Se mantiene el máximo de llamadas por batch, como pediste
 VOC_MAX_CALLS_PER_BATCH = int(os.getenv("VOC_MAX_CALLS_PER_BATCH", 150))
 
 # Servicio adicional por defecto (ya casi no lo usamos, pero lo dejamos por compatibilidad)
 ADDITIONAL_SERVICE = os.getenv("ADDITIONAL_SERVICE", "Netflix")
+
+# ===== Concurrencia del pipeline =====
+# "concurrente": Deepgram y OpenAI trabajan en paralelo (cada uno con su propio límite)
+# "secuencial": una llamada a la vez, como se hacía originalmente
+VOC_PIPELINE_MODE = os.getenv("VOC_PIPELINE_MODE", "concurrente").strip().lower()
+
+# Máximo de transcripciones simultáneas contra Deepgram
+DEEPGRAM_CONCURRENCY = max(1, int(os.getenv("DEEPGRAM_CONCURRENCY", 4)))
+
+# Máximo de análisis simultáneos contra OpenAI
+OPENAI_CONCURRENCY = max(1, int(os.getenv("OPENAI_CONCURRENCY", 4)))
+
+# ===== Cachés locales =====
+# Carpeta donde se guardan las cachés (transcripciones, análisis, etc.)
+CACHE_DIR = Path(os.getenv("CACHE_DIR", OUTPUT_DIR / "cache"))
+
+# Caché de transcripciones por contenido del audio (evita pagar Deepgram dos veces)
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "1"
+TRANSCRIPT_CACHE_MAX_MB = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", 500))
+TRANSCRIPT_CACHE_MAX_AGE_DAYS = int(os.getenv("TRANSCRIPT_CACHE_MAX_AGE_DAYS", 365))
+
+# ===== Configuración de OpenAI =====
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# URL base de la API (vacía = la oficial); permite apuntar a un servidor local de pruebas
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", 0.1))
+
+# Presupuesto de tokens de respuesta por llamada (el JSON de salida es corto)
+OPENAI_MAX_COMPLETION_TOKENS = int(os.getenv("OPENAI_MAX_COMPLETION_TOKENS", 160))
+
+# Salida estructurada (JSON schema con buckets y servicios restringidos por enum)
+OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "1") == "1"
+
+# Caché de análisis (request completo a OpenAI + versión del prompt)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 200000))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 200))
+
+# ===== Exportación a Excel =====
+# Los resultados se guardan siempre en el almacén local (output/state/results.sqlite).
+# El Excel es un derivado que se regenera según este modo:
+# - "cada_ejecucion": al final de cada ejecución (comportamiento original)
+# - "programado": solo si el Excel tiene más de VOC_EXCEL_INTERVAL_HOURS horas
+# - "bajo_demanda": solo con `python main.py --exportar-excel`
+VOC_EXCEL_MODE = os.getenv("VOC_EXCEL_MODE", "cada_ejecucion").strip().lower()
+VOC_EXCEL_INTERVAL_HOURS = float(os.getenv("VOC_EXCEL_INTERVAL_HOURS", 24))
+# Partición del Excel:
+# - "ninguna": un solo archivo con todo el histórico (comportamiento original)
+# - "mes": un archivo por mes de llamada (voz_cliente_fidelizacion_IA_YYYY-mm.xlsx);
+#   en cada ejecución solo se reescriben los meses que recibieron filas nuevas
+VOC_EXCEL_PARTITION = os.getenv("VOC_EXCEL_PARTITION", "ninguna").strip().lower()
+
+# ===== Clasificación por niveles =====
+# Si está activo, un clasificador local (reglas + diccionarios) resuelve las llamadas claras
+# y solo las de baja confianza se envían a OpenAI.
+VOC_TIERED = os.getenv("VOC_TIERED", "0") == "1"
+# Confianza mínima (0 a 1) para aceptar el resultado local sin llamar a OpenAI
+VOC_LOCAL_MIN_CONFIDENCE = float(os.getenv("VOC_LOCAL_MIN_CONFIDENCE", 0.75))
+# Transcripciones más largas que esto se consideran "no formulaicas" (bajan la confianza)
+VOC_LOCAL_MAX_CHARS = int(os.getenv("VOC_LOCAL_MAX_CHARS", 1500))
+# Fracción de llamadas resueltas localmente que igual se auditan con OpenAI para medir el acuerdo
+VOC_TIER_AUDIT_RATE = float(os.getenv("VOC_TIER_AUDIT_RATE", 0.05))
+
+# ===== Instrumentación =====
+# Perfilado con cProfile de toda la ejecución (output/logs/profile_*.prof). Desactivado no tiene costo.
+VOC_PROFILE = os.getenv("VOC_PROFILE", "0") == "1"
+
+# ===== Límites de las API y reintentos =====
+# Requests por minuto a Deepgram (0 = sin límite propio; Deepgram limita por concurrencia)
+DEEPGRAM_RPM = int(os.getenv("DEEPGRAM_RPM", 0))
+# Requests y tokens por minuto a OpenAI (cuota del proyecto; 0 = sin límite propio)
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", 500))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", 200000))
+# Reintentos ante 429, 5xx, timeouts y errores de conexión (backoff exponencial con jitter)
+VOC_MAX_RETRIES = max(0, int(os.getenv("VOC_MAX_RETRIES", 5)))
+VOC_RETRY_BASE_S = float(os.getenv("VOC_RETRY_BASE_S", 1.0))
+VOC_RETRY_MAX_S = float(os.getenv("VOC_RETRY_MAX_S", 60.0))
+
+# ===== Pre-procesamiento de audio (opcional, requiere ffmpeg) =====
+# Antes de subir a Deepgram: mono, remuestreo, recorte de silencios al inicio/fin y compresión.
+# El resultado se guarda en CACHE_DIR/audio (se calcula una sola vez por audio).
+VOC_AUDIO_PREPROCESS = os.getenv("VOC_AUDIO_PREPROCESS", "0") == "1"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+# Formato de salida: "flac" (sin pérdida), "opus" (más liviano) o "wav"
+VOC_AUDIO_FORMAT = os.getenv("VOC_AUDIO_FORMAT", "flac").strip().lower()
+VOC_AUDIO_SAMPLE_RATE = int(os.getenv("VOC_AUDIO_SAMPLE_RATE", 16000))
+VOC_AUDIO_OPUS_BITRATE = os.getenv("VOC_AUDIO_OPUS_BITRATE", "24k")
+VOC_AUDIO_TRIM_SILENCE = os.getenv("VOC_AUDIO_TRIM_SILENCE", "1") == "1"
+VOC_AUDIO_SILENCE_DB = float(os.getenv("VOC_AUDIO_SILENCE_DB", -50))
+# Procesos en paralelo para el pre-procesamiento
+VOC_AUDIO_WORKERS = max(1, int(os.getenv("VOC_AUDIO_WORKERS", min(4, os.cpu_count() or 1))))
+VOC_AUDIO_CACHE_MAX_MB = int(os.getenv("VOC_AUDIO_CACHE_MAX_MB", 2000))
+
+# ===== Audios largos =====
+# Si está activo, los audios de más de VOC_LONG_AUDIO_MIN_S segundos se dividen en tramos de
+# ~VOC_CHUNK_TARGET_S (cortando en silencios), se transcriben en paralelo y el texto se une en orden.
+VOC_LONG_AUDIO = os.getenv("VOC_LONG_AUDIO", "0") == "1"
+VOC_LONG_AUDIO_MIN_S = float(os.getenv("VOC_LONG_AUDIO_MIN_S", 900))
+VOC_CHUNK_TARGET_S = float(os.getenv("VOC_CHUNK_TARGET_S", 300))
+# Solapamiento entre tramos (las palabras repetidas se quitan al unir)
+VOC_CHUNK_OVERLAP_S = float(os.getenv("VOC_CHUNK_OVERLAP_S", 3))
+
+# ===== Modo daemon (python main.py --daemon) =====
+# Cada cuántos segundos se revisa la carpeta de entrada
+VOC_WATCH_POLL_S = float(os.getenv("VOC_WATCH_POLL_S", 5))
+# Segundos que un audio debe quedar sin cambiar de tamaño ni fecha antes de procesarlo
+# (evita tomar archivos que todavía se están copiando)
+VOC_WATCH_STABLE_S = float(os.getenv("VOC_WATCH_STABLE_S", 10))
+
+# ===== Workers (python main.py --worker / --merge) =====
+# Duración de la reserva de un audio por un worker; si el worker muere, otro la toma al vencer.
+# Mientras el worker vive, la reserva se renueva cada tercio de este tiempo.
+VOC_CLAIM_LEASE_S = float(os.getenv("VOC_CLAIM_LEASE_S", 600))
+
+# ===== Llamadas fallidas (python main.py --reintentar-fallidos) =====
+# Una llamada que falla (transcripción o análisis) no detiene el batch: queda en la cola de
+# fallidas (output/state/dead_letter.sqlite) y las ejecuciones normales la omiten.
+# Al reintentar, cada llamada espera VOC_DLQ_BASE_S * 2^(intentos-1) segundos (máx. VOC_DLQ_MAX_S)
+# desde su último fallo; tras VOC_DLQ_MAX_ATTEMPTS intentos queda para revisión manual.
+VOC_DLQ_MAX_ATTEMPTS = max(1, int(os.getenv("VOC_DLQ_MAX_ATTEMPTS", 5)))
+VOC_DLQ_BASE_S = float(os.getenv("VOC_DLQ_BASE_S", 300))
+VOC_DLQ_MAX_S = float(os.getenv("VOC_DLQ_MAX_S", 86400))
@@ -0,0 +1,146 @@
+# src/dead_letter.py
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .config import VOC_DLQ_BASE_S, VOC_DLQ_MAX_ATTEMPTS, VOC_DLQ_MAX_S
+from .result_store import state_dir
+from .storage import connect_sqlite, filter_in
+
+
+def backoff_s(attempts: int) -> float:
+    """
+    Espera antes del siguiente reintento de una llamada que ya falló `attempts` veces.
+    """
+    return min(VOC_DLQ_MAX_S, VOC_DLQ_BASE_S * 2 ** max(0, attempts - 1))
+
+
+class DeadLetterQueue:
+    """
+    Cola persistente de llamadas fallidas (SQLite, una fila por llamada).
+
+    Guarda la etapa en que falló (transcripción / análisis), el último error, los intentos
+    y cuándo se puede reintentar. Las ejecuciones normales omiten las llamadas en cola;
+    `python main.py --reintentar-fallidos` reintenta las que ya cumplieron su espera.
+    Al terminar bien, la llamada sale de la cola.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letter (
+                    call_id          TEXT PRIMARY KEY,
+                    source_path      TEXT NOT NULL,
+                    stage            TEXT NOT NULL,
+                    error            TEXT NOT NULL,
+                    detail           TEXT,
+                    attempts         INTEGER NOT NULL,
+                    first_failed_at  REAL NOT NULL,
+                    last_failed_at   REAL NOT NULL,
+                    next_attempt_at  REAL NOT NULL
+                )
+                """
+            )
+
+    def record_failure(self, call_id: str, source_path: Path, stage: str, error: BaseException) -> int:
+        """
+        Registra (o actualiza) el fallo de una llamada. Devuelve el número de intentos acumulados.
+        """
+        now = time.time()
+        message = f"{type(error).__name__}: {error}"[:2000]
+        detail = "".join(traceback.format_exception(type(error), error, error.__traceback__))[-8000:]
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT attempts FROM dead_letter WHERE call_id = ?", (call_id,)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            self._conn.execute(
+                """
+                INSERT INTO dead_letter (call_id, source_path, stage, error, detail, attempts,
+                                         first_failed_at, last_failed_at, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(call_id) DO UPDATE SET
+                    source_path = excluded.source_path,
+                    stage = excluded.stage,
+                    error = excluded.error,
+                    detail = excluded.detail,
+                    attempts = excluded.attempts,
+                    last_failed_at = excluded.last_failed_at,
+                    next_attempt_at = excluded.next_attempt_at
+                """,
+                (call_id, str(source_path), stage, message, detail, attempts,
+                 now, now, now + backoff_s(attempts)),
+            )
+        return attempts
+
+    def filter_not_queued(self, call_ids: Iterable[str]) -> List[str]:
+        """
+        Devuelve, en el mismo orden, los IDs que NO están en la cola de fallidas.
+        """
+        call_ids = list(call_ids)
+        with self._lock:
+            queued = filter_in(self._conn, "SELECT call_id FROM dead_letter WHERE call_id IN ({marks})", call_ids)
+        return [c for c in call_ids if c not in queued]
+
+    def due(
+        self,
+        now: Optional[float] = None,
+        include_exhausted: bool = False,
+        ignore_backoff: bool = False,
+    ) -> List[dict]:
+        """
+        Llamadas que ya se pueden reintentar (cumplieron su espera), las más antiguas primero.
+        Las que agotaron VOC_DLQ_MAX_ATTEMPTS solo se incluyen con `include_exhausted`.
+        Con `ignore_backoff` se incluyen todas, aunque no haya vencido su espera.
+        """
+        now = float("inf") if ignore_backoff else (time.time() if now is None else now)
+        query = (
+            "SELECT call_id, source_path, stage, error, attempts, next_attempt_at FROM dead_letter "
+            "WHERE next_attempt_at <= ?"
+        )
+        params: list = [now]
+        if not include_exhausted:
+            query += " AND attempts < ?"
+            params.append(VOC_DLQ_MAX_ATTEMPTS)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY first_failed_at", params).fetchall()
+        keys = ("call_id", "source_path", "stage", "error", "attempts", "next_attempt_at")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def summary(self) -> dict:
+        """
+        Totales de la cola: en espera, listas para reintentar y agotadas, y fallos por etapa.
+        """
+        now = time.time()
+        with self._lock:
+            total, ready, exhausted = self._conn.execute(
+                """
+                SELECT COUNT(*),
+                       COALESCE(SUM(next_attempt_at <= ? AND attempts < ?), 0),
+                       COALESCE(SUM(attempts >= ?), 0)
+                FROM dead_letter
+                """,
+                (now, VOC_DLQ_MAX_ATTEMPTS, VOC_DLQ_MAX_ATTEMPTS),
+            ).fetchone()
+            by_stage = dict(self._conn.execute("SELECT stage, COUNT(*) FROM dead_letter GROUP BY stage"))
+        return {"total": total, "ready": ready, "exhausted": exhausted, "by_stage": by_stage}
+
+    def remove(self, call_ids: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM dead_letter WHERE call_id = ?",
+                [(c,) for c in call_ids],
+            )
+
+
+def open_dead_letter(output_dir: Path) -> DeadLetterQueue:
+    """
+    Abre la cola de llamadas fallidas de una carpeta de salida.
+    """
+    return DeadLetterQueue(state_dir(output_dir) / "dead_letter.sqlite")
@@ -1,93 +1,277 @@
 # src/exporter.py
+import csv
+import os
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
+from typing import Iterable, List, Optional, Tuple
+import time
 
+from .aggregates import SUMMARY_COLUMNS
+from .config import VOC_EXCEL_MODE, VOC_EXCEL_INTERVAL_HOURS, VOC_EXCEL_PARTITION
+from .result_store import ResultStore, open_result_store
 
-def export_to_excel(data, output_dir: Path):
+BASE_NAME = "voz_cliente_fidelizacion_IA"
+
+# Partición única cuando el Excel no se divide por mes
+ALL_PARTITION = "*"
+
+COLUMNAS = [
+     "Número de llamada",
+     "Documento",
+     "Edad",
+     "Sexo",
+     "Ciudad",
+     "Fecha de llamada",
+     "Número cliente",
+     "TMO",
+     "Tipo de gestión",
+     "Voz de cliente (Resultado de la gestión)",
+     "Voz de cliente zoom (Motivo de caída)",
+     "Total o rango de la Deuda",
+     "Responsable de no aceptación",
+     "Fraude",
+     "Tipo de fraude"
+]
+
+
+def export_to_excel(
+    data,
+    output_dir: Path,
+    call_ids: Optional[List[str]] = None,
+    prompt_version: str | List[str] = "",
+):
     """
     Exporta la información de Voz del Cliente a un Excel.
 
+    Las filas NUEVAS se agregan al almacén local de resultados (solo escribe lo nuevo);
+    el Excel se regenera desde ese almacén según VOC_EXCEL_MODE, sin volver a leer
+    el Excel acumulado.
+
     Columnas:
     - Número de llamada
     - Documento
     - Edad
     - Sexo
-    - Ciudad 
+    - Ciudad
     - Fecha de llamada
     - Número cliente
     - TMO
     - Tipo de gestión
     - Voz de cliente (Resultado de la gestion)                (bucket general: asepta, no asepta / volver a llamar.)
-    - Voz de cliente zoom (Motivo de caída)        
-    - Total o rango de la Deuda        
-    - Responsable de no aceptación               
+    - Voz de cliente zoom (Motivo de caída)
+    - Total o rango de la Deuda
+    - Responsable de no aceptación
     - Fraude
-    - Tipo de fraude 
+    - Tipo de fraude
     """
     output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"{BASE_NAME}.xlsx"
+
+    store = open_result_store(output_dir)
+    _bootstrap_from_excel(store, output_file)
 
-    base_name = "voz_cliente_fidelizacion_IA.xlsx"
-    output_file = output_dir / base_name
-
-    columnas = [
-         "Número de llamada",
-         "Documento",
-         "Edad",
-         "Sexo",
-         "Ciudad",
-         "Fecha de llamada",
-         "Número cliente",
-         "TMO",
-         "Tipo de gestión",
-         "Voz de cliente (Resultado de la gestión)",                
-         "Voz de cliente zoom (Motivo de caída)",        
-         "Total o rango de la Deuda",        
-         "Responsable de no aceptación",               
-         "Fraude",
-         "Tipo de fraude"
-    ]
-
-    # DataFrame con las nuevas filas
+    # Guardar solo las filas nuevas en el almacén
     if not data:
         print("No hay datos NUEVOS procesados en este lote.")
-        df_new = pd.DataFrame(columns=columnas)
-    else:
-        df_new = pd.DataFrame(data)
-        df_new = df_new.reindex(columns=columnas)
-
-    # Intentar leer el Excel existente (para acumular)
-    if output_file.exists():
-        try:
-            df_existing = pd.read_excel(output_file)
-            # Aseguramos que tenga las mismas columnas, en caso de versiones anteriores
-            df_existing = df_existing.reindex(columns=columnas)
-            print(f"Se cargaron {len(df_existing)} filas existentes desde: {output_file}")
-        except Exception as e:
-            print(f"⚠ No se pudo leer el Excel existente ({e}). Se creará uno nuevo.")
-            df_existing = None
     else:
-        df_existing = None
+        if call_ids is None:
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            call_ids = [f"sin-id-{ts}-{i}" for i in range(len(data))]
+        n = store.append(list(data), list(call_ids), prompt_version)
+        print(f"Se agregaron {n} filas al almacén de resultados: {store.db_path}")
+
+    if not _should_rebuild(store):
+        print(f"Excel no regenerado (VOC_EXCEL_MODE={VOC_EXCEL_MODE}). Use: python main.py --exportar-excel")
+        return
+
+    build_excel(output_dir, store=store, only_touched=True)
+
+
+def build_excel(
+    output_dir: Path,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    store: Optional[ResultStore] = None,
+    only_touched: bool = False,
+) -> List[Path]:
+    """
+    Genera el Excel a partir del almacén de resultados y devuelve los archivos escritos.
+
+    - Las filas se leen y escriben de a una (openpyxl en modo write-only): la memoria no
+      crece con el histórico.
+    - Con VOC_EXCEL_PARTITION=mes se genera un archivo por mes de llamada.
+    - Con `only_touched` solo se reescriben las particiones que recibieron filas desde su
+      última escritura (o cuyo archivo no existe).
+    - Si se da un rango de fechas (YYYY-mm-dd), se genera un archivo aparte solo con ese rango.
+    - Siempre se actualiza el resumen por día/asesor/servicio/bucket/sentimiento (ver `build_summary`).
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    store = store or open_result_store(output_dir)
 
-    # Combinar existente + nuevas filas
-    if df_existing is not None and not df_existing.empty:
-        df = pd.concat([df_existing, df_new], ignore_index=True)
+    if date_from or date_to:
+        suffix = f"_{date_from or 'inicio'}_a_{date_to or 'hoy'}"
+        path, n = _write_workbook(store.iter_rows(date_from, date_to), output_dir / f"{BASE_NAME}{suffix}.xlsx")
+        print(f"Excel exportado con éxito ({n} filas): {path}")
+        return [path, *build_summary(output_dir, store, date_from, date_to)]
+
+    versions = store.month_versions()
+    if VOC_EXCEL_PARTITION == "mes":
+        partitions = versions
     else:
-        df = df_new
+        partitions = {ALL_PARTITION: max(versions.values(), default=0)}
+    if not partitions:
+        print("No hay datos para escribir en el Excel.")
+        return []
+
+    exported = store.exported_partitions()
+    written, unchanged = [], 0
+    for partition, last_id in sorted(partitions.items()):
+        output_file = _partition_file(output_dir, partition)
+        previous = exported.get(partition)
+        if only_touched and previous and previous[0] >= last_id and output_file.exists():
+            unchanged += 1
+            continue
 
-    # Si no hay nada (ni antes ni ahora), igual creamos el archivo vacío
-    if df.empty:
-        print("No hay datos para escribir en el Excel (archivo quedará vacío).")
+        if partition == ALL_PARTITION:
+            rows = store.iter_rows()
+        elif partition == "":
+            rows = store.iter_rows(undated=True)
+        else:
+            rows = store.iter_rows(f"{partition}-01", f"{partition}-31")
+        path, n = _write_workbook(rows, output_file)
+        if n == 0:
+            print("No hay datos para escribir en el Excel (archivo quedará vacío).")
+        print(f"Excel exportado con éxito ({n} filas): {path}")
+        written.append(path)
+        if path == output_file:
+            # Si quedó en un archivo alternativo (el original estaba abierto), se reintenta la próxima vez
+            store.mark_partition_exported(partition, last_id, output_file)
 
-    # Intentamos sobrescribir el archivo; si está abierto, guardamos con timestamp
+    if unchanged:
+        print(f"Excel: {len(written)} archivo(s) reescrito(s), {unchanged} sin cambios.")
+    return written + build_summary(output_dir, store)
+
+
+def build_summary(
+    output_dir: Path,
+    store: ResultStore,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[Path]:
+    """
+    Resumen de llamadas por día × asesor × servicio × bucket × sentimiento, en
+    `<BASE_NAME>_resumen.csv` y `.xlsx` (hoja "Resumen").
+
+    Sale de los contadores que el almacén mantiene al agregar cada fila, así que el costo
+    depende de la cantidad de grupos y no de la cantidad de llamadas del histórico.
+    """
+    counts = store.summary_counts(date_from, date_to)
+    suffix = f"_{date_from or 'inicio'}_a_{date_to or 'hoy'}" if (date_from or date_to) else ""
+    base = output_dir / f"{BASE_NAME}_resumen{suffix}"
+    rows = (dict(zip(SUMMARY_COLUMNS, c)) for c in counts)
+
+    csv_file = _write_csv(counts, base.with_suffix(".csv"))
+    xlsx_file, _ = _write_workbook(rows, base.with_suffix(".xlsx"), SUMMARY_COLUMNS, "Resumen")
+    print(f"Resumen exportado ({len(counts)} grupos): {xlsx_file}")
+    return [csv_file, xlsx_file]
+
+
+def _write_csv(rows: List[tuple], output_file: Path) -> Path:
+    """
+    CSV del resumen (utf-8 con BOM para que Excel muestre bien las tildes),
+    con el mismo respaldo con timestamp si el archivo está abierto.
+    """
+    try:
+        f = output_file.open("w", encoding="utf-8-sig", newline="")
+    except PermissionError:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = output_file.with_name(f"{output_file.stem}_{ts}.csv")
+        print(f"⚠ El resumen CSV está abierto; se guarda en: {output_file}")
+        f = output_file.open("w", encoding="utf-8-sig", newline="")
+    with f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_COLUMNS)
+        writer.writerows(rows)
+    return output_file
+
+
+def _partition_file(output_dir: Path, partition: str) -> Path:
+    if partition == ALL_PARTITION:
+        return output_dir / f"{BASE_NAME}.xlsx"
+    return output_dir / f"{BASE_NAME}_{partition or 'sin_fecha'}.xlsx"
+
+
+def _write_workbook(
+    rows: Iterable[dict],
+    output_file: Path,
+    columns: List[str] = COLUMNAS,
+    sheet: str = "Sheet1",
+) -> Tuple[Path, int]:
+    """
+    Escribe las filas en un .xlsx en modo streaming y devuelve (archivo escrito, filas).
+
+    Se escribe primero a un temporal y luego se reemplaza el archivo final; si está abierto
+    (p.ej. en Excel, en Windows), se guarda con timestamp al lado, como antes.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+    ws.append(columns)
+    n = 0
+    for row in rows:
+        ws.append([row.get(col) for col in columns])
+        n += 1
+
+    tmp_file = output_file.with_name(f".{output_file.stem}.{os.getpid()}.tmp.xlsx")
+    wb.save(tmp_file)
     try:
-        df.to_excel(output_file, index=False)
-        print(f"Excel exportado con éxito: {output_file}")
+        os.replace(tmp_file, output_file)
+        return output_file, n
     except PermissionError:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        alt_file = output_dir / f"voz_cliente_fidelizacion_IA_{ts}.xlsx"
-        df.to_excel(alt_file, index=False)
+        alt_file = output_file.with_name(f"{output_file.stem}_{ts}.xlsx")
+        os.replace(tmp_file, alt_file)
         print(
             f"⚠ No se pudo sobrescribir '{output_file}' (probablemente está abierto). "
             f"Se guardó en: {alt_file}"
         )
+        return alt_file, n
+
+
+def _should_rebuild(store: ResultStore) -> bool:
+    """
+    Decide si el Excel se regenera en esta ejecución según VOC_EXCEL_MODE.
+    """
+    if VOC_EXCEL_MODE == "bajo_demanda":
+        return False
+    if VOC_EXCEL_MODE == "programado":
+        last_export = max((e[2] for e in store.exported_partitions().values()), default=None)
+        if last_export is not None:
+            return (time.time() - last_export) / 3600 >= VOC_EXCEL_INTERVAL_HOURS
+    return True
+
+
+def _bootstrap_from_excel(store: ResultStore, output_file: Path):
+    """
+    Migración única: si el almacén está vacío pero ya existe un Excel acumulado
+    (versiones anteriores), se cargan sus filas al almacén una sola vez.
+    """
+    if not store.is_empty() or not output_file.exists():
+        return
+
+    import pandas as pd
+    try:
+        df_existing = pd.read_excel(output_file).reindex(columns=COLUMNAS)
+    except Exception as e:
+        print(f"⚠ No se pudo leer el Excel existente ({e}). Se empieza un almacén nuevo.")
+        return
+
+    if df_existing.empty:
+        return
+
+    df_existing = df_existing.astype(object).where(pd.notna(df_existing), None)
+    rows = df_existing.to_dict(orient="records")
+    call_ids = [f"historico-{i}" for i in range(len(rows))]
+    store.append(rows, call_ids, prompt_version="historico")
+    print(f"Se migraron {len(rows)} filas existentes desde: {output_file}")
@@ -0,0 +1,118 @@
+# src/journal.py
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+from .result_store import state_dir
+from .storage import connect_sqlite, filter_in
+
+
+class CallJournal:
+    """
+    Historial durable de llamadas procesadas (SQLite, una fila por llamada).
+
+    Cada llamada se confirma en disco apenas termina, con su fila de resultado.
+    Si el proceso se cae a mitad del batch, lo ya pagado (Deepgram + OpenAI) no se pierde:
+    al reiniciar esas llamadas no se vuelven a procesar y sus filas pendientes se exportan.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS calls (
+                    call_id         TEXT PRIMARY KEY,
+                    status          TEXT NOT NULL,
+                    row             TEXT,
+                    prompt_version  TEXT NOT NULL DEFAULT '',
+                    exported        INTEGER NOT NULL DEFAULT 0,
+                    updated_at      REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_calls_pending ON calls(status, exported)"
+            )
+
+    def migrate_from_json(self, json_file: Path):
+        """
+        Migración única desde el antiguo processed_calls.json:
+        se cargan sus IDs como ya procesados y exportados, y el archivo se renombra.
+        """
+        if not json_file.exists():
+            return
+        try:
+            with json_file.open("r", encoding="utf-8") as f:
+                ids = json.load(f)
+        except Exception as e:
+            print(f"[WARN] No se pudo leer {json_file.name} ({e}). Se ignora para la migración.")
+            return
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO calls (call_id, status, exported, updated_at) VALUES (?, 'done', 1, ?)",
+                [(str(call_id), now) for call_id in ids],
+            )
+        json_file.replace(json_file.with_name(json_file.name + ".migrado"))
+        print(f"Se migraron {len(ids)} llamadas desde {json_file.name} al historial: {self.db_path}")
+
+    def filter_new(self, call_ids: Iterable[str]) -> List[str]:
+        """
+        Devuelve, en el mismo orden, los IDs que todavía NO están procesados.
+        Solo consulta los IDs candidatos (no carga todo el historial).
+        """
+        call_ids = list(call_ids)
+        with self._lock:
+            done = filter_in(
+                self._conn, "SELECT call_id FROM calls WHERE status = 'done' AND call_id IN ({marks})", call_ids
+            )
+        return [c for c in call_ids if c not in done]
+
+    def record_done(self, call_id: str, row: dict, prompt_version: str = ""):
+        """
+        Confirma en disco una llamada terminada con su fila de resultado (pendiente de exportar).
+        """
+        payload = json.dumps(row, ensure_ascii=False, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO calls (call_id, status, row, prompt_version, exported, updated_at)
+                VALUES (?, 'done', ?, ?, 0, ?)
+                """,
+                (call_id, payload, prompt_version, time.time()),
+            )
+
+    def pending_export(self) -> List[tuple]:
+        """
+        Llamadas terminadas cuya fila aún no llegó al Excel/almacén: [(call_id, row, prompt_version)].
+        Ordenadas por ID para que la exportación sea estable.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT call_id, row, prompt_version FROM calls "
+                "WHERE status = 'done' AND exported = 0 ORDER BY call_id"
+            ).fetchall()
+        return [(call_id, json.loads(row), version) for call_id, row, version in rows]
+
+    def mark_exported(self, call_ids: List[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE calls SET exported = 1 WHERE call_id = ?",
+                [(c,) for c in call_ids],
+            )
+
+
+def open_journal(output_dir: Path) -> CallJournal:
+    """
+    Abre el historial de llamadas de una carpeta de salida
+    (migrando processed_calls.json la primera vez).
+    """
+    journal = CallJournal(state_dir(output_dir) / "journal.sqlite")
+    journal.migrate_from_json(output_dir / "processed_calls.json")
+    return journal
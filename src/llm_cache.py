@@ -0,0 +1,160 @@
+# src/llm_cache.py
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import CACHE_DIR, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB
+from .storage import connect_sqlite, evict_lru
+
+
+def analysis_cache_key(request: dict, prompt_version: str) -> str:
+    """
+    Llave de caché de un análisis: hash del request completo que se envía a OpenAI
+    (mensajes, modelo, temperatura, formato de respuesta, límite de tokens) + versión del prompt.
+    """
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    h = hashlib.sha256(payload.encode("utf-8"))
+    h.update(f"|{prompt_version}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMCache:
+    """
+    Caché persistente (SQLite) de las respuestas de OpenAI para `analyze_voc`.
+
+    Guarda el JSON crudo devuelto por el modelo (antes de normalizar), de modo que
+    la normalización local y el sentimiento por diccionario se recalculan siempre.
+    Cada entrada registra la versión del prompt con que se obtuvo; cuando el prompt
+    o los buckets cambian, la versión cambia y las entradas viejas dejan de coincidir.
+    Se desaloja por LRU (número de entradas y tamaño total).
+    """
+
+    def __init__(self, db_path: Path, max_entries: int, max_bytes: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    key             TEXT PRIMARY KEY,
+                    prompt_version  TEXT NOT NULL,
+                    model           TEXT NOT NULL,
+                    temperature     REAL NOT NULL,
+                    response        TEXT NOT NULL,
+                    size_bytes      INTEGER NOT NULL,
+                    created_at      REAL NOT NULL,
+                    last_access     REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analyses_last_access ON analyses(last_access)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analyses_version ON analyses(prompt_version)"
+            )
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Devuelve el JSON crudo del modelo guardado para la llave, o None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM analyses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE analyses SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+        return json.loads(row[0])
+
+    def put(self, key: str, response: dict, prompt_version: str, model: str, temperature: float):
+        """
+        Guarda la respuesta del modelo y aplica el desalojo LRU.
+        """
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO analyses
+                        (key, prompt_version, model, temperature, response, size_bytes, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, prompt_version, model, temperature, payload, len(payload.encode("utf-8")), now, now),
+                )
+            evict_lru(self._conn, "analyses", max_bytes=self.max_bytes, max_entries=self.max_entries)
+
+    def invalidate_version(self, prompt_version: str) -> int:
+        """
+        Borra todas las entradas obtenidas con una versión de prompt. Devuelve cuántas se borraron.
+        """
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM analyses WHERE prompt_version = ?", (prompt_version,))
+        return cur.rowcount
+
+    def invalidate_stale(self, current_version: str) -> int:
+        """
+        Borra todas las entradas de versiones de prompt distintas a la actual.
+        """
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM analyses WHERE prompt_version <> ?", (current_version,))
+        return cur.rowcount
+
+    def versions(self) -> dict:
+        """
+        Cantidad de entradas guardadas por versión de prompt.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT prompt_version, COUNT(*) FROM analyses GROUP BY prompt_version"
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> dict:
+        """
+        Contadores de la caché: aciertos, fallos, entradas y tamaño total.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analyses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": total,
+        }
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Devuelve la caché de análisis compartida del proceso (se crea en el primer uso).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                CACHE_DIR / "analyses.sqlite",
+                max_entries=LLM_CACHE_MAX_ENTRIES,
+                max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+            )
+        return _cache
@@ -0,0 +1,242 @@
+# src/long_audio.py
+import math
+import re
+import shutil
+import subprocess
+import tempfile
+import wave
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .audio import OUTPUT_FORMATS, ffmpeg_available
+from .config import (
+    CACHE_DIR,
+    FFMPEG_BIN,
+    FFPROBE_BIN,
+    VOC_AUDIO_FORMAT,
+    VOC_AUDIO_SAMPLE_RATE,
+    VOC_AUDIO_SILENCE_DB,
+    VOC_CHUNK_TARGET_S,
+    VOC_CHUNK_OVERLAP_S,
+    VOC_LONG_AUDIO_MIN_S,
+)
+from .matcher import fold_text
+
+_SILENCE_START = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end:\s*(-?[\d.]+)")
+_WORD_CLEAN = re.compile(r"[^\w]+")
+
+
+# ===================== Duración y silencios =====================
+
+def probe_duration(path: Path) -> Optional[float]:
+    """
+    Duración del audio en segundos: con ffprobe si está disponible, o leyendo
+    la cabecera si es WAV. None si no se puede determinar.
+    """
+    if shutil.which(FFPROBE_BIN):
+        result = subprocess.run(
+            [FFPROBE_BIN, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
+            capture_output=True, text=True,
+        )
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass
+    if path.suffix.lower() == ".wav":
+        try:
+            with wave.open(str(path), "rb") as w:
+                return w.getnframes() / float(w.getframerate())
+        except (wave.Error, EOFError):
+            return None
+    return None
+
+
+def is_long_audio(path: Path) -> Tuple[bool, Optional[float]]:
+    """
+    Indica si el audio supera VOC_LONG_AUDIO_MIN_S (y devuelve la duración medida).
+    """
+    duration = probe_duration(path)
+    return duration is not None and duration > VOC_LONG_AUDIO_MIN_S, duration
+
+
+def detect_silences(path: Path, min_silence_s: float = 0.5) -> List[Tuple[float, float]]:
+    """
+    Tramos de silencio (inicio, fin) en segundos, detectados con el filtro silencedetect de ffmpeg.
+    """
+    if not ffmpeg_available():
+        return []
+    result = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-nostdin", "-i", str(path),
+         "-af", f"silencedetect=noise={VOC_AUDIO_SILENCE_DB:g}dB:d={min_silence_s:g}", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    silences, start = [], None
+    for line in result.stderr.splitlines():
+        m = _SILENCE_START.search(line)
+        if m:
+            start = max(0.0, float(m.group(1)))
+            continue
+        m = _SILENCE_END.search(line)
+        if m and start is not None:
+            silences.append((start, float(m.group(1))))
+            start = None
+    return silences
+
+
+# ===================== Plan de cortes =====================
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    target_s: float = VOC_CHUNK_TARGET_S,
+    overlap_s: float = VOC_CHUNK_OVERLAP_S,
+) -> List[Tuple[float, float]]:
+    """
+    Divide [0, duration] en tramos de ~`target_s` segundos.
+
+    Cada corte se hace en el centro del silencio más cercano al punto ideal (entre 0.5x y 1.25x
+    del objetivo); si no hay silencios en ese rango, se corta en el punto ideal. Cada tramo,
+    salvo el primero, empieza `overlap_s` antes del corte para no perder palabras en el borde.
+    """
+    cuts = []
+    cursor = 0.0
+    while duration - cursor > target_s * 1.25:
+        ideal = cursor + target_s
+        lo, hi = cursor + target_s * 0.5, cursor + target_s * 1.25
+        candidates = [(s + e) / 2 for s, e in silences if lo <= (s + e) / 2 <= hi]
+        cut = min(candidates, key=lambda c: abs(c - ideal)) if candidates else ideal
+        cuts.append(cut)
+        cursor = cut
+
+    bounds = [0.0, *cuts, duration]
+    chunks = []
+    for i in range(len(bounds) - 1):
+        start = bounds[i] if i == 0 else max(0.0, bounds[i] - overlap_s)
+        chunks.append((start, bounds[i + 1]))
+    return chunks
+
+
+# ===================== Corte de los archivos =====================
+
+def _split_wav(path: Path, chunks: List[Tuple[float, float]], target_dir: Path) -> List[Path]:
+    """
+    Corte sin ffmpeg (solo WAV): copia los frames de cada tramo con los mismos parámetros del original.
+    """
+    outputs = []
+    with wave.open(str(path), "rb") as src:
+        rate = src.getframerate()
+        for i, (start, end) in enumerate(chunks):
+            src.setpos(int(start * rate))
+            frames = src.readframes(int((end - start) * rate))
+            out = target_dir / f"{path.stem}_parte{i:03d}.wav"
+            with wave.open(str(out), "wb") as dst:
+                dst.setparams(src.getparams())
+                dst.writeframes(frames)
+            outputs.append(out)
+    return outputs
+
+
+def split_audio(path: Path, chunks: List[Tuple[float, float]], target_dir: Path) -> List[Path]:
+    """
+    Genera un archivo por tramo en `target_dir` (mono, VOC_AUDIO_SAMPLE_RATE Hz, VOC_AUDIO_FORMAT).
+    """
+    if not ffmpeg_available():
+        if path.suffix.lower() != ".wav":
+            raise RuntimeError(f"Se necesita ffmpeg para dividir {path.name}")
+        return _split_wav(path, chunks, target_dir)
+
+    codec, ext = OUTPUT_FORMATS[VOC_AUDIO_FORMAT]
+    outputs = []
+    for i, (start, end) in enumerate(chunks):
+        out = target_dir / f"{path.stem}_parte{i:03d}{ext}"
+        result = subprocess.run(
+            [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+             "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", str(path), "-vn",
+             "-ac", "1", "-ar", str(VOC_AUDIO_SAMPLE_RATE), *codec, str(out)],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló al dividir {path.name}: {result.stderr.strip()[:500]}")
+        outputs.append(out)
+    return outputs
+
+
+def chunk_workdir() -> Path:
+    """
+    Carpeta temporal (dentro de CACHE_DIR) para los tramos de un audio; quien la pide la borra.
+    """
+    base = CACHE_DIR / "chunks"
+    base.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(dir=base))
+
+
+# ===================== Unión de las transcripciones =====================
+
+# Palabras por segundo (holgado) para convertir el solapamiento en palabras, y cuántas palabras
+# de los bordes puede haber cortado el tramo (una palabra partida se transcribe distinto)
+WORDS_PER_SECOND = 4
+EDGE_SLACK_WORDS = 2
+
+
+def _norm_words(words: List[str]) -> List[str]:
+    return [_WORD_CLEAN.sub("", fold_text(w)) for w in words]
+
+
+def overlap_window_words(overlap_s: float = VOC_CHUNK_OVERLAP_S) -> int:
+    """
+    Palabras a comparar en cada borde: las que caben en el solapamiento más el margen de los cortes.
+    """
+    return math.ceil(overlap_s * WORDS_PER_SECOND) + 2 * EDGE_SLACK_WORDS
+
+
+def _anchored_overlap(tail: List[str], head: List[str], min_match: int) -> Optional[Tuple[int, int, int]]:
+    """
+    Busca el solapamiento anclado a los bordes: un tramo común que termina al final de `tail`
+    y empieza al inicio de `head` (salvo hasta EDGE_SLACK_WORDS palabras cortadas en cada borde).
+    Devuelve (fin en tail, inicio en head, largo) del más largo, o None si no llega a `min_match`.
+    """
+    best = None
+    for a_end in range(len(tail), max(0, len(tail) - EDGE_SLACK_WORDS - 1), -1):
+        for b_start in range(0, min(EDGE_SLACK_WORDS, len(head) - 1) + 1):
+            size = min(a_end, len(head) - b_start)
+            while size >= min_match and tail[a_end - size:a_end] != head[b_start:b_start + size]:
+                size -= 1
+            if size >= min_match and (best is None or size > best[2]):
+                best = (a_end, b_start, size)
+    return best
+
+
+def stitch_transcripts(parts: List[str], window_words: Optional[int] = None, min_match: int = 3) -> str:
+    """
+    Une las transcripciones de tramos consecutivos quitando lo repetido por el solapamiento.
+
+    El solapamiento solo puede estar al final del texto acumulado y al inicio del siguiente tramo:
+    se comparan (sin tildes ni puntuación) las últimas y primeras `window_words` palabras
+    (por defecto, según VOC_CHUNK_OVERLAP_S) y se busca el tramo común más largo anclado a esos
+    bordes; si tiene al menos `min_match` palabras, el siguiente tramo continúa desde ahí.
+    Sin coincidencia anclada, los textos simplemente se concatenan (una frase repetida en otra
+    parte de la llamada, como "sí señor gracias", no cuenta como solapamiento).
+    """
+    if window_words is None:
+        window_words = overlap_window_words()
+    words: List[str] = []
+    for part in parts:
+        new_words = (part or "").split()
+        if not new_words:
+            continue
+        if not words:
+            words = new_words
+            continue
+
+        tail_start = max(0, len(words) - window_words)
+        match = _anchored_overlap(
+            _norm_words(words[tail_start:]), _norm_words(new_words[:window_words]), min_match
+        )
+        if match is not None:
+            a_end, b_start, size = match
+            words = words[:tail_start + a_end] + new_words[b_start + size:]
+        else:
+            words = words + new_words
+    return " ".join(words)
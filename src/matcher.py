@@ -0,0 +1,102 @@
+# src/matcher.py
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+
+def _build_fold_table() -> dict:
+    """
+    Tabla de traducción que quita tildes carácter por carácter (á -> a, ñ -> n, ü -> u, ...).
+    Cada carácter se reemplaza por UNO solo, así las posiciones del texto original se conservan.
+    """
+    table = {}
+    for cp in range(0xC0, 0x250):
+        ch = chr(cp)
+        base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        if len(base) == 1 and base != ch:
+            table[cp] = base
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text: str) -> str:
+    """
+    Minúsculas y sin tildes, conservando la longitud (y por lo tanto las posiciones) del texto.
+    """
+    return (text or "").lower().translate(_FOLD_TABLE)
+
+
+@dataclass(frozen=True)
+class KeywordHit:
+    keyword: str   # palabra clave (normalizada) que coincidió
+    group: str     # grupo de la palabra clave (p.ej. "servicio", "positivo", "negativo")
+    label: str     # valor canónico (p.ej. "Netflix")
+    start: int     # posición inicial en el texto
+    end: int       # posición final en el texto
+
+
+class KeywordMatcher:
+    """
+    Buscador de muchas palabras clave en UNA sola pasada sobre el texto.
+
+    Compila todas las palabras clave en una sola expresión regular (alternación),
+    normalizada sin tildes y con límites de palabra, de modo que "ok" no coincide
+    dentro de "bloqueo" ni "hbo" dentro de otra palabra. Ante solapamientos gana
+    la coincidencia más larga ("no funciona" antes que "funciona").
+    """
+
+    def __init__(self, keywords: Dict[str, Tuple[str, str]]):
+        """
+        `keywords`: {palabra_clave: (grupo, valor_canónico)}
+        """
+        self._labels: Dict[str, Tuple[str, str]] = {}
+        for keyword, (group, label) in keywords.items():
+            self._labels[fold_text(keyword)] = (group, label)
+
+        # Más largas primero para que la alternación prefiera la coincidencia más larga
+        alternatives = sorted(self._labels, key=len, reverse=True)
+        body = "|".join(re.escape(k) for k in alternatives) or r"(?!x)x"
+        self.pattern = re.compile(rf"(?<!\w)({body})(?!\w)")
+
+    def find_all(self, text: str) -> List[KeywordHit]:
+        """
+        Todas las coincidencias (sin solaparse), en orden de aparición, con sus posiciones.
+        """
+        hits = []
+        for m in self.pattern.finditer(fold_text(text)):
+            keyword = m.group(1)
+            group, label = self._labels[keyword]
+            hits.append(KeywordHit(keyword, group, label, m.start(), m.end()))
+        return hits
+
+    def counts(self, text: str) -> Counter:
+        """
+        Conteo de coincidencias por (grupo, valor).
+        """
+        return Counter((hit.group, hit.label) for hit in self.find_all(text))
+
+    def bulk_counts(self, texts):
+        """
+        Conteos por texto para reprocesar históricos grandes.
+
+        Recibe una lista o un `pandas.Series` de transcripciones y devuelve un DataFrame
+        (mismo índice) con una columna "grupo:valor" por cada etiqueta encontrada.
+        La búsqueda se hace con las operaciones vectorizadas de texto de pandas.
+        """
+        import pandas as pd
+
+        series = texts if isinstance(texts, pd.Series) else pd.Series(list(texts))
+        folded = series.fillna("").astype(str).str.lower().str.translate(_FOLD_TABLE)
+
+        found = folded.str.findall(self.pattern).explode().dropna()
+        if found.empty:
+            return pd.DataFrame(index=series.index)
+
+        columns = found.map(lambda k: "{}:{}".format(*self._labels[k]))
+        table = pd.crosstab(columns.index, columns.values)
+        table.columns.name = None
+        return table.reindex(series.index, fill_value=0)
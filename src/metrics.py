@@ -0,0 +1,233 @@
+# src/metrics.py
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .config import VOC_PROFILE
+
+# Atributos numéricos que se suman en el resumen y en las métricas de Prometheus
+_SUMMED_ATTRS = (
+    "bytes", "response_bytes", "original_bytes", "processed_bytes",
+    "chars_before", "chars_after",
+    "prompt_tokens", "cached_tokens", "completion_tokens", "rows",
+)
+
+
+def _percentile(values, p: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class RunMetrics:
+    """
+    Registro de tramos (spans) por etapa de una ejecución del pipeline.
+
+    Cada tramo guarda: etapa, llamada (call_id), duración, estado y atributos
+    (bytes subidos, tokens, filas, ...). Se escriben a medida que terminan en un
+    JSONL de la ejecución, y al final se genera un textfile de Prometheus y un resumen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._log_file = None
+        self.log_path: Optional[Path] = None
+        self.prom_path: Optional[Path] = None
+        self.started_at = time.time()
+        self._durations: dict = {}
+        self._errors: dict = {}
+        self._totals: dict = {}
+
+    # ----- ciclo de la ejecución -----
+
+    def start_run(self, output_dir: Path):
+        """
+        Reinicia los contadores y abre el JSONL de esta ejecución en output/logs/.
+        """
+        logs_dir = output_dir / "logs"
+        logs_dir.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        with self._lock:
+            if self._log_file:
+                self._log_file.close()
+            self.log_path = logs_dir / f"run_{ts}.jsonl"
+            self.prom_path = logs_dir / "voz_cliente.prom"
+            self._log_file = self.log_path.open("a", encoding="utf-8")
+            self.started_at = time.time()
+            self._durations, self._errors, self._totals = {}, {}, {}
+
+    def finish_run(self) -> dict:
+        """
+        Escribe el textfile de Prometheus, cierra el JSONL e imprime el resumen de la ejecución.
+        """
+        summary = self.summary()
+        if self.prom_path:
+            self._write_prometheus(summary)
+        with self._lock:
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
+
+        print("\n[Métricas] Resumen por etapa:")
+        for stage, s in summary["stages"].items():
+            p50 = f"{s['p50_ms']:.0f}" if s["p50_ms"] is not None else "-"
+            p95 = f"{s['p95_ms']:.0f}" if s["p95_ms"] is not None else "-"
+            print(
+                f"[Métricas]   {stage:<20} n={s['count']:<5} errores={s['errors']:<3} "
+                f"total={s['total_s']:.1f}s p50={p50}ms p95={p95}ms"
+            )
+        if summary["totals"]:
+            totals = " ".join(f"{k}={v:,}" for k, v in summary["totals"].items())
+            print(f"[Métricas]   Totales: {totals}")
+        if self.log_path:
+            print(f"[Métricas] Log de la ejecución: {self.log_path}")
+        return summary
+
+    # ----- registro -----
+
+    @contextmanager
+    def bind_call(self, call_id: str):
+        """
+        Asocia los tramos que se registren en este hilo a la llamada `call_id`.
+        """
+        previous = getattr(self._local, "call_id", None)
+        self._local.call_id = call_id
+        try:
+            yield
+        finally:
+            self._local.call_id = previous
+
+    @contextmanager
+    def span(self, stage: str, call_id: Optional[str] = None, **attrs):
+        """
+        Mide un tramo de una etapa. Dentro del bloque se pueden agregar atributos
+        al diccionario devuelto (p.ej. tokens cuando llega la respuesta).
+        """
+        t0 = time.perf_counter()
+        status = "ok"
+        try:
+            yield attrs
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(stage, (time.perf_counter() - t0) * 1000, call_id=call_id, status=status, **attrs)
+
+    def record(self, stage: str, duration_ms: float, call_id: Optional[str] = None, status: str = "ok", **attrs):
+        """
+        Registra un tramo ya medido.
+        """
+        entry = {
+            "ts": time.time(),
+            "stage": stage,
+            "call_id": call_id or getattr(self._local, "call_id", None),
+            "duration_ms": round(duration_ms, 3),
+            "status": status,
+            **attrs,
+        }
+        with self._lock:
+            self._durations.setdefault(stage, []).append(duration_ms)
+            if status != "ok":
+                self._errors[stage] = self._errors.get(stage, 0) + 1
+            for key in _SUMMED_ATTRS:
+                value = attrs.get(key)
+                if isinstance(value, (int, float)):
+                    self._totals[key] = self._totals.get(key, 0) + value
+            if self._log_file:
+                self._log_file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                self._log_file.flush()
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": len(values),
+                    "errors": self._errors.get(stage, 0),
+                    "total_s": sum(values) / 1000,
+                    "p50_ms": _percentile(values, 0.50),
+                    "p95_ms": _percentile(values, 0.95),
+                }
+                for stage, values in self._durations.items()
+            }
+            return {
+                "elapsed_s": time.time() - self.started_at,
+                "stages": stages,
+                "totals": dict(self._totals),
+            }
+
+    def _write_prometheus(self, summary: dict):
+        """
+        Textfile para el node_exporter (colector textfile). Se escribe de forma atómica.
+        """
+        lines = [
+            "# HELP voc_stage_duration_seconds Duración acumulada por etapa en la última ejecución.",
+            "# TYPE voc_stage_duration_seconds summary",
+        ]
+        for stage, s in summary["stages"].items():
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                if s[key] is not None:
+                    lines.append(f'voc_stage_duration_seconds{{stage="{stage}",quantile="{q}"}} {s[key] / 1000:.6f}')
+            lines.append(f'voc_stage_duration_seconds_sum{{stage="{stage}"}} {s["total_s"]:.6f}')
+            lines.append(f'voc_stage_duration_seconds_count{{stage="{stage}"}} {s["count"]}')
+        lines += [
+            "# HELP voc_stage_errors Tramos con error por etapa en la última ejecución.",
+            "# TYPE voc_stage_errors gauge",
+        ]
+        for stage, s in summary["stages"].items():
+            lines.append(f'voc_stage_errors{{stage="{stage}"}} {s["errors"]}')
+        lines += [
+            "# HELP voc_run_totals Totales de la última ejecución (bytes subidos y recibidos, tokens, filas).",
+            "# TYPE voc_run_totals gauge",
+        ]
+        for key, value in summary["totals"].items():
+            lines.append(f'voc_run_totals{{kind="{key}"}} {value}')
+        lines += [
+            "# HELP voc_run_duration_seconds Duración de la última ejecución.",
+            "# TYPE voc_run_duration_seconds gauge",
+            f"voc_run_duration_seconds {summary['elapsed_s']:.3f}",
+            "# HELP voc_run_timestamp_seconds Momento en que terminó la última ejecución.",
+            "# TYPE voc_run_timestamp_seconds gauge",
+            f"voc_run_timestamp_seconds {time.time():.0f}",
+        ]
+        tmp = self.prom_path.with_suffix(".prom.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(self.prom_path)
+
+
+# Instancia compartida por todo el proceso
+metrics = RunMetrics()
+
+
+def profiled(output_dir: Path):
+    """
+    Perfilado opcional (cProfile) de la ejecución completa, activado con VOC_PROFILE=1.
+    Desactivado devuelve un contexto vacío: no se importa ni se activa nada.
+    """
+    if not VOC_PROFILE:
+        return nullcontext()
+    return _profile_to_file(output_dir)
+
+
+@contextmanager
+def _profile_to_file(output_dir: Path):
+    import cProfile
+
+    logs_dir = output_dir / "logs"
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    path = logs_dir / f"profile_{datetime.now():%Y%m%d_%H%M%S}.prof"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+        print(f"[Métricas] Perfil guardado en: {path} (ver con: python -m pstats {path})")
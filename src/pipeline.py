@@ -1,21 +1,345 @@
 # src/pipeline.py
+import os
 from pathlib import Path
 from datetime import datetime
-import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
 
 from .transcriber import transcribe_file_with_deepgram
-from .analyzer import analyze_voc
+from .analyzer import analyze_voc, analyze_voc_batch, get_usage_summary, PROMPT_VERSION
 from .exporter import export_to_excel
-from .config import VOC_MAX_CALLS_PER_BATCH
+from .journal import CallJournal, open_journal
+from .dead_letter import open_dead_letter
+from .tiered import analyze_voc_tiered, record_audit, resolve_locally, sampled_for_audit, tier_stats
+from .metrics import metrics, profiled
+from .ratelimit import deepgram_scheduler, openai_scheduler
+from .config import (
+    VOC_MAX_CALLS_PER_BATCH,
+    VOC_PIPELINE_MODE,
+    DEEPGRAM_CONCURRENCY,
+    OPENAI_CONCURRENCY,
+    VOC_MAX_CHARS,
+    VOC_BATCH_ANALYSIS,
+    VOC_BATCH_MAX_ITEMS,
+    VOC_TIERED,
+    TRANSCRIPT_CACHE_ENABLED,
+    LLM_CACHE_ENABLED,
+    VOC_AUDIO_PREPROCESS,
+)
+from .transcript_cache import get_transcript_cache
+from .llm_cache import get_llm_cache
+from .audio import evict_audio_cache, shutdown_pool
+from .compaction import prepare_for_analysis
 
 
-def process_calls(input_dir: Path, output_dir: Path, additional_service: str | None = None):
+def parse_file_name(file_name: str) -> dict:
+    """
+    Extrae los datos de la llamada a partir del nombre del audio (sin extensión).
+
+    Formato esperado:
+    documento_fechaHora_min_seg_numeroCliente_TMO.ext
+    ej: 53134176_2025-11-01 10_48_49_3164660199_54.mp3
+    """
+    partes = file_name.split("_")
+
+    # Documento asesor
+    documento = partes[0] if len(partes) >= 1 else ""
+
+    # Número cliente y TMO: usamos los dos últimos elementos
+    numero_cliente = partes[-2] if len(partes) >= 2 else ""
+    tmo = partes[-1] if len(partes) >= 1 else ""
+
+    # Fecha de llamada
+    fecha_llamada = ""
+    if len(partes) >= 2:
+        # partes[1] = "2025-11-01 10"
+        fecha_hora_bruta = partes[1]
+        solo_fecha = fecha_hora_bruta.split(" ")[0]  # "2025-11-01"
+        try:
+            dt = datetime.strptime(solo_fecha, "%Y-%m-%d")
+            fecha_llamada = dt.strftime("%d-%m-%Y")  # "01-11-2025"
+        except Exception:
+            fecha_llamada = solo_fecha  # fallback
+
+    return {
+        "documento": documento,
+        "fecha_llamada": fecha_llamada,
+        "numero_cliente": numero_cliente,
+        "tmo": tmo,
+    }
+
+
+def build_row(idx: int, audio_file: Path, voc_data: dict) -> dict:
+    """
+    Arma la fila del Excel para una llamada ya analizada.
+    """
+    info = parse_file_name(audio_file.stem)
+    return {
+        # Este número es solo el consecutivo dentro del batch de audios nuevos
+        "Número de llamada": idx,
+        "Documento": info["documento"],
+        "Fecha de llamada": info["fecha_llamada"],
+        "Número cliente": info["numero_cliente"],
+        "TMO": info["tmo"],
+        "Servicio adicional": voc_data.get("additional_service", ""),
+        "Voz de cliente": voc_data.get("voice_bucket", ""),
+        "Voz cliente Zoom": voc_data.get("customer_voice", ""),
+        "Conoce (Si/No)": voc_data.get("knows_additional_service", ""),
+        "Sentimiento": voc_data.get("sentiment", ""),
+    }
+
+
+def _log_voc(audio_file: Path, voc_data: dict):
+    """
+    Imprime lo que detectó el análisis para una llamada.
+    """
+    print(f"[VOC] {audio_file.name}")
+    print(f"[VOC] Servicio detectado: {voc_data.get('additional_service')}")
+    print(f"[VOC] Conoce servicio:    {voc_data.get('knows_additional_service')}")
+    print(f"[VOC] Bucket:             {voc_data.get('voice_bucket')}")
+    print(f"[VOC] Voz Zoom:           {voc_data.get('customer_voice')}")
+    print(f"[VOC] Sentimiento:        {voc_data.get('sentiment')}")
+
+
+# Etapas en que puede fallar una llamada (se guardan en la cola de fallidas)
+STAGE_TRANSCRIPTION = "transcripcion"
+STAGE_ANALYSIS = "analisis"
+
+OnResult = Callable[[int, dict], None]
+OnFailure = Callable[[int, str, Exception], None]
+
+
+def _transcribe(audio_file: Path) -> str:
+    """
+    Transcripción de una llamada (las métricas quedan asociadas a su ID).
+    """
+    with metrics.bind_call(audio_file.stem):
+        return transcribe_file_with_deepgram(audio_file)
+
+
+def analyze_call(transcript: str, call_id: str) -> dict:
+    """
+    Análisis de una llamada: por niveles (local primero) si VOC_TIERED está activo.
+    La transcripción se compacta y se recorta al presupuesto antes de analizarla.
+    """
+    with metrics.bind_call(call_id):
+        transcript = prepare_for_analysis(transcript, call_id)
+        if VOC_TIERED:
+            return analyze_voc_tiered(transcript, call_id)
+        return analyze_voc(transcript)
+
+
+def _run_sequential(audio_files: List[Path], on_result: OnResult, on_failure: OnFailure):
+    """
+    Modo secuencial: transcribe y analiza una llamada a la vez.
+    `on_result(idx, voc_data)` se llama apenas termina cada llamada;
+    `on_failure(idx, etapa, error)` si falla, y se sigue con la siguiente.
+    """
+    for idx, audio_file in enumerate(audio_files):
+        print(f"\nProcesando: {audio_file.name}")
+
+        # Transcripción con Deepgram
+        try:
+            transcript = _transcribe(audio_file)
+        except Exception as e:
+            on_failure(idx, STAGE_TRANSCRIPTION, e)
+            continue
+
+        # Análisis Voz del Cliente (servicio, conoce, voz, bucket, sentimiento)
+        try:
+            voc_data = analyze_call(transcript, audio_file.stem)
+        except Exception as e:
+            on_failure(idx, STAGE_ANALYSIS, e)
+            continue
+        _log_voc(audio_file, voc_data)
+        on_result(idx, voc_data)
+
+
+def _run_concurrent(audio_files: List[Path], on_result: OnResult, on_failure: OnFailure):
+    """
+    Modo concurrente: dos pools de hilos independientes.
+    - Deepgram transcribe hasta DEEPGRAM_CONCURRENCY audios a la vez.
+    - Apenas termina una transcripción, pasa al pool de OpenAI
+      (hasta OPENAI_CONCURRENCY análisis a la vez), sin esperar al resto.
+
+    `on_result(idx, voc_data)` se llama (desde el hilo principal) apenas termina
+    cada análisis; `idx` es la posición del audio en `audio_files`. Una llamada que
+    falla se informa con `on_failure(idx, etapa, error)` y no afecta a las demás.
+    """
+    print(
+        f"Modo concurrente: Deepgram={DEEPGRAM_CONCURRENCY} hilos, "
+        f"OpenAI={OPENAI_CONCURRENCY} hilos"
+    )
+
+    with ThreadPoolExecutor(max_workers=DEEPGRAM_CONCURRENCY, thread_name_prefix="deepgram") as stt_pool, \
+            ThreadPoolExecutor(max_workers=OPENAI_CONCURRENCY, thread_name_prefix="openai") as llm_pool:
+
+        stt_futures = {
+            stt_pool.submit(_transcribe, audio_file): idx
+            for idx, audio_file in enumerate(audio_files)
+        }
+        llm_futures = {}
+        pending = set(stt_futures)
+
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in stt_futures:
+                        # Cada transcripción que termina se encola de inmediato para análisis
+                        idx = stt_futures[future]
+                        try:
+                            transcript = future.result()
+                        except Exception as e:
+                            on_failure(idx, STAGE_TRANSCRIPTION, e)
+                            continue
+                        llm_future = llm_pool.submit(analyze_call, transcript, audio_files[idx].stem)
+                        llm_futures[llm_future] = idx
+                        pending.add(llm_future)
+                    else:
+                        idx = llm_futures[future]
+                        try:
+                            voc_data = future.result()
+                        except Exception as e:
+                            on_failure(idx, STAGE_ANALYSIS, e)
+                            continue
+                        _log_voc(audio_files[idx], voc_data)
+                        on_result(idx, voc_data)
+        except BaseException:
+            # Interrupción (Ctrl+C) o error al guardar: se cancela lo pendiente y se propaga
+            for future in list(stt_futures) + list(llm_futures):
+                future.cancel()
+            raise
+
+
+def _run_batched(audio_files: List[Path], on_result: OnResult, on_failure: OnFailure):
+    """
+    Modo agrupado (VOC_BATCH_ANALYSIS): Deepgram transcribe en paralelo y las
+    transcripciones se van juntando hasta llenar el presupuesto de un request
+    (VOC_MAX_CHARS caracteres o VOC_BATCH_MAX_ITEMS llamadas); cada grupo lleno
+    se envía de inmediato a OpenAI con `analyze_voc_batch`.
+    Con niveles activos, la muestra auditada (VOC_TIER_AUDIT_RATE) de las llamadas resueltas
+    localmente también va a OpenAI, como en `analyze_voc_tiered`.
+    Las fallas se informan por llamada con `on_failure(idx, etapa, error)`.
+    """
+    print(
+        f"Modo agrupado: Deepgram={DEEPGRAM_CONCURRENCY} hilos, OpenAI={OPENAI_CONCURRENCY} hilos, "
+        f"hasta {VOC_BATCH_MAX_ITEMS} llamadas / {VOC_MAX_CHARS} caracteres por request"
+    )
+
+    with ThreadPoolExecutor(max_workers=DEEPGRAM_CONCURRENCY, thread_name_prefix="deepgram") as stt_pool, \
+            ThreadPoolExecutor(max_workers=OPENAI_CONCURRENCY, thread_name_prefix="openai") as llm_pool:
+
+        stt_futures = {
+            stt_pool.submit(_transcribe, audio_file): idx
+            for idx, audio_file in enumerate(audio_files)
+        }
+        index_by_stem = {f.stem: idx for idx, f in enumerate(audio_files)}
+        llm_futures = {}
+        pending = set(stt_futures)
+        buffer: dict = {}
+        buffer_chars = 0
+        audits: dict = {}  # stem -> resultado local de las llamadas auditadas
+
+        def flush():
+            nonlocal buffer, buffer_chars
+            if buffer:
+                errors: dict = {}
+                llm_future = llm_pool.submit(analyze_voc_batch, buffer, errors)
+                llm_futures[llm_future] = (buffer, errors)
+                pending.add(llm_future)
+                buffer, buffer_chars = {}, 0
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+                for future in done:
+                    if future in stt_futures:
+                        idx = stt_futures[future]
+                        stem = audio_files[idx].stem
+                        try:
+                            transcript = future.result()
+                        except Exception as e:
+                            on_failure(idx, STAGE_TRANSCRIPTION, e)
+                            continue
+                        try:
+                            with metrics.bind_call(stem):
+                                transcript = prepare_for_analysis(transcript, stem)
+
+                                # Con niveles activos, las llamadas claras se resuelven localmente
+                                local = resolve_locally(transcript, stem) if VOC_TIERED else None
+                        except Exception as e:
+                            on_failure(idx, STAGE_ANALYSIS, e)
+                            continue
+                        if local is not None:
+                            if not sampled_for_audit(transcript):
+                                _log_voc(audio_files[idx], local)
+                                on_result(idx, local)
+                                continue
+                            # Muestra auditada: se analiza también con OpenAI y se usa ese resultado
+                            audits[stem] = local
+
+                        # Misma medida que `pack_batches`: si esta llamada ya no cabe, el grupo
+                        # se envía antes de agregarla (si no, quedaría sola en un request aparte)
+                        size = len(transcript) + len(stem)
+                        if buffer and buffer_chars + size > VOC_MAX_CHARS:
+                            flush()
+                        buffer[stem] = transcript
+                        buffer_chars += size
+                        if buffer_chars >= VOC_MAX_CHARS or len(buffer) >= VOC_BATCH_MAX_ITEMS:
+                            flush()
+                    else:
+                        items, errors = llm_futures[future]
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            results, errors = {}, {stem: e for stem in items}
+                        for stem in items:
+                            idx = index_by_stem[stem]
+                            local = audits.pop(stem, None)
+                            if stem in results:
+                                if local is not None:
+                                    record_audit(local, results[stem])
+                                _log_voc(audio_files[idx], results[stem])
+                                on_result(idx, results[stem])
+                            elif local is not None:
+                                # Falló solo la auditoría: la llamada queda con el resultado local
+                                _log_voc(audio_files[idx], local)
+                                on_result(idx, local)
+                            else:
+                                on_failure(idx, STAGE_ANALYSIS, errors.get(stem) or RuntimeError("Sin resultado"))
+
+                # Sin más transcripciones en curso: se envía lo que quede en el buffer
+                if not any(f in stt_futures for f in pending):
+                    flush()
+        except BaseException:
+            for future in list(stt_futures) + list(llm_futures):
+                future.cancel()
+            raise
+
+
+def process_calls(
+    input_dir: Path,
+    output_dir: Path,
+    additional_service: str | None = None,
+    audio_files: Optional[List[Path]] = None,
+    export: bool = True,
+    retry_failed: bool = False,
+    dead_letter_dir: Optional[Path] = None,
+):
     """
     Procesa las llamadas:
-    1. Recorre los audios de la carpeta de entrada.
-    2. Omite los audios que ya fueron procesados (según processed_calls.json).
+    1. Recorre los audios de la carpeta de entrada
+       (o usa `audio_files` si se entrega la lista, p.ej. desde el modo daemon).
+    2. Omite los audios que ya fueron procesados (según el historial en output/state/journal.sqlite)
+       y los que están en la cola de fallidas (salvo con `retry_failed`, ver `retry_dead_letters`).
+       La cola es la de `dead_letter_dir` si se entrega (p.ej. la compartida de los workers),
+       si no la de `output_dir`.
     3. Transcribe cada nuevo audio con Deepgram.
     4. Analiza Voz del Cliente con OpenAI (servicio, conoce, voz, bucket).
+       En modo concurrente (VOC_PIPELINE_MODE) ambas etapas corren en paralelo
+       y cada transcripción pasa a OpenAI apenas está lista.
     5. Exporta/actualiza un Excel con las columnas:
     - Número de llamada
     - Documento
@@ -36,35 +360,78 @@ def process_calls(input_dir: Path, output_dir: Path, additional_service: str | N
 
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Archivo donde se guarda el historial de audios ya procesados
-    processed_ids_file = output_dir / "processed_calls.json"
+    # Métricas por etapa (output/logs/run_*.jsonl + voz_cliente.prom) y perfilado opcional
+    metrics.start_run(output_dir)
+    try:
+        with profiled(output_dir):
+            _process_calls(input_dir, output_dir, audio_files, export, retry_failed, dead_letter_dir)
+    finally:
+        if VOC_AUDIO_PREPROCESS:
+            shutdown_pool()
+            evict_audio_cache()
+        metrics.finish_run()
 
-    # 1) Cargar IDs ya procesados (stems de los archivos de audio)
-    if processed_ids_file.exists():
-        try:
-            with processed_ids_file.open("r", encoding="utf-8") as f:
-                processed_ids = set(json.load(f))
-        except Exception as e:
-            print(f"[WARN] No se pudo leer processed_calls.json ({e}). Se reinicia el historial.")
-            processed_ids = set()
-    else:
-        processed_ids = set()
+
+def _process_calls(
+    input_dir: Path,
+    output_dir: Path,
+    audio_files: Optional[List[Path]] = None,
+    export: bool = True,
+    retry_failed: bool = False,
+    dead_letter_dir: Optional[Path] = None,
+):
+    """
+    Cuerpo de `process_calls` (ver su documentación).
+    Con `export=False` las filas quedan solo en el historial (pendientes de exportar),
+    p.ej. en los workers, cuyo resultado se combina después con `--merge`.
+    """
+    # 1) Abrir el historial de llamadas procesadas (cada llamada se confirma al terminar)
+    # y la cola de llamadas fallidas
+    journal = open_journal(output_dir)
+    dead_letter = open_dead_letter(dead_letter_dir or output_dir)
 
     # 2) Listar todos los audios en la carpeta de entrada
-    audio_files = list(input_dir.glob("*"))
+    # (ordenados por nombre para que el orden del batch y del Excel sea estable)
+    scanned = audio_files is None
+    if scanned:
+        with metrics.span("escaneo") as span:
+            # Solo archivos (se ignoran carpetas como .claims de los workers)
+            with os.scandir(input_dir) as it:
+                audio_files = sorted(Path(e.path) for e in it if e.is_file())
+            span["files"] = len(audio_files)
+    else:
+        audio_files = sorted(audio_files)
     if not audio_files:
         print("No se encontraron audios en la carpeta de entrada.")
-        export_to_excel([], output_dir)
+        if export and journal.pending_export():
+            export_pending(journal, output_dir)
         return
 
     # Filtrar solo audios nuevos (no procesados aún)
-    new_audio_files = [f for f in audio_files if f.stem not in processed_ids]
+    with metrics.span("filtro_nuevos") as span:
+        by_stem = {f.stem: f for f in audio_files}
+        new_stems = journal.filter_new(by_stem)
+        not_done = len(new_stems)
+        if not retry_failed:
+            new_stems = dead_letter.filter_not_queued(new_stems)
+        new_audio_files = [by_stem[stem] for stem in new_stems]
+        span["files"] = len(new_audio_files)
 
-    print(f"Total de audios en carpeta: {len(audio_files)}")
-    print(f"Audios ya procesados (según JSON): {len(processed_ids)}")
+    print(f"Total de audios {'en carpeta' if scanned else 'recibidos'}: {len(audio_files)}")
+    print(f"Audios ya procesados (según historial): {len(audio_files) - not_done}")
+    if not_done > len(new_audio_files):
+        print(f"Audios en la cola de fallidas (se omiten): {not_done - len(new_audio_files)}")
     print(f"Audios NUEVOS por procesar: {len(new_audio_files)}")
 
+    # Filas de una ejecución anterior que se interrumpió antes de exportar
+    # (se exportan junto con las de este batch)
+    has_pending = export and bool(journal.pending_export())
+    if has_pending:
+        print("Se encontraron llamadas ya procesadas pendientes de exportar (ejecución anterior interrumpida).")
+
     if not new_audio_files:
+        if has_pending and export:
+            export_pending(journal, output_dir)
         print("No hay llamadas nuevas por procesar. Fin del proceso.")
         return
 
@@ -73,76 +440,142 @@ def process_calls(input_dir: Path, output_dir: Path, additional_service: str | N
         print(f"Se procesarán solo las primeras {VOC_MAX_CALLS_PER_BATCH} llamadas nuevas para este batch.")
         new_audio_files = new_audio_files[:VOC_MAX_CALLS_PER_BATCH]
 
-    processed_data = []
+    # 3) Transcribir y analizar solo los audios nuevos.
+    # Cada llamada se guarda en el historial (con su fila) apenas termina,
+    # así una caída a mitad del batch no pierde lo ya pagado.
+    def on_result(idx: int, voc_data: dict):
+        audio_file = new_audio_files[idx]
+        journal.record_done(audio_file.stem, build_row(idx + 1, audio_file, voc_data), PROMPT_VERSION)
+        if retry_failed:
+            dead_letter.remove([audio_file.stem])
 
-    # 3) Procesar solo los audios nuevos
-    for idx, audio_file in enumerate(new_audio_files, start=1):
-        print(f"\nProcesando: {audio_file.name}")
+    # Una llamada que falla no detiene el batch: queda en la cola de fallidas
+    failed: List[str] = []
 
-        # 3.1) Transcripción con Deepgram
-        transcript = transcribe_file_with_deepgram(audio_file)
-
-        # 3.2) Análisis Voz del Cliente (servicio, conoce, voz, bucket, sentimiento)
-        voc_data = analyze_voc(transcript)
-
-        # ----- LOG DE LO QUE DETECTA EL ANALYSIS -----
-        print(f"[VOC] Servicio detectado: {voc_data.get('additional_service')}")
-        print(f"[VOC] Conoce servicio:    {voc_data.get('knows_additional_service')}")
-        print(f"[VOC] Bucket:             {voc_data.get('voice_bucket')}")
-        print(f"[VOC] Voz Zoom:           {voc_data.get('customer_voice')}")
-        print(f"[VOC] Sentimiento:        {voc_data.get('sentiment')}")
-
-        # 3.3) Parsear nombre del archivo
-        # Formato esperado:
-        # documento_fechaHora_min_seg_numeroCliente_TMO.ext
-        # ej: 53134176_2025-11-01 10_48_49_3164660199_54.mp3
-        file_name = audio_file.stem
-        partes = file_name.split("_")
-
-        # Documento asesor
-        documento = partes[0] if len(partes) >= 1 else ""
-
-        # Número cliente y TMO: usamos los dos últimos elementos
-        numero_cliente = partes[-2] if len(partes) >= 2 else ""
-        tmo = partes[-1] if len(partes) >= 1 else ""
-
-        # Fecha de llamada
-        fecha_llamada = ""
-        if len(partes) >= 2:
-            # partes[1] = "2025-11-01 10"
-            fecha_hora_bruta = partes[1]
-            solo_fecha = fecha_hora_bruta.split(" ")[0]  # "2025-11-01"
-            try:
-                dt = datetime.strptime(solo_fecha, "%Y-%m-%d")
-                fecha_llamada = dt.strftime("%d-%m-%Y")  # "01-11-2025"
-            except Exception:
-                fecha_llamada = solo_fecha  # fallback
-
-        # 3.4) Agregar registro a la lista de filas nuevas
-        processed_data.append({
-            # Este número es solo el consecutivo dentro del batch de audios nuevos
-            "Número de llamada": idx,
-            "Documento": documento,
-            "Fecha de llamada": fecha_llamada,
-            "Número cliente": numero_cliente,
-            "TMO": tmo,
-            "Servicio adicional": voc_data.get("additional_service", ""),
-            "Voz de cliente": voc_data.get("voice_bucket", ""),
-            "Voz cliente Zoom": voc_data.get("customer_voice", ""),
-            "Conoce (Si/No)": voc_data.get("knows_additional_service", ""),
-            "Sentimiento": voc_data.get("sentiment", ""),
-        })
-
-        # 3.5) Marcar este audio como procesado (usamos el nombre sin extensión como ID)
-        processed_ids.add(audio_file.stem)
-
-    # 4) Guardar el historial actualizado de audios procesados
-    try:
-        with processed_ids_file.open("w", encoding="utf-8") as f:
-            json.dump(sorted(processed_ids), f, ensure_ascii=False, indent=2)
-        print(f"\nHistorial de llamadas procesadas actualizado en: {processed_ids_file}")
-    except Exception as e:
-        print(f"[WARN] No se pudo guardar processed_calls.json: {e}")
-
-    # 5) Exportar/actualizar Excel con las NUEVAS filas
-    export_to_excel(processed_data, output_dir)
+    def on_failure(idx: int, stage: str, error: Exception):
+        audio_file = new_audio_files[idx]
+        attempts = dead_letter.record_failure(audio_file.stem, audio_file, stage, error)
+        metrics.record("llamada_fallida", 0.0, call_id=audio_file.stem, status="error",
+                       failed_stage=stage, error=type(error).__name__, attempts=attempts)
+        failed.append(audio_file.stem)
+        print(f"[Fallida] {audio_file.name}: falló en {stage} (intento {attempts}): {type(error).__name__}: {error}")
+
+    if VOC_BATCH_ANALYSIS:
+        _run_batched(new_audio_files, on_result, on_failure)
+    elif VOC_PIPELINE_MODE == "secuencial":
+        _run_sequential(new_audio_files, on_result, on_failure)
+    else:
+        _run_concurrent(new_audio_files, on_result, on_failure)
+
+    print(f"\nHistorial de llamadas procesadas actualizado en: {journal.db_path}")
+    if failed:
+        queue = dead_letter.summary()
+        print(
+            f"[Fallidas] {len(failed)} de {len(new_audio_files)} llamadas fallaron en este batch "
+            f"(cola: {queue['total']}, agotadas: {queue['exhausted']}). "
+            f"Reintentar con: python main.py --reintentar-fallidos"
+        )
+
+    # 4) Exportar/actualizar Excel con las NUEVAS filas
+    if export:
+        export_pending(journal, output_dir)
+
+    if TRANSCRIPT_CACHE_ENABLED:
+        stats = get_transcript_cache().stats()
+        print(
+            f"[Caché transcripciones] aciertos={stats['hits']} fallos={stats['misses']} "
+            f"entradas={stats['entries']} tamaño={stats['size_bytes'] / 1024:.1f} KB"
+        )
+
+    if LLM_CACHE_ENABLED:
+        stats = get_llm_cache().stats()
+        print(
+            f"[Caché análisis] aciertos={stats['hits']} fallos={stats['misses']} "
+            f"entradas={stats['entries']} tamaño={stats['size_bytes'] / 1024:.1f} KB"
+        )
+
+    if VOC_TIERED:
+        tiers = tier_stats.summary()
+        agreement = f"{tiers['agreement']:.0%}" if tiers["agreement"] is not None else "sin muestra"
+        print(
+            f"[Niveles] local={tiers['local']} ({tiers['local_ratio']:.0%}) openai={tiers['openai']} "
+            f"auditadas={tiers['audited']} acuerdo={agreement}"
+        )
+
+    usage = get_usage_summary()
+    print(
+        f"[OpenAI] requests={usage['requests']} prompt={usage['prompt_tokens']} "
+        f"(en caché={usage['cached_tokens']}, {usage['cached_ratio']:.0%}) "
+        f"completion={usage['completion_tokens']}"
+    )
+
+    for scheduler in (deepgram_scheduler, openai_scheduler):
+        s = scheduler.stats()
+        if s["retries"] or s["throttled"] or s["failed"]:
+            print(
+                f"[{scheduler.name}] requests={s['requests']} reintentos={s['retries']} "
+                f"429={s['throttled']} fallidos={s['failed']} concurrencia final={s['concurrency']}"
+            )
+
+
+def export_pending(journal: CallJournal, output_dir: Path):
+    """
+    Exporta las filas confirmadas en el historial que aún no llegaron al almacén/Excel
+    y las marca como exportadas.
+    """
+    pending = journal.pending_export()
+    call_ids = [call_id for call_id, _, _ in pending]
+    with metrics.span("exportacion", rows=len(pending)):
+        export_to_excel(
+            [row for _, row, _ in pending],
+            output_dir,
+            call_ids=call_ids,
+            prompt_version=[version for _, _, version in pending],
+        )
+    journal.mark_exported(call_ids)
+
+
+def retry_dead_letters(
+    input_dir: Path,
+    output_dir: Path,
+    additional_service: str | None = None,
+    include_exhausted: bool = False,
+    ignore_backoff: bool = False,
+):
+    """
+    Reintenta las llamadas de la cola de fallidas que ya cumplieron su espera
+    (backoff exponencial por intentos, ver VOC_DLQ_*). Las que terminan bien salen de la
+    cola y se exportan; las que vuelven a fallar quedan con un intento más y más espera.
+    Con `include_exhausted` se reintentan también las que agotaron VOC_DLQ_MAX_ATTEMPTS,
+    y con `ignore_backoff`, todas las de la cola sin esperar (p.ej. tras una caída del proveedor).
+    """
+    dead_letter = open_dead_letter(output_dir)
+    journal = open_journal(output_dir)
+    due = dead_letter.due(include_exhausted=include_exhausted, ignore_backoff=ignore_backoff)
+    queue = dead_letter.summary()
+    print(
+        f"[Fallidas] En cola: {queue['total']} ({', '.join(f'{k}={v}' for k, v in queue['by_stage'].items()) or '-'}), "
+        f"listas para reintentar: {len(due)}, agotadas: {queue['exhausted']}"
+    )
+    if not due:
+        return
+
+    # Las que ya se procesaron por otro camino (p.ej. se copiaron de nuevo) solo salen de la cola
+    done = set(e["call_id"] for e in due) - set(journal.filter_new(e["call_id"] for e in due))
+    if done:
+        dead_letter.remove(done)
+
+    audio_files = []
+    for entry in due:
+        if entry["call_id"] in done:
+            continue
+        path = Path(entry["source_path"])
+        if not path.exists():
+            path = input_dir / path.name
+        if not path.exists():
+            print(f"[Fallidas] {entry['call_id']}: el audio ya no existe ({entry['source_path']}); se deja en la cola.")
+            continue
+        audio_files.append(path)
+
+    if audio_files:
+        process_calls(input_dir, output_dir, additional_service, audio_files=audio_files, retry_failed=True)
@@ -0,0 +1,278 @@
+# src/ratelimit.py
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from .config import (
+    DEEPGRAM_CONCURRENCY,
+    DEEPGRAM_RPM,
+    OPENAI_CONCURRENCY,
+    OPENAI_RPM,
+    OPENAI_TPM,
+    VOC_MAX_RETRIES,
+    VOC_RETRY_BASE_S,
+    VOC_RETRY_MAX_S,
+)
+from .metrics import metrics
+
+# Códigos HTTP que vale la pena reintentar (el resto de 4xx son errores definitivos)
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class ProviderHTTPError(RuntimeError):
+    """
+    Error de una API externa (Deepgram u OpenAI).
+
+    `status` es el código HTTP (None si no hubo respuesta: timeout o conexión caída)
+    y `retry_after` los segundos que pidió esperar el proveedor, si los indicó.
+    """
+
+    def __init__(self, provider: str, status: Optional[int], message: str, retry_after: Optional[float] = None):
+        super().__init__(f"Error en {provider} [{status if status is not None else 'sin respuesta'}]: {message}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in _RETRYABLE_STATUS
+
+    @property
+    def throttled(self) -> bool:
+        return self.status == 429
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Segundos a esperar según los encabezados de la respuesta
+    (`retry-after-ms`, o `Retry-After` en segundos o como fecha HTTP).
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """
+    Cubeta de fichas que se rellena a `per_minute` fichas por minuto (capacidad = un minuto).
+
+    Sirve tanto para requests/minuto (1 ficha por request) como para tokens/minuto
+    (fichas = tokens estimados). Con `per_minute` en 0 no limita nada.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """
+        Bloquea hasta poder consumir `amount` fichas. Un pedido mayor que la capacidad
+        se limita a la capacidad (si no, nunca se podría atender).
+        """
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, delta: float):
+        """
+        Corrige el consumo cuando se conoce el costo real (delta > 0 consume más, < 0 devuelve).
+        El saldo puede quedar negativo: los siguientes pedidos esperan a que se recupere.
+        """
+        if self.rate <= 0 or not delta:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class AdaptiveLimiter:
+    """
+    Límite de concurrencia AIMD (aumento aditivo, disminución multiplicativa).
+
+    - Cada `limit` respuestas sanas seguidas, el límite sube en 1 (hasta `max_limit`).
+    - Ante un 429 el límite se reduce a la mitad (como mínimo 1), una vez por ventana de espera.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self._in_flight = 0
+        self._healthy = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            self._healthy += 1
+            if self._healthy >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._healthy = 0
+                self._cond.notify()
+
+    def on_throttle(self, cooldown_s: float = 1.0):
+        with self._cond:
+            self._healthy = 0
+            now = time.monotonic()
+            # Varios 429 de la misma ráfaga cuentan como uno solo
+            if now - self._last_decrease < cooldown_s:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit // 2)
+
+
+class ProviderScheduler:
+    """
+    Planificador compartido de los requests a un proveedor.
+
+    Antes de cada intento respeta el límite de concurrencia adaptativo, los requests/minuto
+    y los tokens/minuto. Si el intento falla con un error reintentable, espera con backoff
+    exponencial y jitter (o lo que indique Retry-After, pausando a todos los hilos) y reintenta
+    hasta `max_retries` veces.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rpm: int = 0,
+        tpm: int = 0,
+        max_retries: int = VOC_MAX_RETRIES,
+        base_delay_s: float = VOC_RETRY_BASE_S,
+        max_delay_s: float = VOC_RETRY_MAX_S,
+    ):
+        self.name = name
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _wait_if_paused(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 1.0))
+
+    def _backoff(self, attempt: int, error: ProviderHTTPError) -> float:
+        if error.retry_after is not None:
+            # El proveedor dijo cuánto esperar: se pausa a todos los hilos de este proveedor
+            delay = min(error.retry_after, self.max_delay_s) + random.uniform(0, self.base_delay_s / 2)
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            return delay
+        # "Full jitter": uniforme entre 0 y base * 2^intento (con tope)
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+    def call(self, fn: Callable, tokens: int = 0, actual_tokens: Optional[Callable] = None):
+        """
+        Ejecuta `fn()` respetando los límites y con reintentos.
+
+        `tokens` es el costo estimado en tokens (para el límite por minuto) y `actual_tokens(resultado)`,
+        si se da, devuelve el costo real para corregir la estimación.
+        """
+        attempt = 0
+        while True:
+            self._wait_if_paused()
+            self.requests_bucket.acquire(1)
+            if tokens:
+                self.tokens_bucket.acquire(tokens)
+            self.limiter.acquire()
+            self._count("requests")
+            try:
+                result = fn()
+            except ProviderHTTPError as e:
+                self.limiter.release()
+                if e.throttled:
+                    self._count("throttled")
+                    self.limiter.on_throttle(cooldown_s=e.retry_after or self.base_delay_s)
+                if not e.retryable or attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                attempt += 1
+                self._count("retries")
+                delay = self._backoff(attempt, e)
+                print(
+                    f"[{self.name}] {e} — reintento {attempt}/{self.max_retries} en {delay:.1f}s "
+                    f"(concurrencia={self.limiter.limit})"
+                )
+                metrics.record(f"espera_{self.name.lower()}", delay * 1000, status_code=e.status, attempt=attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.limiter.release()
+                raise
+
+            self.limiter.release()
+            self.limiter.on_success()
+            if tokens and actual_tokens is not None:
+                try:
+                    self.tokens_bucket.adjust(actual_tokens(result) - tokens)
+                except Exception:
+                    pass
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["concurrency"] = self.limiter.limit
+        return stats
+
+
+# Planificadores compartidos por todo el proceso (uno por proveedor)
+deepgram_scheduler = ProviderScheduler("Deepgram", DEEPGRAM_CONCURRENCY, rpm=DEEPGRAM_RPM)
+openai_scheduler = ProviderScheduler("OpenAI", OPENAI_CONCURRENCY, rpm=OPENAI_RPM, tpm=OPENAI_TPM)
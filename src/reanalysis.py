@@ -0,0 +1,217 @@
+# src/reanalysis.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .analyzer import PROMPT_VERSION, analyze_voc_batch, pack_batches
+from .compaction import prepare_for_analysis
+from .config import (
+    OPENAI_CONCURRENCY,
+    TRANSCRIPT_CACHE_ENABLED,
+    TRANSCRIPTS_DIR,
+    VOC_BATCH_ANALYSIS,
+    VOC_EXCEL_MODE,
+    VOC_TIERED,
+)
+from .exporter import build_excel
+from .metrics import metrics
+from .pipeline import analyze_call, build_row, parse_file_name
+from .result_store import open_result_store, state_dir, to_iso_date
+from .storage import connect_sqlite, filter_in
+from .tiered import record_audit, resolve_locally, sampled_for_audit
+from .transcript_cache import get_transcript_cache
+
+# Llamadas que se cargan, analizan y confirman juntas (lo máximo que se repite tras una caída)
+_WINDOW = 200
+
+
+class ReanalysisJournal:
+    """
+    Avance del reanálisis por (llamada, versión de prompt), en SQLite.
+
+    Permite retomar un reanálisis interrumpido: las llamadas ya reanalizadas con la
+    versión actual del prompt no se vuelven a enviar. Si el prompt cambia de nuevo,
+    todas vuelven a quedar pendientes.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS reanalysis (
+                    call_id         TEXT NOT NULL,
+                    prompt_version  TEXT NOT NULL,
+                    done_at         REAL NOT NULL,
+                    PRIMARY KEY (call_id, prompt_version)
+                )
+                """
+            )
+
+    def filter_pending(self, call_ids: Iterable[str], prompt_version: str) -> List[str]:
+        """
+        Devuelve, en el mismo orden, los IDs que aún no se reanalizaron con `prompt_version`.
+        """
+        call_ids = list(call_ids)
+        with self._lock:
+            done = filter_in(
+                self._conn,
+                "SELECT call_id FROM reanalysis WHERE prompt_version = ? AND call_id IN ({marks})",
+                call_ids,
+                params=[prompt_version],
+            )
+        return [c for c in call_ids if c not in done]
+
+    def mark_done(self, call_ids: List[str], prompt_version: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO reanalysis (call_id, prompt_version, done_at) VALUES (?, ?, ?)",
+                [(c, prompt_version, now) for c in call_ids],
+            )
+
+
+def _collect_sources() -> Dict[str, Callable[[], str]]:
+    """
+    {call_id: función que devuelve la transcripción}, sin cargar los textos en memoria.
+    Primero TRANSCRIPTS_DIR/*.txt; las llamadas sin .txt se toman de la caché de transcripciones.
+    """
+    sources: Dict[str, Callable[[], str]] = {}
+    if TRANSCRIPTS_DIR.exists():
+        for txt in TRANSCRIPTS_DIR.glob("*.txt"):
+            sources[txt.stem] = lambda p=txt: p.read_text(encoding="utf-8")
+
+    if TRANSCRIPT_CACHE_ENABLED:
+        cache = get_transcript_cache()
+        for source_name, key in cache.keys_by_source().items():
+            call_id = Path(source_name).stem
+            if call_id not in sources:
+                sources[call_id] = lambda k=key: (cache.get(k) or {}).get("transcript", "")
+    return sources
+
+
+def _in_range(call_id: str, date_from: Optional[str], date_to: Optional[str]) -> bool:
+    if not date_from and not date_to:
+        return True
+    call_date = to_iso_date(parse_file_name(call_id)["fecha_llamada"])
+    if not call_date:
+        return False
+    return (not date_from or call_date >= date_from) and (not date_to or call_date <= date_to)
+
+
+def _analyze_window(executor: ThreadPoolExecutor, transcripts: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Analiza un grupo de transcripciones en paralelo (agrupadas por request si VOC_BATCH_ANALYSIS).
+    Las llamadas que fallan quedan fuera del resultado (siguen pendientes para el próximo reanálisis).
+    """
+    errors: Dict[str, Exception] = {}
+    results: Dict[str, dict] = {}
+    if VOC_BATCH_ANALYSIS:
+        transcripts = {c: prepare_for_analysis(t, c) for c, t in transcripts.items()}
+
+        # Niveles (igual que `analyze_call`): lo claro se resuelve local; la muestra auditada va a OpenAI
+        audits: Dict[str, dict] = {}
+        if VOC_TIERED:
+            for c, t in list(transcripts.items()):
+                local = resolve_locally(t, c)
+                if local is None:
+                    continue
+                if sampled_for_audit(t):
+                    audits[c] = local
+                else:
+                    results[c] = local
+                    del transcripts[c]
+
+        groups = pack_batches(transcripts)
+        futures = {
+            executor.submit(analyze_voc_batch, {c: transcripts[c] for c in g}, errors): g for g in groups
+        }
+        for future, group in futures.items():
+            try:
+                results.update(future.result())
+            except Exception as e:
+                errors.update({c: e for c in group})
+
+        for c, local in audits.items():
+            if c in results:
+                record_audit(local, results[c])
+            else:
+                # Falló solo la auditoría: la llamada queda con el resultado local
+                results[c] = local
+                errors.pop(c, None)
+    else:
+        futures = {c: executor.submit(analyze_call, t, c) for c, t in transcripts.items()}
+        for c, future in futures.items():
+            try:
+                results[c] = future.result()
+            except Exception as e:
+                errors[c] = e
+
+    for c, e in errors.items():
+        print(f"[Reanálisis] ⚠ {c}: {type(e).__name__}: {e} (queda pendiente)")
+    return results
+
+
+def reanalyze(output_dir: Path, date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """
+    Vuelve a clasificar las transcripciones ya guardadas con el prompt actual, SIN llamar a Deepgram.
+
+    - Fuente: TRANSCRIPTS_DIR/*.txt y, para las que no tengan .txt, la caché de transcripciones.
+    - Las llamadas se analizan en paralelo (OPENAI_CONCURRENCY hilos, o agrupadas si VOC_BATCH_ANALYSIS).
+    - Los resultados se agregan al almacén de resultados con la versión del prompt; al leer
+      el almacén gana la fila más reciente, así que el Excel refleja la nueva clasificación.
+    - Se confirma cada _WINDOW llamadas: si se interrumpe, al volver a correrlo sigue donde quedó.
+    - Las llamadas cuya fila vigente en el almacén ya es de la versión actual del prompt no se
+      reenvían (aunque la caché de análisis esté apagada o se haya desalojado).
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    journal = ReanalysisJournal(state_dir(output_dir) / "reanalysis.sqlite")
+    store = open_result_store(output_dir)
+
+    sources = _collect_sources()
+    call_ids = sorted(c for c in sources if _in_range(c, date_from, date_to))
+    pending = journal.filter_pending(call_ids, PROMPT_VERSION)
+
+    # Las que ya se analizaron con este prompt (al procesarlas o en otro reanálisis) quedan marcadas
+    current = store.analyzed_with(pending, PROMPT_VERSION)
+    if current:
+        journal.mark_done(sorted(current), PROMPT_VERSION)
+        pending = [c for c in pending if c not in current]
+    print(
+        f"[Reanálisis] Prompt {PROMPT_VERSION}: {len(call_ids)} transcripciones encontradas, "
+        f"{len(call_ids) - len(pending)} ya analizadas con este prompt, {len(pending)} pendientes."
+    )
+    if not pending:
+        return
+
+    metrics.start_run(output_dir)
+    started = time.perf_counter()
+    done = 0
+    try:
+        with ThreadPoolExecutor(max_workers=OPENAI_CONCURRENCY, thread_name_prefix="openai") as executor:
+            for i in range(0, len(pending), _WINDOW):
+                window = pending[i:i + _WINDOW]
+                transcripts = {c: sources[c]() for c in window}
+                transcripts = {c: t for c, t in transcripts.items() if t.strip()}
+                results = _analyze_window(executor, transcripts)
+
+                ids = [c for c in window if c in results]
+                rows = [build_row(done + n + 1, Path(c), results[c]) for n, c in enumerate(ids)]
+                store.append(rows, ids, PROMPT_VERSION)
+                # Las vacías se marcan (no hay nada que analizar); las fallidas quedan pendientes
+                journal.mark_done([c for c in window if c in results or c not in transcripts], PROMPT_VERSION)
+
+                done += len(window)
+                rate = done / (time.perf_counter() - started)
+                print(f"[Reanálisis] {done}/{len(pending)} llamadas ({rate:.1f}/s)")
+    finally:
+        metrics.finish_run()
+
+    if VOC_EXCEL_MODE != "bajo_demanda":
+        build_excel(output_dir, store=store, only_touched=True)
+    else:
+        print("Excel no regenerado (VOC_EXCEL_MODE=bajo_demanda). Use: python main.py --exportar-excel")
@@ -0,0 +1,234 @@
+# src/result_store.py
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from . import aggregates
+from .storage import connect_sqlite, filter_in
+
+
+def state_dir(output_dir: Path) -> Path:
+    """
+    Carpeta donde se guarda el estado interno del proceso (resultados, historial, etc.).
+    """
+    return output_dir / "state"
+
+
+def to_iso_date(fecha: str) -> str:
+    """
+    Convierte la "Fecha de llamada" (dd-mm-YYYY) a formato ISO (YYYY-mm-dd)
+    para poder filtrar por rango. Si no se puede convertir, devuelve "".
+    """
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(str(fecha).strip()[:10], fmt).strftime("%Y-%m-%d")
+        except Exception:
+            continue
+    return ""
+
+
+class ResultStore:
+    """
+    Almacén canónico de resultados (SQLite, solo se agregan filas).
+
+    Cada ejecución solo escribe sus filas nuevas; nunca se reescribe el histórico.
+    Si una llamada se vuelve a analizar, se agrega otra fila y al leer se toma
+    la más reciente por `call_id`.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                    call_id         TEXT NOT NULL,
+                    call_date       TEXT NOT NULL,
+                    prompt_version  TEXT NOT NULL,
+                    row             TEXT NOT NULL,
+                    inserted_at     REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_call_id ON results(call_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_call_date ON results(call_date)")
+            # Hasta qué fila se escribió cada partición del Excel (ver exporter.build_excel)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS excel_partitions (
+                    partition       TEXT PRIMARY KEY,
+                    last_id         INTEGER NOT NULL,
+                    file            TEXT NOT NULL,
+                    exported_at     REAL NOT NULL
+                )
+                """
+            )
+            # Contadores del resumen (día × asesor × servicio × bucket × sentimiento)
+            aggregates.ensure_schema(self._conn)
+        # Almacén de una versión anterior (con filas pero sin contadores): se calculan una vez
+        self.aggregates_rebuilt = False
+        if self._conn.execute("SELECT 1 FROM results LIMIT 1").fetchone() and \
+                not self._conn.execute("SELECT 1 FROM voc_counted LIMIT 1").fetchone():
+            self.rebuild_aggregates()
+            self.aggregates_rebuilt = True
+
+    def append(self, rows: List[dict], call_ids: List[str], prompt_version: str | List[str] = "") -> int:
+        """
+        Agrega filas nuevas (una por llamada) en una sola transacción.
+        `prompt_version` puede ser una sola versión para todas o una por fila.
+        """
+        now = time.time()
+        if isinstance(prompt_version, str):
+            prompt_version = [prompt_version] * len(rows)
+        records = [
+            (
+                call_id,
+                to_iso_date(row.get("Fecha de llamada", "")),
+                version,
+                json.dumps(row, ensure_ascii=False, default=str),
+                now,
+            )
+            for row, call_id, version in zip(rows, call_ids, prompt_version)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO results (call_id, call_date, prompt_version, row, inserted_at) VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+            # Los contadores del resumen se actualizan en la misma transacción
+            aggregates.apply_rows(
+                self._conn,
+                ((call_id, call_date, row) for row, (call_id, call_date, *_) in zip(rows, records)),
+            )
+        return len(records)
+
+    def rebuild_aggregates(self) -> int:
+        """
+        Recalcula los contadores del resumen desde todo el histórico (la fila vigente de cada llamada).
+        Devuelve la cantidad de llamadas contadas.
+        """
+        reader = connect_sqlite(self.db_path)
+        n = 0
+        try:
+            cursor = reader.execute(
+                "SELECT call_id, call_date, row FROM results "
+                "WHERE id IN (SELECT MAX(id) FROM results GROUP BY call_id) ORDER BY id"
+            )
+            with self._lock, self._conn:
+                aggregates.clear(self._conn)
+                while True:
+                    batch = cursor.fetchmany(1000)
+                    if not batch:
+                        break
+                    aggregates.apply_rows(
+                        self._conn, ((call_id, day, json.loads(row)) for call_id, day, row in batch)
+                    )
+                    n += len(batch)
+        finally:
+            reader.close()
+        print(f"[Resumen] Contadores recalculados desde {n} llamadas del almacén de resultados.")
+        return n
+
+    def summary_counts(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[tuple]:
+        """
+        Filas del resumen: (día, asesor, servicio, bucket, sentimiento, llamadas).
+        """
+        with self._lock:
+            return aggregates.read_counts(self._conn, date_from, date_to)
+
+    def iter_rows(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        undated: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Devuelve las filas vigentes (la más reciente por llamada), en orden de inserción y de a
+        una (memoria constante). `date_from` y `date_to` (YYYY-mm-dd, inclusivos) filtran por
+        fecha de llamada.
+        Con `undated` solo se entregan las filas sin fecha de llamada reconocible.
+
+        Usa una conexión de lectura propia: en modo WAL ve una foto fija del almacén y no
+        bloquea a quien siga agregando filas mientras se escribe el Excel.
+        """
+        where = ["id IN (SELECT MAX(id) FROM results GROUP BY call_id)"]
+        params: list = []
+        if undated:
+            where.append("call_date = ''")
+        if date_from:
+            where.append("call_date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("call_date <= ?")
+            params.append(date_to)
+
+        query = f"SELECT row FROM results WHERE {' AND '.join(where)} ORDER BY id"
+        conn = connect_sqlite(self.db_path)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                batch = cursor.fetchmany(1000)
+                if not batch:
+                    break
+                for (row,) in batch:
+                    yield json.loads(row)
+        finally:
+            conn.close()
+
+    def analyzed_with(self, call_ids: List[str], prompt_version: str) -> set:
+        """
+        IDs cuya fila vigente ya se obtuvo con `prompt_version`.
+        """
+        with self._lock:
+            return filter_in(
+                self._conn,
+                "SELECT call_id FROM results WHERE prompt_version = ? AND id IN "
+                "(SELECT MAX(id) FROM results WHERE call_id IN ({marks}) GROUP BY call_id)",
+                call_ids,
+                params=[prompt_version],
+            )
+
+    def month_versions(self) -> Dict[str, int]:
+        """
+        {mes (YYYY-mm, o "" sin fecha): id de la última fila agregada de ese mes}.
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT substr(call_date, 1, 7), MAX(id) FROM results GROUP BY substr(call_date, 1, 7)"
+            ))
+
+    def exported_partitions(self) -> Dict[str, tuple]:
+        """
+        {partición: (última fila escrita, archivo, fecha de exportación)} según la última escritura del Excel.
+        """
+        with self._lock:
+            return {
+                partition: (last_id, file, exported_at)
+                for partition, last_id, file, exported_at in self._conn.execute(
+                    "SELECT partition, last_id, file, exported_at FROM excel_partitions"
+                )
+            }
+
+    def mark_partition_exported(self, partition: str, last_id: int, file: Path):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO excel_partitions (partition, last_id, file, exported_at) VALUES (?, ?, ?, ?)",
+                (partition, last_id, str(file), time.time()),
+            )
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM results LIMIT 1").fetchone() is None
+
+
+def open_result_store(output_dir: Path) -> ResultStore:
+    """
+    Abre el almacén de resultados asociado a una carpeta de salida.
+    """
+    return ResultStore(state_dir(output_dir) / "results.sqlite")
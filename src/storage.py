@@ -0,0 +1,64 @@
+# src/storage.py
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Sequence, Set
+
+# Máximo de parámetros por consulta IN (...) (límite seguro de SQLite)
+_IN_CHUNK = 500
+
+
+def connect_sqlite(db_path: Path) -> sqlite3.Connection:
+    """
+    Abre (o crea) una base SQLite local para las cachés y registros del proceso.
+
+    - Crea la carpeta si no existe.
+    - Usa modo WAL para que lecturas y escrituras no se bloqueen entre sí.
+    - La conexión se puede compartir entre hilos (el que la usa debe protegerla con un Lock).
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def filter_in(conn: sqlite3.Connection, sql: str, ids: Iterable[str], params: Sequence = ()) -> Set[str]:
+    """
+    Ejecuta `sql` por partes sobre una lista de IDs y devuelve el conjunto de la primera columna.
+    `sql` lleva `{marks}` donde va la lista del IN (...); `params` van antes de los IDs.
+    El llamador protege la conexión con su Lock.
+    """
+    ids = list(ids)
+    found: Set[str] = set()
+    for i in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[i:i + _IN_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        found.update(r[0] for r in conn.execute(sql.format(marks=marks), [*params, *chunk]))
+    return found
+
+
+def evict_lru(conn: sqlite3.Connection, table: str, max_bytes: int = 0, max_entries: int = 0):
+    """
+    Desaloja filas de una tabla de caché, empezando por las de `last_access` más antiguo,
+    hasta quedar bajo `max_bytes` (suma de `size_bytes`) y `max_entries`.
+    Un límite en 0 significa "sin límite". La tabla debe tener `key`, `size_bytes` y `last_access`.
+    """
+    entries, total = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM {table}"
+    ).fetchone()
+
+    def over_limit() -> bool:
+        return (max_bytes > 0 and total > max_bytes) or (max_entries > 0 and entries > max_entries)
+
+    if not over_limit():
+        return
+
+    to_delete = []
+    for key, size in conn.execute(f"SELECT key, size_bytes FROM {table} ORDER BY last_access ASC"):
+        if not over_limit():
+            break
+        to_delete.append((key,))
+        total -= size
+        entries -= 1
+    with conn:
+        conn.executemany(f"DELETE FROM {table} WHERE key = ?", to_delete)
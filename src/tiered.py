@@ -0,0 +1,337 @@
+# src/tiered.py
+import hashlib
+import re
+import threading
+from typing import Optional
+
+from .analyzer import (
+    VALID_BUCKETS,
+    VOC_MATCHER,
+    analyze_voc,
+    classify_sentiment,
+    detect_additional_service,
+)
+from .compaction import AGENT_PHRASES, _agent_speaker, load_utterances
+from .matcher import KeywordMatcher, fold_text
+from .config import (
+    VOC_LOCAL_MIN_CONFIDENCE,
+    VOC_LOCAL_MAX_CHARS,
+    VOC_TIER_AUDIT_RATE,
+)
+
+# ===================== Reglas locales por bucket =====================
+# Frases típicas (en minúscula y sin tildes) que indican cada bucket.
+BUCKET_PHRASES = {
+    "No, fui a la oficina y no pude": [
+        "fui a la oficina", "fui a una oficina", "fui al punto", "fui a la tienda",
+        "en la oficina no me", "me dijeron en la oficina",
+    ],
+    "No, me sale error": [
+        "me sale error", "me sale un error", "sale error", "me aparece error",
+        "me aparece un error", "me da error", "sale un mensaje de error", "no me deja ingresar",
+        "no me deja entrar",
+    ],
+    "No, no lo he activado": [
+        "no lo he activado", "no la he activado", "todavia no lo activo", "aun no lo activo",
+        "no he podido activar", "no lo he podido activar",
+    ],
+    "No, no sabía": [
+        "no sabia", "no tenia conocimiento", "no conocia", "no me habian dicho",
+        "no me dijeron", "primera vez que escucho", "no tenia idea",
+    ],
+    "No, nunca lo hice": [
+        "nunca lo hice", "nunca lo active", "nunca lo he usado", "nunca lo use",
+        "nunca lo he activado",
+    ],
+    "Sí, el técnico lo activó": [
+        "el tecnico lo activo", "el tecnico me lo activo", "el tecnico lo dejo activo",
+        "lo activo el tecnico", "el tecnico lo dejo",
+    ],
+    "Sí, lo uso": [
+        "lo uso", "lo estoy usando", "lo utilizo", "lo usamos", "lo vemos", "si lo veo",
+    ],
+    "Sí, ya está activo.": [
+        "ya esta activo", "ya esta activado", "ya quedo activo", "ya esta funcionando",
+    ],
+    "Sí, ya hice la activación": [
+        "ya hice la activacion", "ya lo active", "ya la active", "ya hice el proceso",
+    ],
+    "Sí, ya lo tengo": [
+        "ya lo tengo", "si lo tengo", "ya la tengo", "si la tengo",
+    ],
+}
+
+# "Conoce el servicio" según el bucket: solo "No, no sabía" implica que no lo conocía.
+KNOWS_BY_BUCKET = {b: ("No" if b == "No, no sabía" else "Si") for b in VALID_BUCKETS}
+
+
+# Buscador compilado de las frases de todos los buckets (una sola pasada)
+BUCKET_MATCHER = KeywordMatcher({
+    phrase: ("bucket", bucket)
+    for bucket, phrases in BUCKET_PHRASES.items()
+    for phrase in phrases
+})
+
+
+# Negaciones que invierten una frase si aparecen justo antes ("la verdad no lo uso").
+# "todavía no" / "aún no" quedan cubiertas por "no".
+NEGATORS = {"no", "nunca", "tampoco", "jamas", "ni"}
+NEGATION_WINDOW = 3  # palabras antes de la frase
+
+_WORD = re.compile(r"\w+")
+
+
+def _is_negated(folded: str, hit) -> bool:
+    """
+    True si hay una negación en las NEGATION_WINDOW palabras previas a la frase.
+    Las frases que ya son negativas ("no sabia", "nunca lo hice") no se invierten:
+    un "no" antes solo las refuerza ("no, no sabía").
+    """
+    if NEGATORS.intersection(_WORD.findall(hit.keyword)):
+        return False
+    before = _WORD.findall(folded[:hit.start])[-NEGATION_WINDOW:]
+    return bool(NEGATORS.intersection(before))
+
+
+# Sin diarización, una oración con estas frases es del asesor (presentación, explicación o
+# trato de "usted"), no la respuesta del cliente
+AGENT_MATCHER = KeywordMatcher({
+    k: ("asesor", k)
+    for k in AGENT_PHRASES + [
+        "usted", "su", "sus", "le cuento", "le comento", "le informo", "le confirmo",
+        "le explico", "para confirmar",
+    ]
+})
+
+_SENTENCE_ENDS = ".!?\n"
+
+
+def _sentence_bounds(text: str, position: int) -> tuple:
+    """
+    (inicio, fin) de la oración (o línea) de `text` que contiene `position`.
+    """
+    start = max(text.rfind(sep, 0, position) for sep in _SENTENCE_ENDS) + 1
+    ends = [i for i in (text.find(sep, position) for sep in _SENTENCE_ENDS) if i != -1]
+    end = min(ends) + 1 if ends else len(text)
+    return start, end
+
+
+def _excerpt(transcript: str, position: int, max_words: int = 25) -> str:
+    """
+    Devuelve la oración de la transcripción que contiene `position` (recortada), como voz del cliente.
+    """
+    start, end = _sentence_bounds(transcript, position)
+    words = transcript[start:end].split()
+    return " ".join(words[:max_words]).strip()
+
+
+def _customer_text(transcript: str, call_id: Optional[str]) -> tuple:
+    """
+    Texto a puntuar y si está separado por hablante: con diarización (turnos guardados por
+    `compaction`), solo los turnos del cliente; si no, la transcripción completa.
+    """
+    utterances = load_utterances(call_id)
+    if utterances and len({u["speaker"] for u in utterances}) >= 2:
+        agent = _agent_speaker(utterances)
+        return "\n".join(u["transcript"].strip() for u in utterances if u["speaker"] != agent), True
+    return transcript, False
+
+
+def _skip_hit(text: str, hit, diarized: bool) -> bool:
+    """
+    Coincidencias que no son la respuesta del cliente: las que están en una pregunta
+    ("¿usted lo usó alguna vez?") y, sin diarización, las de oraciones del asesor
+    (líneas "Asesor:" de la transcripción compactada o con frases del asesor).
+    """
+    start, end = _sentence_bounds(text, hit.start)
+    sentence = text[start:end].strip()
+    if sentence.endswith("?") or "¿" in text[start:hit.start]:
+        return True
+    if diarized:
+        return False
+    line = text[text.rfind("\n", 0, hit.start) + 1:]
+    if line.startswith("Asesor:"):
+        return True
+    if line.startswith("Cliente:"):
+        return False
+    return bool(AGENT_MATCHER.find_all(sentence))
+
+
+def _compatible(a: str, b: str) -> bool:
+    """
+    Dos buckets no se contradicen si son el mismo o ambos son "Sí, …" ("ya lo tengo y lo uso").
+    """
+    return a == b or (a.startswith("Sí") and b.startswith("Sí"))
+
+
+def classify_locally(transcript: str, call_id: Optional[str] = None) -> dict:
+    """
+    Clasificador local por reglas y diccionarios (sin OpenAI).
+
+    Devuelve el mismo formato de `analyze_voc` más:
+    - confidence: 0 a 1 (qué tan claro es el caso)
+    - matched_buckets: {bucket: número de frases encontradas}
+
+    Solo cuenta lo que dice el cliente: con `call_id` y diarización, sus turnos; sin ella, las
+    oraciones que no parecen del asesor. Las preguntas y las frases negadas ("la verdad no lo uso")
+    no cuentan, y un bucket "Sí, …" con palabras negativas del cliente ("ya está activo, no
+    funciona") queda con confianza 0 para que lo resuelva OpenAI.
+    """
+    transcript = transcript or ""
+    service = detect_additional_service(transcript)
+    text, diarized = _customer_text(transcript, call_id)
+    folded = fold_text(text)
+
+    hits = {}
+    first_position = {}
+    for hit in BUCKET_MATCHER.find_all(text):
+        if _skip_hit(text, hit, diarized) or _is_negated(folded, hit):
+            continue
+        hits[hit.label] = hits.get(hit.label, 0) + 1
+        first_position.setdefault(hit.label, hit.start)
+
+    if not hits:
+        return {
+            "additional_service": service,
+            "knows_additional_service": "No",
+            "customer_voice": "",
+            "voice_bucket": "No, no sabía",
+            "sentiment": classify_sentiment(text),
+            "confidence": 0.0,
+            "matched_buckets": {},
+        }
+
+    ranked = sorted(hits.items(), key=lambda kv: kv[1], reverse=True)
+    bucket = ranked[0][0]
+    support = sum(n for b, n in ranked if _compatible(bucket, b))
+    conflict = sum(n for b, n in ranked if not _compatible(bucket, b))
+
+    # Buckets compatibles: base alta; buckets en conflicto: proporcional al dominante
+    if conflict == 0:
+        confidence = 0.6 + min(0.2, 0.1 * (support - 1))
+    else:
+        confidence = 0.45 * support / (support + conflict)
+
+    # Servicio identificado (salvo "No, no sabía", donde es normal no identificarlo)
+    if service != "No identificado":
+        confidence += 0.1
+    elif bucket != "No, no sabía":
+        confidence -= 0.2
+
+    # Llamadas cortas y formulaicas son más confiables
+    confidence += 0.1 if len(transcript) <= VOC_LOCAL_MAX_CHARS else -0.1
+
+    # Afirmación con quejas (p.ej. "ya está activo, no funciona"): contradicción, se escala
+    if bucket.startswith("Sí") and VOC_MATCHER.counts(text)[("sentimiento", "negativo")]:
+        confidence = 0.0
+
+    voice = _excerpt(text, first_position[bucket])
+    return {
+        "additional_service": service,
+        "knows_additional_service": KNOWS_BY_BUCKET[bucket],
+        "customer_voice": voice,
+        "voice_bucket": bucket,
+        "sentiment": classify_sentiment(voice if voice else text),
+        "confidence": round(max(0.0, min(1.0, confidence)), 3),
+        "matched_buckets": hits,
+    }
+
+
+# ===================== Motor por niveles =====================
+
+class TierStats:
+    """
+    Contadores del motor por niveles: cuántas llamadas resolvió cada nivel
+    y el acuerdo local vs OpenAI en la muestra auditada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.openai = 0
+        self.audited = 0
+        self.agreed = 0
+
+    def add(self, field: str, n: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def summary(self) -> dict:
+        with self._lock:
+            total = self.local + self.openai
+            return {
+                "local": self.local,
+                "openai": self.openai,
+                "local_ratio": self.local / total if total else 0.0,
+                "audited": self.audited,
+                "agreed": self.agreed,
+                "agreement": self.agreed / self.audited if self.audited else None,
+            }
+
+
+tier_stats = TierStats()
+
+
+def sampled_for_audit(transcript: str) -> bool:
+    """
+    Muestra determinística (por hash de la transcripción) para auditar contra OpenAI.
+    """
+    if VOC_TIER_AUDIT_RATE <= 0:
+        return False
+    digest = int(hashlib.sha1(transcript.encode("utf-8")).hexdigest()[:8], 16)
+    return (digest % 10000) < VOC_TIER_AUDIT_RATE * 10000
+
+
+def _public(result: dict) -> dict:
+    """
+    Quita los campos internos del clasificador local (formato de `analyze_voc`).
+    """
+    return {k: v for k, v in result.items() if k not in ("confidence", "matched_buckets")}
+
+
+def record_audit(local: dict, remote: dict):
+    """
+    Registra la comparación local vs OpenAI de una llamada de la muestra auditada.
+    """
+    tier_stats.add("audited")
+    if remote["voice_bucket"] == local["voice_bucket"]:
+        tier_stats.add("agreed")
+    else:
+        print(
+            f"[Niveles] Desacuerdo local/OpenAI: local='{local['voice_bucket']}' "
+            f"OpenAI='{remote['voice_bucket']}'"
+        )
+
+
+def resolve_locally(transcript: str, call_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Nivel 1: devuelve el resultado local si su confianza alcanza VOC_LOCAL_MIN_CONFIDENCE;
+    si no, devuelve None (la llamada debe escalar a OpenAI). No hace auditoría.
+    Con `call_id` se usan los turnos del cliente si la llamada tiene diarización.
+    """
+    local = classify_locally(transcript, call_id)
+    if local["confidence"] >= VOC_LOCAL_MIN_CONFIDENCE:
+        tier_stats.add("local")
+        return _public(local)
+    tier_stats.add("openai")
+    return None
+
+
+def analyze_voc_tiered(customer_transcript: str, call_id: Optional[str] = None) -> dict:
+    """
+    Igual que `analyze_voc`, pero primero intenta el clasificador local.
+    Solo las llamadas de baja confianza van a OpenAI.
+
+    Una muestra (VOC_TIER_AUDIT_RATE) de las llamadas resueltas localmente también
+    se analiza con OpenAI para medir el acuerdo; en ese caso se usa el resultado de OpenAI.
+    """
+    local = resolve_locally(customer_transcript, call_id)
+    if local is None:
+        return analyze_voc(customer_transcript)
+
+    if sampled_for_audit(customer_transcript):
+        remote = analyze_voc(customer_transcript)
+        record_audit(local, remote)
+        return remote
+
+    return local
@@ -1,5 +1,7 @@
 # src/transcriber.py
-import requests
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 from .config import (
@@ -8,9 +10,63 @@ from .config import (
     TRANSCRIPTS_DIR,
     DEEPGRAM_MODEL,
     DEEPGRAM_LANG,
+    DEEPGRAM_URL,
+    DEEPGRAM_CONCURRENCY,
+    DEEPGRAM_CONNECT_TIMEOUT_S,
+    DEEPGRAM_READ_TIMEOUT_S,
+    TRANSCRIPT_CACHE_ENABLED,
+    VOC_AUDIO_PREPROCESS,
+    VOC_COMPACT,
+    VOC_LONG_AUDIO,
 )
+from .transcript_cache import audio_cache_key, get_transcript_cache
+from .audio import prepare_upload
+from .compaction import save_utterances, slim_utterances
+from .long_audio import (
+    chunk_workdir,
+    detect_silences,
+    is_long_audio,
+    plan_chunks,
+    split_audio,
+    stitch_transcripts,
+)
+from .metrics import metrics
+from .ratelimit import ProviderHTTPError, deepgram_scheduler, parse_retry_after
+
+# Content-Type por extensión: el audio se sube como cuerpo crudo (sin multipart)
+AUDIO_CONTENT_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".webm": "audio/webm",
+    ".flac": "audio/flac",
+}
+
+_session = None
+_session_lock = threading.Lock()
 
-DEEPGRAM_URL = "https://api.deepgram.com/v1/listen"
+
+def _get_session():
+    """
+    Sesión HTTP compartida con keep-alive: las conexiones (y el TLS) se reutilizan entre
+    transcripciones. El pool tiene tantas conexiones como transcripciones simultáneas.
+    Se crea (e importa `requests`) en la primera transcripción.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=DEEPGRAM_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Authorization"] = f"Token {DEEPGRAM_API_KEY}"
+            _session = session
+    return _session
 
 
 def list_audio_files() -> List[Path]:
@@ -24,15 +80,23 @@ def list_audio_files() -> List[Path]:
     return sorted(files)
 
 
-def transcribe_file_with_deepgram(path: Path) -> str:
+def _save_transcript_txt(path: Path, transcript: str) -> Path:
     """
-    Utiliza la API de Deepgram para transcribir el audio.
-    Además:
-    - Imprime por consola un resumen de la transcripción.
-    - Guarda la transcripción en un .txt para debug.
+    Guarda la transcripción en TRANSCRIPTS_DIR/<stem>.txt para revisión.
+    """
+    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+    txt_path = TRANSCRIPTS_DIR / f"{path.stem}.txt"
+    with txt_path.open("w", encoding="utf-8") as f:
+        f.write(transcript)
+    return txt_path
+
+
+def _request_deepgram(upload_path: Path, call_id: str) -> dict:
+    """
+    Sube un archivo de audio a Deepgram y devuelve la respuesta JSON completa.
     """
     headers = {
-        "Authorization": f"Token {DEEPGRAM_API_KEY}",
+        "Content-Type": AUDIO_CONTENT_TYPES.get(upload_path.suffix.lower(), "application/octet-stream"),
     }
 
     # 🔑 Aquí ya usamos las variables de entorno DEEPGRAM_MODEL y DEEPGRAM_LANG
@@ -42,20 +106,119 @@ def transcribe_file_with_deepgram(path: Path) -> str:
         # Opcional: formateo inteligente
         # "smart_format": "true",
     }
+    if VOC_COMPACT:
+        # Turnos por hablante: permiten enviar al análisis solo lo relevante de la llamada
+        params["diarize"] = "true"
+        params["utterances"] = "true"
+
+    import requests
+
+    def _post():
+        size = upload_path.stat().st_size
+        with metrics.span("deepgram", call_id=call_id, bytes=size) as span, \
+                upload_path.open("rb") as audio_file:
+            try:
+                # El archivo se pasa como cuerpo: requests lo envía por partes, sin cargarlo en memoria
+                response = _get_session().post(
+                    DEEPGRAM_URL,
+                    headers=headers,
+                    params=params,
+                    data=audio_file,
+                    timeout=(DEEPGRAM_CONNECT_TIMEOUT_S, DEEPGRAM_READ_TIMEOUT_S),
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise ProviderHTTPError("Deepgram", None, str(e)) from e
+            span["status_code"] = response.status_code
+            span["response_bytes"] = len(response.content)
+            span["time_to_response_s"] = round(response.elapsed.total_seconds(), 3)
+            if response.status_code != 200:
+                raise ProviderHTTPError(
+                    "Deepgram",
+                    response.status_code,
+                    response.text[:500],
+                    retry_after=parse_retry_after(response.headers),
+                )
+        return response
 
-    with path.open("rb") as audio_file:
-        response = requests.post(
-            DEEPGRAM_URL,
-            headers=headers,
-            params=params,
-            files={"file": audio_file},
+    # Límite de concurrencia/requests por minuto y reintentos ante 429, 5xx y cortes de red
+    response = deepgram_scheduler.call(_post)
+    return response.json()
+
+
+def _transcribe_in_chunks(path: Path, duration: float) -> tuple:
+    """
+    Audio largo: lo divide en tramos (cortando en silencios, con solapamiento), transcribe
+    los tramos en paralelo y une el texto en orden quitando lo repetido en los bordes.
+    Devuelve (transcripción, metadata).
+    """
+    workdir = chunk_workdir()
+    try:
+        with metrics.span("division_audio", call_id=path.stem, duration_s=round(duration, 1)) as span:
+            chunks = plan_chunks(duration, detect_silences(path))
+            chunk_files = split_audio(path, chunks, workdir)
+            span["chunks"] = len(chunk_files)
+        print(
+            f"[Deepgram] {path.name}: audio largo ({duration / 60:.1f} min), "
+            f"se transcribe en {len(chunk_files)} tramos"
         )
 
-    if response.status_code != 200:
-        raise RuntimeError(f"Error en Deepgram [{response.status_code}]: {response.text}")
+        # El planificador de Deepgram limita cuántos tramos se suben a la vez
+        with ThreadPoolExecutor(max_workers=min(len(chunk_files), DEEPGRAM_CONCURRENCY)) as executor:
+            responses = list(executor.map(lambda f: _request_deepgram(f, path.stem), chunk_files))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    parts = [r["results"]["channels"][0]["alternatives"][0]["transcript"] for r in responses]
+    metadata = {
+        "duration": duration,
+        "chunks": [
+            {"start": start, "end": end, "request_id": r.get("metadata", {}).get("request_id")}
+            for (start, end), r in zip(chunks, responses)
+        ],
+    }
+    return stitch_transcripts(parts), metadata
 
-    data = response.json()
-    transcript = data["results"]["channels"][0]["alternatives"][0]["transcript"]
+
+def transcribe_file_with_deepgram(path: Path) -> str:
+    """
+    Utiliza la API de Deepgram para transcribir el audio.
+    Además:
+    - Antes de subir el audio consulta la caché de transcripciones
+      (hash del contenido + modelo + idioma); si ya existe, no se llama a Deepgram.
+    - Con VOC_AUDIO_PREPROCESS activo sube una versión reducida del audio (mono, 16 kHz, sin silencios).
+    - Con VOC_LONG_AUDIO activo, los audios largos se transcriben por tramos en paralelo.
+    - Imprime por consola un resumen de la transcripción.
+    - Guarda la transcripción en un .txt para debug.
+    """
+    cache_key = None
+    if TRANSCRIPT_CACHE_ENABLED:
+        with metrics.span("cache_transcripcion", call_id=path.stem) as span:
+            cache_key = audio_cache_key(path)
+            cached = get_transcript_cache().get(cache_key)
+            span["hit"] = cached is not None
+        if cached is not None:
+            transcript = cached["transcript"]
+            print(f"[Deepgram] {path.name}: transcripción tomada de caché ({len(transcript)} caracteres)")
+            _save_transcript_txt(path, transcript)
+            utterances = (cached.get("metadata") or {}).get("utterances")
+            if utterances:
+                save_utterances(path.stem, utterances)
+            return transcript
+
+    long_audio, duration = is_long_audio(path) if VOC_LONG_AUDIO else (False, None)
+    if long_audio:
+        transcript, metadata = _transcribe_in_chunks(path, duration)
+    else:
+        # Archivo a subir: el original o su versión pre-procesada (la caché usa siempre el original)
+        upload_path = prepare_upload(path) if VOC_AUDIO_PREPROCESS else path
+        data = _request_deepgram(upload_path, path.stem)
+        transcript = data["results"]["channels"][0]["alternatives"][0]["transcript"]
+        metadata = data.get("metadata", {})
+        utterances = slim_utterances(data["results"].get("utterances"))
+        if utterances:
+            # Turnos por hablante (VOC_COMPACT): junto al .txt y en la caché
+            save_utterances(path.stem, utterances)
+            metadata = {**metadata, "utterances": utterances}
 
     # ----- LOG EN CONSOLA -----
     preview = transcript[:200].replace("\n", " ")
@@ -63,11 +226,17 @@ def transcribe_file_with_deepgram(path: Path) -> str:
     print(f"[Deepgram] {path.name}: {len(transcript)} caracteres")
     print(f"[Deepgram] Preview: {preview}")
 
+    # ----- GUARDAR EN CACHÉ (transcripción + metadata cruda de la respuesta) -----
+    if cache_key is not None:
+        get_transcript_cache().put(
+            cache_key,
+            transcript,
+            metadata=metadata,
+            source_name=path.name,
+        )
+
     # ----- GUARDAR TRANSCRIPCIÓN EN TXT PARA REVISAR -----
-    TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
-    txt_path = TRANSCRIPTS_DIR / f"{path.stem}.txt"
-    with txt_path.open("w", encoding="utf-8") as f:
-        f.write(transcript)
+    txt_path = _save_transcript_txt(path, transcript)
     print(f"[Deepgram] Transcripción guardada en: {txt_path}")
 
     return transcript
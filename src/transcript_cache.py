@@ -0,0 +1,186 @@
+# src/transcript_cache.py
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import (
+    CACHE_DIR,
+    DEEPGRAM_MODEL,
+    DEEPGRAM_LANG,
+    TRANSCRIPT_CACHE_MAX_MB,
+    TRANSCRIPT_CACHE_MAX_AGE_DAYS,
+)
+from .storage import connect_sqlite, evict_lru
+
+
+def file_digest(path: Path, *extra: str) -> str:
+    """
+    Hash SHA-256 del CONTENIDO de un archivo (leído por bloques), seguido de `extra` separados por "|".
+    """
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    if extra:
+        h.update(("|" + "|".join(extra)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def audio_cache_key(path: Path, model: str = DEEPGRAM_MODEL, language: str = DEEPGRAM_LANG) -> str:
+    """
+    Calcula la llave de caché de un audio: hash SHA-256 del CONTENIDO del archivo
+    (no del nombre) + modelo + idioma de Deepgram.
+    Así, un audio renombrado o copiado dos veces comparte la misma llave.
+    """
+    return file_digest(path, model, language)
+
+
+class TranscriptCache:
+    """
+    Caché persistente (SQLite) de transcripciones de Deepgram.
+
+    Guarda por cada llave: transcripción, metadata cruda de la respuesta,
+    nombre del archivo de origen, tamaño y fechas de creación/último uso.
+    Se desaloja por antigüedad (max_age_days) y por tamaño total (max_bytes),
+    sacando primero lo que hace más tiempo no se usa.
+    """
+
+    def __init__(self, db_path: Path, max_bytes: int, max_age_days: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    key          TEXT PRIMARY KEY,
+                    transcript   TEXT NOT NULL,
+                    metadata     TEXT,
+                    source_name  TEXT,
+                    size_bytes   INTEGER NOT NULL,
+                    created_at   REAL NOT NULL,
+                    last_access  REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts(last_access)"
+            )
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Devuelve {"transcript", "metadata", "source_name"} si la llave existe, o None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transcript, metadata, source_name, created_at FROM transcripts WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            now = time.time()
+            if row is None or self._expired(row[3], now):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (now, key))
+
+        return {
+            "transcript": row[0],
+            "metadata": json.loads(row[1]) if row[1] else {},
+            "source_name": row[2],
+        }
+
+    def put(self, key: str, transcript: str, metadata: dict | None = None, source_name: str = ""):
+        """
+        Guarda (o reemplaza) la transcripción de una llave y aplica el desalojo.
+        """
+        meta_json = json.dumps(metadata or {}, ensure_ascii=False)
+        size = len(transcript.encode("utf-8")) + len(meta_json.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO transcripts
+                        (key, transcript, metadata, source_name, size_bytes, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, transcript, meta_json, source_name, size, now, now),
+                )
+            self._evict(now)
+
+    def evict(self):
+        """
+        Fuerza el desalojo por antigüedad y tamaño.
+        """
+        with self._lock:
+            self._evict(time.time())
+
+    def keys_by_source(self) -> dict:
+        """
+        {nombre del audio de origen: llave} de las transcripciones guardadas
+        (si un mismo nombre aparece varias veces, gana la más reciente).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source_name, key FROM transcripts WHERE source_name IS NOT NULL ORDER BY created_at"
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> dict:
+        """
+        Contadores de la caché: aciertos, fallos, entradas y tamaño total.
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM transcripts"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": total,
+        }
+
+    # ----- internos (se llaman con el lock tomado) -----
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_days > 0 and now - created_at > self.max_age_days * 86400
+
+    def _evict(self, now: float):
+        with self._conn:
+            if self.max_age_days > 0:
+                self._conn.execute(
+                    "DELETE FROM transcripts WHERE created_at < ?",
+                    (now - self.max_age_days * 86400,),
+                )
+
+        evict_lru(self._conn, "transcripts", max_bytes=self.max_bytes)
+
+
+_cache: Optional[TranscriptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """
+    Devuelve la caché de transcripciones compartida del proceso (se crea en el primer uso).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache(
+                CACHE_DIR / "transcripts.sqlite",
+                max_bytes=TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024,
+                max_age_days=TRANSCRIPT_CACHE_MAX_AGE_DAYS,
+            )
+        return _cache
@@ -0,0 +1,140 @@
+# src/watcher.py
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import VOC_MAX_CALLS_PER_BATCH, VOC_WATCH_POLL_S, VOC_WATCH_STABLE_S
+from .journal import open_journal
+from .pipeline import process_calls
+from .transcriber import AUDIO_CONTENT_TYPES
+
+
+@dataclass
+class _Entry:
+    size: int
+    mtime_ns: int
+    stable_since: float      # desde cuándo no cambia (tamaño, fecha)
+
+
+class DirectoryIndex:
+    """
+    Índice en memoria de la carpeta de entrada: nombre -> (tamaño, fecha de modificación).
+
+    Cada `poll()` compara un `os.scandir` con el índice y devuelve solo los audios nuevos
+    que ya están "estables" (sin cambiar de tamaño ni fecha durante `stable_s` segundos).
+    Si la fecha de modificación de la carpeta no cambió y no hay archivos esperando
+    estabilizarse, ni siquiera se lista la carpeta.
+    """
+
+    def __init__(self, input_dir: Path, stable_s: float = VOC_WATCH_STABLE_S):
+        self.input_dir = input_dir
+        self.stable_s = stable_s
+        self._entries: Dict[str, _Entry] = {}
+        self._waiting: set = set()   # nombres que todavía no se entregaron al pipeline
+        self._dir_mtime_ns: Optional[int] = None
+
+    @staticmethod
+    def _is_audio(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in AUDIO_CONTENT_TYPES
+
+    def poll(self) -> List[Path]:
+        now = time.monotonic()
+        dir_mtime_ns = self.input_dir.stat().st_mtime_ns
+        if dir_mtime_ns == self._dir_mtime_ns and not self._waiting:
+            return []
+        self._dir_mtime_ns = dir_mtime_ns
+
+        seen = set()
+        with os.scandir(self.input_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not self._is_audio(entry.name):
+                    continue
+                seen.add(entry.name)
+                st = entry.stat()
+                known = self._entries.get(entry.name)
+                if known is None:
+                    self._entries[entry.name] = _Entry(st.st_size, st.st_mtime_ns, now)
+                    self._waiting.add(entry.name)
+                elif (known.size, known.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    # Sigue creciendo (o fue reemplazado): se reinicia la espera
+                    known.size, known.mtime_ns, known.stable_since = st.st_size, st.st_mtime_ns, now
+                    self._waiting.add(entry.name)
+
+        # Archivos que desaparecieron (movidos o borrados)
+        for name in [n for n in self._entries if n not in seen]:
+            del self._entries[name]
+            self._waiting.discard(name)
+
+        ready = []
+        for name in list(self._waiting):
+            e = self._entries[name]
+            if e.size > 0 and now - e.stable_since >= self.stable_s:
+                self._waiting.discard(name)
+                ready.append(self.input_dir / name)
+        return sorted(ready)
+
+
+class _GracefulStop:
+    """
+    Primera señal (Ctrl+C / SIGTERM): se termina el batch en curso y se sale.
+    Segunda señal: se interrumpe de inmediato.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def install(self):
+        signals = [signal.SIGINT, signal.SIGTERM]
+        if hasattr(signal, "SIGBREAK"):  # Ctrl+Break en Windows
+            signals.append(signal.SIGBREAK)
+        for sig in signals:
+            signal.signal(sig, self._handle)
+
+    def _handle(self, signum, frame):
+        if self.event.is_set():
+            raise KeyboardInterrupt
+        print("\n[Daemon] Señal de parada recibida: se termina el batch en curso y se sale "
+              "(otra señal interrumpe de inmediato).")
+        self.event.set()
+
+
+def run_daemon(input_dir: Path, output_dir: Path, additional_service: Optional[str] = None):
+    """
+    Modo daemon: vigila la carpeta de entrada y procesa los audios nuevos apenas terminan de copiarse.
+
+    - Al iniciar, se indexa la carpeta una vez y se descartan los audios ya procesados (según el historial).
+    - Luego, cada VOC_WATCH_POLL_S segundos, solo se procesan los cambios desde la última revisión.
+    - Los audios listos se entregan a `process_calls` en lotes de hasta VOC_MAX_CALLS_PER_BATCH.
+    """
+    input_dir.mkdir(parents=True, exist_ok=True)
+    stop = _GracefulStop()
+    stop.install()
+
+    index = DirectoryIndex(input_dir)
+    journal = open_journal(output_dir)
+    print(f"[Daemon] Vigilando {input_dir} (revisión cada {VOC_WATCH_POLL_S:g}s, "
+          f"estable tras {VOC_WATCH_STABLE_S:g}s). Ctrl+C para terminar.")
+
+    while not stop.event.is_set():
+        ready = index.poll()
+        if ready:
+            by_stem = {p.stem: p for p in ready}
+            new_files = [by_stem[stem] for stem in journal.filter_new(by_stem)]
+            for i in range(0, len(new_files), VOC_MAX_CALLS_PER_BATCH):
+                if stop.event.is_set():
+                    break
+                batch = new_files[i:i + VOC_MAX_CALLS_PER_BATCH]
+                print(f"\n[Daemon] {len(batch)} audio(s) nuevo(s) listo(s) para procesar.")
+                try:
+                    process_calls(input_dir, output_dir, additional_service, audio_files=batch)
+                except Exception as e:
+                    # Un batch fallido no detiene el daemon; lo no confirmado se reintenta
+                    # cuando el archivo cambie o al reiniciar el daemon.
+                    print(f"[Daemon] ⚠ Error procesando el batch: {e}")
+        stop.event.wait(VOC_WATCH_POLL_S)
+
+    print("[Daemon] Detenido.")
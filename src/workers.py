@@ -0,0 +1,245 @@
+# src/workers.py
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .config import VOC_CLAIM_LEASE_S, VOC_MAX_CALLS_PER_BATCH
+from .dead_letter import open_dead_letter
+from .journal import open_journal
+from .pipeline import export_pending, process_calls
+from .transcriber import AUDIO_CONTENT_TYPES
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_dir(output_dir: Path, worker_id: str) -> Path:
+    """
+    Carpeta de resultados propia de un worker (su historial con las filas procesadas).
+    """
+    return output_dir / "shards" / worker_id
+
+
+class ClaimManager:
+    """
+    Reservas atómicas de audios en una carpeta compartida (varios procesos o varias máquinas).
+
+    Por cada audio reservado se crea `<input_dir>/.claims/<stem>.lease` con O_EXCL: solo un
+    worker puede crearlo. La reserva vence a los `lease_s` segundos si el worker no la renueva
+    (p.ej. porque se cayó) y entonces otro worker la puede tomar. Al terminar una llamada,
+    la reserva se reemplaza por `<stem>.done`, que ningún worker vuelve a tomar.
+    """
+
+    def __init__(self, input_dir: Path, worker_id: str, lease_s: float = VOC_CLAIM_LEASE_S):
+        self.dir = input_dir / ".claims"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.worker_id = worker_id
+        self.lease_s = lease_s
+        self._held: set = set()
+        self._lock = threading.Lock()
+
+    def _lease(self, stem: str) -> Path:
+        return self.dir / f"{stem}.lease"
+
+    def _done(self, stem: str) -> Path:
+        return self.dir / f"{stem}.done"
+
+    def _payload(self) -> bytes:
+        return json.dumps({
+            "worker": self.worker_id,
+            "expires_at": time.time() + self.lease_s,
+        }).encode("utf-8")
+
+    def is_done(self, stem: str) -> bool:
+        return self._done(stem).exists()
+
+    def try_claim(self, stem: str) -> bool:
+        if self.is_done(stem):
+            return False
+        lease = self._lease(stem)
+        for _ in range(2):
+            try:
+                fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over_if_expired(lease):
+                    return False
+                continue
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._payload())
+            with self._lock:
+                self._held.add(stem)
+            return True
+        return False
+
+    def _take_over_if_expired(self, lease: Path) -> bool:
+        """
+        Si la reserva venció, la retira (renombrar es atómico: solo un worker lo logra).
+        """
+        try:
+            data = json.loads(lease.read_text(encoding="utf-8") or "{}")
+            expires_at = float(data.get("expires_at", 0))
+        except FileNotFoundError:
+            return True
+        except (ValueError, OSError):
+            # Archivo a medio escribir: se usa su fecha de modificación
+            try:
+                expires_at = lease.stat().st_mtime + self.lease_s
+            except FileNotFoundError:
+                return True
+        if expires_at > time.time():
+            return False
+        stale = lease.with_name(f"{lease.name}.{uuid.uuid4().hex}.vencida")
+        try:
+            os.rename(lease, stale)
+        except FileNotFoundError:
+            return True  # otro worker ya la retiró; se intenta crear de nuevo
+        stale.unlink(missing_ok=True)
+        return True
+
+    def holds(self, stem: str) -> bool:
+        with self._lock:
+            return stem in self._held
+
+    def renew(self) -> List[str]:
+        """
+        Extiende el vencimiento de todas las reservas vigentes de este worker.
+        Una reserva que ya es de otro worker (venció y la tomó) no se renueva: se deja de
+        considerar propia y no se marca como terminada ni se borra. Devuelve esas llamadas.
+        """
+        with self._lock:
+            held = list(self._held)
+        lost = []
+        for stem in held:
+            lease = self._lease(stem)
+            try:
+                owner = json.loads(lease.read_text(encoding="utf-8") or "{}").get("worker")
+            except FileNotFoundError:
+                owner = None
+            except (ValueError, OSError):
+                owner = None  # a medio escribir: la está creando otro worker
+            if owner != self.worker_id:
+                lost.append(stem)
+                continue
+            tmp = lease.with_name(f"{lease.name}.{self.worker_id}.tmp")
+            tmp.write_bytes(self._payload())
+            os.replace(tmp, lease)
+        if lost:
+            with self._lock:
+                self._held.difference_update(lost)
+            print(f"[Worker {self.worker_id}] ⚠ Reserva(s) tomada(s) por otro worker: {', '.join(lost)}")
+        return lost
+
+    def complete(self, stems: Iterable[str]):
+        for stem in stems:
+            if not self.holds(stem):
+                continue  # la reserva pasó a otro worker: ese worker la termina
+            marker = {"worker": self.worker_id, "at": time.time()}
+            self._done(stem).write_bytes(json.dumps(marker).encode("utf-8"))
+            self.release([stem])
+
+    def release(self, stems: Iterable[str]):
+        for stem in stems:
+            with self._lock:
+                if stem not in self._held:
+                    continue  # no es nuestra: no se borra la reserva de otro worker
+                self._held.discard(stem)
+            self._lease(stem).unlink(missing_ok=True)
+
+
+def _heartbeat(claims: ClaimManager, stop: threading.Event):
+    while not stop.wait(claims.lease_s / 3):
+        try:
+            claims.renew()
+        except OSError as e:
+            print(f"[Worker] ⚠ No se pudieron renovar las reservas: {e}")
+
+
+def run_worker(input_dir: Path, output_dir: Path, worker_id: Optional[str] = None, additional_service=None):
+    """
+    Worker: reserva audios de la carpeta compartida, los procesa y deja las filas en su
+    propia carpeta (output/shards/<worker>). Varios workers pueden correr a la vez, en
+    una o varias máquinas. Termina cuando no quedan audios por reservar.
+    El Excel se genera después con `python main.py --merge`.
+    """
+    worker_id = worker_id or default_worker_id()
+    claims = ClaimManager(input_dir, worker_id)
+    shard = shard_dir(output_dir, worker_id)
+    shard_journal = open_journal(shard)
+    # Cola de fallidas compartida (la de output_dir): ningún worker vuelve a reservar una llamada
+    # que falló, y `--reintentar-fallidos` la encuentra ahí
+    dead_letter = open_dead_letter(output_dir)
+    # Historial principal (llamadas procesadas antes o ya combinadas): solo se consulta
+    main_journal = open_journal(output_dir)
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(claims, stop), daemon=True)
+    heartbeat.start()
+    print(f"[Worker {worker_id}] Resultados en: {shard}")
+
+    try:
+        while True:
+            with os.scandir(input_dir) as it:
+                candidates = sorted(
+                    Path(e.path) for e in it
+                    if e.is_file() and os.path.splitext(e.name)[1].lower() in AUDIO_CONTENT_TYPES
+                )
+            by_stem = {p.stem: p for p in candidates}
+            pending = dead_letter.filter_not_queued(
+                shard_journal.filter_new(main_journal.filter_new(by_stem))
+            )
+
+            batch: List[Path] = []
+            for stem in pending:
+                if claims.try_claim(stem):
+                    batch.append(by_stem[stem])
+                    if len(batch) >= VOC_MAX_CALLS_PER_BATCH:
+                        break
+            if not batch:
+                print(f"[Worker {worker_id}] No quedan audios por reservar. Fin.")
+                return
+
+            print(f"[Worker {worker_id}] {len(batch)} audio(s) reservado(s).")
+            stems = [p.stem for p in batch]
+            try:
+                process_calls(
+                    input_dir, shard, additional_service,
+                    audio_files=batch, export=False, dead_letter_dir=output_dir,
+                )
+            finally:
+                not_done = set(shard_journal.filter_new(stems))
+                claims.complete([s for s in stems if s not in not_done])
+                claims.release(not_done)
+    finally:
+        stop.set()
+
+
+def merge_shards(output_dir: Path):
+    """
+    Combina los resultados de todos los workers (output/shards/*) en el historial y el
+    almacén principales, y regenera el Excel. Se puede correr varias veces: solo se
+    combinan las filas que aún no se habían combinado.
+    """
+    main_journal = open_journal(output_dir)
+    shards_root = output_dir / "shards"
+    shards = sorted(p for p in shards_root.iterdir() if p.is_dir()) if shards_root.exists() else []
+
+    merged = 0
+    for shard in shards:
+        shard_journal = open_journal(shard)
+        pending = shard_journal.pending_export()
+        if not pending:
+            continue
+        for call_id, row, version in pending:
+            main_journal.record_done(call_id, row, version)
+        shard_journal.mark_exported([call_id for call_id, _, _ in pending])
+        merged += len(pending)
+        print(f"[Merge] {shard.name}: {len(pending)} llamada(s)")
+
+    print(f"[Merge] Total combinado: {merged} llamada(s) de {len(shards)} worker(s).")
+    export_pending(main_journal, output_dir)
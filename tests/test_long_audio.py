@@ -0,0 +1,37 @@
+# tests/test_long_audio.py
+from src.long_audio import overlap_window_words, stitch_transcripts
+
+
+def test_stitch_quita_el_solapamiento_de_los_bordes():
+    parts = [
+        "hola le llamo por el plan. Usted tiene Netflix activo",
+        "tiene netflix activo, sí claro lo uso",
+    ]
+    assert stitch_transcripts(parts) == "hola le llamo por el plan. Usted tiene Netflix activo sí claro lo uso"
+
+
+def test_stitch_tolera_una_palabra_cortada_en_el_borde():
+    parts = ["bueno le explico el plan que tiene y los cos", "plan que tiene y los costos asociados"]
+    assert stitch_transcripts(parts) == "bueno le explico el plan que tiene y los costos asociados"
+
+
+def test_stitch_no_confunde_una_frase_repetida_con_el_solapamiento():
+    parts = [
+        "sí señor gracias usted tiene netflix sí señor gracias bueno le explico "
+        "el plan que tiene y los costos asociados",
+        "asociados al plan, sí señor gracias adios",
+    ]
+    stitched = stitch_transcripts(parts)
+    # No hay solapamiento anclado de 3+ palabras: se concatena sin perder lo hablado
+    assert stitched == " ".join(parts)
+    assert "le explico el plan" in stitched
+
+
+def test_stitch_frase_repetida_dentro_de_la_ventana():
+    parts = ["sí claro sí claro ya lo tengo sí claro", "sí claro gracias adios"]
+    assert stitch_transcripts(parts, min_match=2) == "sí claro sí claro ya lo tengo sí claro gracias adios"
+
+
+def test_ventana_segun_el_solapamiento():
+    assert overlap_window_words(3) > overlap_window_words(1)
+    assert overlap_window_words(3) >= 3 * 3
@@ -0,0 +1,47 @@
+# tests/test_matcher.py
+import pytest
+
+from src.analyzer import VOC_MATCHER, detect_additional_service
+from src.matcher import KeywordMatcher, fold_text
+
+MATCHER = KeywordMatcher({
+    "ok": ("sentimiento", "positivo"),
+    "funciona": ("sentimiento", "positivo"),
+    "no funciona": ("sentimiento", "negativo"),
+    "hbo": ("servicio", "HBO Max"),
+    "hbo max": ("servicio", "HBO Max"),
+})
+
+
+def test_respeta_limites_de_palabra():
+    assert MATCHER.find_all("tengo un bloqueo en la cuenta") == []
+    assert MATCHER.find_all("el hbomax no carga") == []
+    assert [h.keyword for h in MATCHER.find_all("ok, listo")] == ["ok"]
+
+
+def test_gana_la_coincidencia_mas_larga():
+    hits = MATCHER.find_all("Tengo HBO Max pero no funciona")
+    assert [(h.keyword, h.label) for h in hits] == [("hbo max", "HBO Max"), ("no funciona", "negativo")]
+
+
+def test_posiciones_sobre_el_texto_original():
+    text = "Sí, el HBO está activo"
+    (hit,) = MATCHER.find_all(text)
+    assert text[hit.start:hit.end] == "HBO"
+    assert fold_text(text) == "si, el hbo esta activo"
+
+
+def test_diccionario_real():
+    assert VOC_MATCHER.counts("tengo un bloqueo")[("sentimiento", "positivo")] == 0
+    assert detect_additional_service("me llamaron por hbo ayer") == "HBO Max"
+    assert detect_additional_service("hbox") == "No identificado"
+
+
+def test_bulk_counts_igual_a_counts():
+    pytest.importorskip("pandas")
+    texts = ["ok con hbo", "bloqueo", "no funciona el hbo max"]
+    table = MATCHER.bulk_counts(texts)
+    for i, text in enumerate(texts):
+        expected = {f"{g}:{v}": n for (g, v), n in MATCHER.counts(text).items()}
+        got = {c: int(table.loc[i, c]) for c in table.columns if table.loc[i, c]}
+        assert got == expected
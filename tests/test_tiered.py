@@ -0,0 +1,62 @@
+# tests/test_tiered.py
+import pytest
+
+import src.tiered as tiered
+from src.config import VOC_LOCAL_MIN_CONFIDENCE
+from src.tiered import classify_locally
+
+
+def _escalates(transcript: str, call_id=None) -> bool:
+    return classify_locally(transcript, call_id)["confidence"] < VOC_LOCAL_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("transcript", [
+    "tengo netflix pero la verdad no lo uso",
+    "no, no lo tengo, el netflix",
+    "el netflix ya esta activo no, no funciona",
+])
+def test_negacion_o_queja_escala(transcript):
+    assert _escalates(transcript)
+
+
+def test_frase_negativa_reforzada_no_se_invierte():
+    result = classify_locally("No, no sabía que tenía Netflix.")
+    assert result["voice_bucket"] == "No, no sabía"
+    assert not _escalates("No, no sabía que tenía Netflix.")
+
+
+@pytest.mark.parametrize("transcript", [
+    "Le cuento que su Netflix ya está activo con su plan. Ah bueno, pero yo no he entrado todavía.",
+    "le llamo de Colsubsidio para confirmar si ya está activo su Netflix. No señor",
+    "Sobre su Netflix, ¿usted lo uso alguna vez? No.",
+])
+def test_guion_y_preguntas_del_asesor_no_cuentan(transcript):
+    assert classify_locally(transcript)["matched_buckets"] == {}
+    assert _escalates(transcript)
+
+
+def test_frase_generica_de_cobranza_no_es_bucket():
+    result = classify_locally("tengo netflix, no lo he hecho el pago")
+    assert "No, no lo he activado" not in result["matched_buckets"]
+
+
+def test_buckets_si_compatibles_no_son_conflicto():
+    transcript = "Le comento que su plan incluye Netflix. Sí señor, ya lo tengo y lo uso todos los días."
+    result = classify_locally(transcript)
+    assert result["voice_bucket"] == "Sí, ya lo tengo"
+    assert result["customer_voice"].startswith("Sí señor")
+    assert not _escalates(transcript)
+
+
+def test_con_diarizacion_solo_cuentan_los_turnos_del_cliente(monkeypatch):
+    utterances = [
+        {"speaker": 0, "transcript": "Buenas tardes, mi nombre es Carlos, le llamo de Colsubsidio."},
+        {"speaker": 0, "transcript": "Su Netflix ya esta activo con su plan"},
+        {"speaker": 1, "transcript": "ah bueno pero yo no he entrado todavia"},
+    ]
+    monkeypatch.setattr(tiered, "load_utterances", lambda call_id: utterances)
+    transcript = " ".join(u["transcript"] for u in utterances)
+    assert classify_locally(transcript, "llamada-1")["matched_buckets"] == {}
+
+    utterances[2]["transcript"] = "si señor ya lo tengo y lo uso"
+    assert classify_locally(transcript, "llamada-1")["voice_bucket"] == "Sí, ya lo tengo"